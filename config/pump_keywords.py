@@ -116,6 +116,33 @@ COMBINED_KEYWORDS = [
     "SOL pump soon"
 ]
 
+# Weighted indicator profiles used to score tweet text (see social_aggregator/pump_matcher.py).
+# Matching is case-insensitive substring matching. A profile's score is the sum of the
+# weights of the categories that matched at least once; counts are the number of
+# distinct phrases matched per category.
+INDICATOR_PROFILES = {
+    # Quick scan of incoming tweets before AI analysis (main.run_monitor_cycle)
+    "quick_scan": {
+        "token_address": {"weight": 0.4, "phrases": ["contract", "token address", "address:", "ca:"]},
+        "pump": {"weight": 0.3, "phrases": ["100x", "1000x", "moonshot", "to the moon", "🚀"]},
+        "urgency": {"weight": 0.3, "phrases": ["don't miss", "hurry", "last chance", "early"]},
+    },
+    # Per-tweet pump indicator points for promoters (twitter.find_promoters_for_token)
+    "promoter": {
+        "multiplier": {"weight": 3, "phrases": ["100x", "1000x"]},
+        "rocket": {"weight": 2, "phrases": ["🚀"]},
+        "moon": {"weight": 2, "phrases": ["moon"]},
+        "gem": {"weight": 1, "phrases": ["gem"]},
+        "early": {"weight": 1, "phrases": ["early"]},
+        "urgency": {"weight": 3, "phrases": ["don't miss", "hurry"]},
+    },
+    # Markers highlighted when logging sample tweets (twitter.get_recent_tweets)
+    "sample_log": {
+        "token_address": {"weight": 1, "phrases": ["token address", "contract"]},
+        "pump": {"weight": 1, "phrases": ["🚀", "100x", "1000x", "to the moon"]},
+    },
+}
+
 def get_default_keywords():
     """Returns the default set of keywords for tracking pump-and-dumps."""
     combined = HIGH_PRECISION_KEYWORDS + COMBINED_KEYWORDS
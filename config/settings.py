@@ -51,6 +51,30 @@ TWITTER_USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
 ]
+# Maximum number of keyword searches sent to twitterapi.io in parallel
+TWITTER_MAX_CONCURRENT_REQUESTS = int(os.getenv("TWITTER_MAX_CONCURRENT_REQUESTS", "4"))
+# How long a saved promoter list is reused as-is before searching Twitter again
+PROMOTER_CACHE_TTL_SECONDS = int(os.getenv("PROMOTER_CACHE_TTL_SECONDS", "7200"))
+# SQLite file indexing which accounts promoted which tokens
+PROMOTER_INDEX_PATH = os.getenv("PROMOTER_INDEX_PATH", "./data/promoter_index.db")
+# Number of dumped tokens after which an account counts as a known repeat promoter
+REPEAT_PROMOTER_MIN_TOKENS = int(os.getenv("REPEAT_PROMOTER_MIN_TOKENS", "3"))
+# Extra quick-scan score for tweets posted by known repeat promoters
+KNOWN_PROMOTER_SCORE_BOOST = float(os.getenv("KNOWN_PROMOTER_SCORE_BOOST", "0.3"))
+# Co-promotion graph: accounts posting the same token within this many minutes are linked
+PROMOTION_GRAPH_PATH = os.getenv("PROMOTION_GRAPH_PATH", "./data/twitter/promotion_graph.json")
+PROMOTION_GRAPH_WINDOW_MINUTES = int(os.getenv("PROMOTION_GRAPH_WINDOW_MINUTES", "15"))
+# Weak co-promotion edges (and token posts) are dropped this long after they were last seen
+PROMOTION_GRAPH_WEAK_EDGE_TTL_HOURS = int(os.getenv("PROMOTION_GRAPH_WEAK_EDGE_TTL_HOURS", "168"))
+# Shared tokens needed before a link counts towards a ring, and minimum ring size/density
+RING_MIN_SHARED_TOKENS = int(os.getenv("RING_MIN_SHARED_TOKENS", "2"))
+RING_MIN_SIZE = int(os.getenv("RING_MIN_SIZE", "3"))
+RING_CORE_DEGREE = int(os.getenv("RING_CORE_DEGREE", "2"))
+# Near-duplicate collapsing: max SimHash bit difference for two tweets to count as the same message
+# (each 16-bit band is probed with up to distance // 4 bits flipped; keep it under 16)
+DEDUP_SIMHASH_MAX_DISTANCE = int(os.getenv("DEDUP_SIMHASH_MAX_DISTANCE", "7"))
+# Copies of one message (by any accounts) before it counts as a copy-paste campaign
+DEDUP_CAMPAIGN_MIN_COPIES = int(os.getenv("DEDUP_CAMPAIGN_MIN_COPIES", "3"))
 # Add Telegram/Discord specific settings if needed
 # TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN")
 # TELEGRAM_CHAT_IDS = os.getenv("TELEGRAM_CHAT_IDS", "").split(",")
@@ -60,15 +84,107 @@ TWITTER_USER_AGENTS = [
 # --- On-Chain Monitor Settings ---
 SOLANA_WATCH_ADDRESSES = os.getenv("SOLANA_WATCH_ADDRESSES", "Address1...,Address2...").split(",")
 SOLANA_WATCH_TOKENS = os.getenv("SOLANA_WATCH_TOKENS", "TokenMintAddress1...,TokenMintAddress2...").split(",")
+# Cache of mint checks and "nothing interesting" verdicts for addresses found in tweets
+VERIFICATION_CACHE_PATH = os.getenv("VERIFICATION_CACHE_PATH", "./data/verification_cache.json")
+# How long an address found not to be a token mint is skipped (mints are cached for good)
+NON_MINT_CACHE_TTL_SECONDS = int(os.getenv("NON_MINT_CACHE_TTL_SECONDS", "604800"))
+# How long a token without data or with a low-confidence verdict is skipped
+UNINTERESTING_TOKEN_TTL_SECONDS = int(os.getenv("UNINTERESTING_TOKEN_TTL_SECONDS", "1800"))
+# Analysed tokens below this confidence (and not flagged) count as uninteresting
+UNINTERESTING_MAX_CONFIDENCE = float(os.getenv("UNINTERESTING_MAX_CONFIDENCE", "0.3"))
+# Streaming anomaly detector: per-token baselines persisted across restarts
+ANOMALY_STATE_PATH = os.getenv("ANOMALY_STATE_PATH", "./data/anomaly_state.json")
+# Smoothing factor for the amount and hourly-volume EWMAs
+ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.2"))
+# Closed hours kept for the rolling median/MAD, and hours needed before volume spikes are flagged
+ANOMALY_BASELINE_HOURS = int(os.getenv("ANOMALY_BASELINE_HOURS", "48"))
+ANOMALY_MIN_HISTORY_HOURS = int(os.getenv("ANOMALY_MIN_HISTORY_HOURS", "6"))
+# Robust z-score (in MAD-based standard deviations) for an hourly volume spike
+ANOMALY_VOLUME_SPIKE_Z = float(os.getenv("ANOMALY_VOLUME_SPIKE_Z", "4"))
+# Transfers seen before outsized transfers are flagged, and how far above the median they must be
+ANOMALY_MIN_TRANSFERS = int(os.getenv("ANOMALY_MIN_TRANSFERS", "30"))
+ANOMALY_LARGE_TRANSFER_MEDIAN_MULTIPLE = float(os.getenv("ANOMALY_LARGE_TRANSFER_MEDIAN_MULTIPLE", "20"))
+
+# Reuse a token analysis whose inputs are unchanged for up to this many seconds (0 = no age limit)
+ANALYSIS_REUSE_MAX_AGE_SECONDS = int(os.getenv("ANALYSIS_REUSE_MAX_AGE_SECONDS", "21600"))
+# Per-token and cohort baselines for adaptive spike/whale thresholds
+BASELINE_STORE_PATH = os.getenv("BASELINE_STORE_PATH", "./data/baselines.json")
+# Observations a token (or its cohort) needs before its own thresholds replace the static 3x / 10% / 5%
+BASELINE_MIN_OBSERVATIONS = int(os.getenv("BASELINE_MIN_OBSERVATIONS", "12"))
+# Standard deviations above the typical spike ratio / top-wallet share that count as unusual
+BASELINE_SPIKE_Z = float(os.getenv("BASELINE_SPIKE_Z", "3"))
+BASELINE_WHALE_Z = float(os.getenv("BASELINE_WHALE_Z", "2"))
+# Bounds for the adaptive spike factor
+BASELINE_MIN_SPIKE_FACTOR = float(os.getenv("BASELINE_MIN_SPIKE_FACTOR", "2"))
+BASELINE_MAX_SPIKE_FACTOR = float(os.getenv("BASELINE_MAX_SPIKE_FACTOR", "10"))
+# Age below which a ...pump mint belongs to the fresh launch cohort
+BASELINE_FRESH_TOKEN_HOURS = int(os.getenv("BASELINE_FRESH_TOKEN_HOURS", "72"))
+# Baseline statistics weigh roughly the last this many observations; older ones decay
+BASELINE_WINDOW = int(os.getenv("BASELINE_WINDOW", "2000"))
+# OHLCV price bars from swap activity: where they are stored and how many pages of 100 activities to fetch per cycle
+OHLCV_STORE_DIR = os.getenv("OHLCV_STORE_DIR", "./data/ohlcv")
+OHLCV_MAX_PAGES = int(os.getenv("OHLCV_MAX_PAGES", "10"))
+# Price run-up (1.0 = +100%) followed by a drawdown from the peak (0.5 = -50%) that counts as a pump and dump signal
+OHLCV_RUN_UP_THRESHOLD = float(os.getenv("OHLCV_RUN_UP_THRESHOLD", "1.0"))
+OHLCV_DRAWDOWN_THRESHOLD = float(os.getenv("OHLCV_DRAWDOWN_THRESHOLD", "0.5"))
+# Memory-mapped set of known pool/program/exchange addresses used to tell buys from sells
+KNOWN_ADDRESSES_PATH = os.getenv("KNOWN_ADDRESSES_PATH", "./data/known_addresses.npy")
+# Bloom filter of wallets flagged in past analyses (dumpers, pump-and-dump whales), used to screen new tokens
+BAD_WALLET_FILTER_PATH = os.getenv("BAD_WALLET_FILTER_PATH", "./data/bad_wallets.bloom")
+BAD_WALLET_FILTER_CAPACITY = int(os.getenv("BAD_WALLET_FILTER_CAPACITY", "100000"))
+BAD_WALLET_FILTER_ERROR_RATE = float(os.getenv("BAD_WALLET_FILTER_ERROR_RATE", "0.001"))
+# Tokens with no flagged holders analyzed per cycle, after the flagged ones (0 = no limit)
+BAD_WALLET_MAX_CLEAN_TOKENS = int(os.getenv("BAD_WALLET_MAX_CLEAN_TOKENS", "0"))
+# Tiered triage: minimum tier 0 (tweet signals) and tier 1 (metadata + holder page) scores to move up a tier
+TRIAGE_TIER0_MIN_SCORE = float(os.getenv("TRIAGE_TIER0_MIN_SCORE", "0.2"))
+TRIAGE_TIER1_MIN_SCORE = float(os.getenv("TRIAGE_TIER1_MIN_SCORE", "0.3"))
+# Share of the supply in the first holder page (pools and exchanges excluded) that counts as concentrated
+TRIAGE_CONCENTRATION_THRESHOLD = float(os.getenv("TRIAGE_CONCENTRATION_THRESHOLD", "0.5"))
+# Where the per-tier token counts are kept
+TRIAGE_STATS_PATH = os.getenv("TRIAGE_STATS_PATH", "./data/triage_stats.json")
+# Worker processes for per-token on-chain analysis (0 = one per CPU core)
+ONCHAIN_ANALYSIS_WORKERS = int(os.getenv("ONCHAIN_ANALYSIS_WORKERS", "0"))
+# Below this many transfers per cycle, partitions are analyzed in-process (process startup costs more)
+ONCHAIN_PARALLEL_MIN_TRANSFERS = int(os.getenv("ONCHAIN_PARALLEL_MIN_TRANSFERS", "20000"))
 
 # --- Correlation Engine Settings ---
+# Largest lag (either direction) between promotion and on-chain volume considered by the cross-correlation
 CORRELATION_TIME_WINDOW_MINUTES = int(os.getenv("CORRELATION_TIME_WINDOW_MINUTES", "60"))
+# How far before a large transfer or volume spike tweets about the same token are attached to it
+EVENT_JOIN_WINDOW_MINUTES = int(os.getenv("EVENT_JOIN_WINDOW_MINUTES", "60"))
+# Bucket size and number of most recent buckets used for the mention/volume series
+CORRELATION_BUCKET_SECONDS = int(os.getenv("CORRELATION_BUCKET_SECONDS", "60"))
+CORRELATION_MAX_BUCKETS = int(os.getenv("CORRELATION_MAX_BUCKETS", "4320"))
+# Minimum lagged correlation for a token to count as a finding
+CORRELATION_MIN_STRENGTH = float(os.getenv("CORRELATION_MIN_STRENGTH", "0.3"))
 SENTIMENT_SPIKE_THRESHOLD = float(os.getenv("SENTIMENT_SPIKE_THRESHOLD", "0.7"))
 VOLUME_SPIKE_THRESHOLD_PERCENT = int(os.getenv("VOLUME_SPIKE_THRESHOLD_PERCENT", "200"))
 
 # --- AI Settings ---
 AI_MODEL = os.getenv("AI_MODEL", "gpt-4o-mini")
 AI_PUMP_SCORE_THRESHOLD = float(os.getenv("AI_PUMP_SCORE_THRESHOLD", "0.6"))
+# Maximum estimated prompt tokens per LLM address-extraction batch
+LLM_EXTRACTION_TOKEN_BUDGET = int(os.getenv("LLM_EXTRACTION_TOKEN_BUDGET", "3000"))
+# Maximum estimated prompt tokens for the per-token AI analysis (summary detail shrinks to fit)
+AI_ANALYSIS_PROMPT_TOKEN_BUDGET = int(os.getenv("AI_ANALYSIS_PROMPT_TOKEN_BUDGET", "2000"))
+# Batched AI analysis: prompt token budget per request and maximum tokens analyzed per request
+AI_BATCH_PROMPT_TOKEN_BUDGET = int(os.getenv("AI_BATCH_PROMPT_TOKEN_BUDGET", "8000"))
+AI_BATCH_MAX_TOKENS = int(os.getenv("AI_BATCH_MAX_TOKENS", "6"))
+# Maximum LLM requests in flight at once through the shared client
+LLM_MAX_CONCURRENT_REQUESTS = int(os.getenv("LLM_MAX_CONCURRENT_REQUESTS", "4"))
+# Requests per minute allowed by the OpenAI account tier (0 = no client-side spacing)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+# SQLite cache of LLM responses, keyed by a hash of model, prompts and parameters
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./data/llm_cache.db")
+# How long a cached LLM response is reused, and how many are kept (0 disables the cache)
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+# Pump-and-dump verdict backend: "llm", "local" (offline-trained model) or "hybrid"
+ANALYSIS_BACKEND = os.getenv("ANALYSIS_BACKEND", "hybrid")
+LOCAL_VERDICT_MODEL_PATH = os.getenv("LOCAL_VERDICT_MODEL_PATH", "./data/models/verdict_model.json")
+# In hybrid mode the LLM is only asked when the local score falls inside this band
+LOCAL_SCORER_UNCERTAIN_LOW = float(os.getenv("LOCAL_SCORER_UNCERTAIN_LOW", "0.3"))
+LOCAL_SCORER_UNCERTAIN_HIGH = float(os.getenv("LOCAL_SCORER_UNCERTAIN_HIGH", "0.7"))
 
 # --- Alerting Settings ---
 ALERT_EMAIL_RECIPIENTS = os.getenv("ALERT_EMAIL_RECIPIENTS", "your_email@example.com").split(",")
@@ -0,0 +1,177 @@
+"""Validated Solana address extraction from tweet text.
+
+The candidate pattern is compiled once. Every candidate is base58-decoded and only
+strings that decode to exactly 32 bytes (the size of a Solana public key) are kept.
+Long hashtags, tickers glued to words, truncated addresses and other 32-44 character
+base58-looking words are dropped here instead of each costing a round of Solscan
+requests in run_monitor_cycle. Decoding results are cached, since the same addresses
+are repeated across many tweets.
+"""
+
+import logging
+import re
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+PUBLIC_KEY_LENGTH = 32
+
+# Solana addresses are base58 encoded 32-byte keys, i.e. 32-44 characters
+CANDIDATE_PATTERN = re.compile(r'\b[1-9A-HJ-NP-Za-km-z]{32,44}\b')
+
+# Long base58 runs: addresses glued to other text, split or truncated ones
+FRAGMENT_PATTERN = re.compile(r'[1-9A-HJ-NP-Za-km-z]{16,}')
+# Phrases that announce an address ("CA:", "contract", ...)
+MARKER_PATTERN = re.compile(r'\b(?:ca|contract|token address|mint)\b', re.IGNORECASE)
+
+_BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+
+def decoded_length(candidate: str) -> int:
+    """Returns the number of bytes a base58 string decodes to (-1 if it is not base58)."""
+    value = 0
+    for char in candidate:
+        digit = _BASE58_INDEX.get(char)
+        if digit is None:
+            return -1
+        value = value * 58 + digit
+    # Each leading '1' encodes a leading zero byte
+    leading_zeros = len(candidate) - len(candidate.lstrip("1"))
+    return leading_zeros + (value.bit_length() + 7) // 8
+
+@lru_cache(maxsize=100000)
+def is_valid_address(candidate: str) -> bool:
+    """Checks that a string is a base58-encoded 32-byte Solana public key."""
+    return 32 <= len(candidate) <= 44 and decoded_length(candidate) == PUBLIC_KEY_LENGTH
+
+def extract_addresses(text: str) -> List[str]:
+    """Returns the valid Solana addresses in a text, in order of first appearance."""
+    addresses = []
+    for candidate in CANDIDATE_PATTERN.findall(text or ""):
+        if is_valid_address(candidate) and candidate not in addresses:
+            addresses.append(candidate)
+    return addresses
+
+def extract_addresses_batch(texts: Iterable[str]) -> List[List[str]]:
+    """Extracts valid addresses from many texts.
+
+    Args:
+        texts: Tweet texts.
+
+    Returns:
+        One list of valid addresses per text, in input order.
+    """
+    findall = CANDIDATE_PATTERN.findall
+    results = []
+    for text in texts:
+        addresses = []
+        for candidate in findall(text or ""):
+            if is_valid_address(candidate) and candidate not in addresses:
+                addresses.append(candidate)
+        results.append(addresses)
+    return results
+
+def needs_llm(text: str, addresses: List[str] = None) -> bool:
+    """Tells whether a text may hold an address the regex extractor could not resolve.
+
+    That is the case when it has a base58-looking candidate that failed validation, a
+    long base58 fragment outside the valid addresses (e.g. an address glued to other
+    text or split by a space), or an address marker such as "CA:" without any valid
+    address. Texts with only valid addresses, or with nothing address-like at all, are
+    resolved without the LLM.
+
+    Args:
+        text: The tweet text.
+        addresses: Valid addresses already extracted from the text, if known.
+    """
+    text = text or ""
+    if addresses is None:
+        addresses = extract_addresses(text)
+    for fragment in FRAGMENT_PATTERN.findall(text):
+        if fragment not in addresses:
+            return True
+    return not addresses and MARKER_PATTERN.search(text) is not None
+
+def extract_from_tweets(tweets: List[Dict[str, Any]]) -> List[str]:
+    """Returns the unique valid addresses mentioned across tweets, in order of first appearance."""
+    unique: Dict[str, None] = {}
+    for addresses in extract_addresses_batch(tweet.get('text', '') for tweet in tweets):
+        for address in addresses:
+            unique[address] = None
+    return list(unique)
+
+def filter_valid(addresses: Iterable[str]) -> List[str]:
+    """Drops anything that is not a valid address (e.g. from LLM output), keeping order and removing duplicates."""
+    valid: Dict[str, None] = {}
+    rejected = 0
+    for address in addresses:
+        if isinstance(address, str) and is_valid_address(address.strip()):
+            valid[address.strip()] = None
+        else:
+            rejected += 1
+    if rejected:
+        logger.info(f"Rejected {rejected} invalid address candidates")
+    return list(valid)
+
+def _encode_base58(data: bytes) -> str:
+    """Base58-encodes bytes (used to build benchmark data)."""
+    value = int.from_bytes(data, "big")
+    encoded = ""
+    while value:
+        value, remainder = divmod(value, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + encoded
+
+# Benchmark against the previous regex-only extraction
+if __name__ == '__main__':
+    import os
+    import random
+    import time
+
+    random.seed(1)
+    valid_pool = [_encode_base58(os.urandom(32)) for _ in range(500)]
+    # Base58-looking words that are not public keys: random strings, truncated or
+    # over-long keys, and hashtag/ticker mashups
+    invalid_pool = (
+        ["".join(random.choice(BASE58_ALPHABET[1:]) for _ in range(random.randint(32, 42))) for _ in range(300)]
+        + [address[:-3] for address in valid_pool[:100]]
+        + [_encode_base58(os.urandom(33)) for _ in range(100)]
+        + ["SolanaSuperCycleMemecoinSzn2025LFGxxx", "BonkDogWifHatPopcatMewFwogMichiGiga"]
+    )
+    fillers = ["to the moon 🚀", "don't miss out", "CA:", "gm", "100x gem", "ape now", "dyor", "#solana"]
+
+    tweets = []
+    for _ in range(100000):
+        words = random.sample(fillers, 3)
+        roll = random.random()
+        if roll < 0.3:
+            words.append(random.choice(valid_pool))
+        elif roll < 0.5:
+            words.append(random.choice(invalid_pool))
+        random.shuffle(words)
+        tweets.append(" ".join(words))
+
+    solana_pattern = r'\b[1-9A-HJ-NP-Za-km-z]{32,44}\b'
+    start = time.perf_counter()
+    legacy = [re.findall(solana_pattern, text) for text in tweets]
+    legacy_time = time.perf_counter() - start
+
+    is_valid_address.cache_clear()
+    start = time.perf_counter()
+    validated = extract_addresses_batch(tweets)
+    batch_time = time.perf_counter() - start
+
+    legacy_unique = {a for found in legacy for a in found}
+    validated_unique = {a for found in validated for a in found}
+    assert validated_unique <= set(valid_pool), "accepted an invalid address"
+    assert validated_unique == legacy_unique & set(valid_pool), "rejected a valid address"
+
+    print(f"Extracted addresses from {len(tweets)} tweets")
+    print(f"  Regex only:          {legacy_time * 1000:8.1f} ms, {len(legacy_unique)} unique candidates")
+    print(f"  Validated (batch):   {batch_time * 1000:8.1f} ms, {len(validated_unique)} unique valid addresses")
+    print(f"  Rejected candidates: {len(legacy_unique - validated_unique)} (each would have triggered a Solscan fetch)")
@@ -0,0 +1,124 @@
+"""Reuse of token analyses whose inputs have not changed.
+
+Every cycle re-fetches the tokens that are being promoted, and most of the time
+nothing has happened since the previous cycle. input_fingerprint hashes what the
+analysis depends on:
+
+- the transfer high-water mark: total transfers in the lookback window, the newest
+  block time and the transfer ids at that time
+- a hash of the holder snapshot (first holder page, holder count, supply)
+- the DeFi activity high-water mark (count and newest block time)
+- the set of tweets, including every copy behind a collapsed representative
+- the holders flagged by the bad wallet screening
+- the verdict backend, so a configuration change invalidates old results
+
+The fingerprint is stored in each saved analysis. lookup returns the previous result
+when the fingerprint matches, so an unchanged token costs neither heuristics, an LLM
+call nor a file write. Results older than ANALYSIS_REUSE_MAX_AGE_SECONDS are not
+reused, because promotion-ring membership and the 48 hour lookback window move on
+even when the token itself does not. Results whose AI verdict failed are never reused.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+ANALYSIS_DIR = "./data/analysis"
+# Summary used by pump_dump_analyzer for failed AI verdicts (such results are not reused)
+AI_FAILURE_SUMMARY = "AI analysis failed."
+
+_lock = threading.Lock()
+_recent: Dict[str, Dict[str, Any]] = {}
+
+def analysis_path(token_address: str) -> str:
+    """Returns the path of the saved analysis for a token."""
+    clean_address = token_address.replace("/", "_").replace(":", "_")
+    return os.path.join(ANALYSIS_DIR, f"token_{clean_address}_analysis.json")
+
+def _digest(value: Any) -> str:
+    """Short stable hash of a JSON-serializable value."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+def input_fingerprint(token_data: Dict[str, Any], extracted_tweets: List[Dict[str, Any]] = None) -> str:
+    """Fingerprints the inputs of a token analysis."""
+    transfers = token_data.get('raw_transactions') or []
+    times = [tx.get('block_time', tx.get('blockTime')) or 0 for tx in transfers]
+    newest = max(times, default=0)
+    newest_ids = sorted(str(tx.get('trans_id', '')) for tx, t in zip(transfers, times) if t == newest)
+
+    metadata = token_data.get('metadata') or {}
+    holders = sorted((str(h.get('owner')), str(h.get('amount'))) for h in (token_data.get('holders_page_1') or []))
+    activities = token_data.get('defi_activities_page_1') or []
+
+    tweet_keys = set()
+    for tweet in extracted_tweets or []:
+        tweet_keys.update(tweet.get('duplicate_ids') or [str(tweet.get('id') or tweet.get('url') or '')])
+
+    return _digest({
+        "backend": settings.ANALYSIS_BACKEND,
+        "transfers": [token_data.get('total_transactions', len(transfers)), newest, newest_ids],
+        "holders": _digest([metadata.get('holder'), metadata.get('supply'), holders]),
+        "defi": [len(activities), max((a.get('block_time') or 0 for a in activities), default=0)],
+        "tweets": _digest(sorted(tweet_keys)),
+        "bad_holders": sorted(token_data.get('known_bad_holders') or [])
+    })
+
+def _load(token_address: str) -> Optional[Dict[str, Any]]:
+    """Reads the saved analysis of a token, if any."""
+    path = analysis_path(token_address)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Error loading saved analysis for {token_address}: {e}")
+        return None
+
+def is_reusable(result: Dict[str, Any]) -> bool:
+    """Whether a result may be reused for the same inputs."""
+    return (result.get("ai_analysis") or {}).get("summary") != AI_FAILURE_SUMMARY
+
+def lookup(token_address: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Returns a copy of the previous analysis if it was made from the same inputs.
+
+    The copy is marked with "reused_analysis": True so callers can skip repeat alerts.
+    """
+    with _lock:
+        result = _recent.get(token_address)
+    if result is None:
+        result = _load(token_address)
+        if result is None:
+            return None
+        with _lock:
+            _recent[token_address] = result
+
+    if result.get("input_fingerprint") != fingerprint:
+        return None
+    age = time.time() - result.get("analyzed_at", 0)
+    if settings.ANALYSIS_REUSE_MAX_AGE_SECONDS and age > settings.ANALYSIS_REUSE_MAX_AGE_SECONDS:
+        return None
+    logger.info(f"Reusing analysis of {token_address} from {age / 60:.0f} min ago (inputs unchanged)")
+    reused = copy.deepcopy(result)
+    reused["reused_analysis"] = True
+    return reused
+
+def remember(result: Dict[str, Any], fingerprint: str) -> None:
+    """Stamps a fresh result with its fingerprint and keeps it for the next cycle."""
+    if not is_reusable(result):
+        return
+    result["input_fingerprint"] = fingerprint
+    result["analyzed_at"] = time.time()
+    with _lock:
+        _recent[result.get("token_address", "Unknown")] = copy.deepcopy(result)
@@ -1,34 +1,41 @@
 """Correlation engine for analyzing social sentiment and on-chain activity."""
 
 import logging
-import re
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Dict, Any, Optional, Tuple
-import openai
 
 from config import settings
+from correlation_engine import address_extractor
+from correlation_engine import prompt_budget
+from correlation_engine import llm_client
+from correlation_engine import cross_correlation
+from onchain_monitor import anomaly_detector
+from onchain_monitor import volume_buckets
 
 logging.basicConfig(level=settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 def extract_solana_address(text: str) -> List[str]:
-    """Extract potential Solana addresses from text using regex.
+    """Extract Solana addresses from text.
     
     Args:
         text: The text to analyze.
         
     Returns:
-        A list of potential Solana addresses found in the text.
+        A list of the valid Solana addresses (base58 strings decoding to 32-byte keys) found in the text.
     """
-    # Solana addresses are Base58 encoded and typically 32-44 characters
-    # This is a basic regex and may need refinement
-    solana_pattern = r'\b[1-9A-HJ-NP-Za-km-z]{32,44}\b'
-    addresses = re.findall(solana_pattern, text)
-    return addresses
+    return address_extractor.extract_addresses(text)
 
 def analyze_tweet_with_ai(tweets: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Uses GPT-4o-mini to **only extract Solana token addresses** from tweets.
     
+    Addresses the validated regex extractor resolves are taken as-is. Only tweets it
+    cannot resolve confidently (see address_extractor.needs_llm) are sent to the LLM,
+    in batches packed up to LLM_EXTRACTION_TOKEN_BUDGET estimated prompt tokens.
+    
     Args:
         tweets: A list of tweet objects from the Twitter API.
         
@@ -46,84 +53,57 @@ def analyze_tweet_with_ai(tweets: List[Dict[str, Any]]) -> Dict[str, Any]:
             "extracted_addresses": []
         }
     
-    # Use fallback regex extraction if AI key is missing
-    if not settings.OPENAI_API_KEY or settings.OPENAI_API_KEY == "YOUR_OPENAI_API_KEY":
-        logger.warning("OpenAI API key not configured. Using regex for address extraction.")
-        all_extracted_addresses = []
-        for tweet in tweets:
-            text = tweet.get('text', '')
-            regex_addresses = extract_solana_address(text)
-            if regex_addresses:
-                all_extracted_addresses.extend(regex_addresses)
-        unique_addresses = list(set(all_extracted_addresses))
-        logger.info(f"Regex extraction found {len(unique_addresses)} unique potential addresses.")
-        return {
-            "average_sentiment": 0.0, 
-            "positive_count": 0, 
-            "negative_count": 0, 
-            "neutral_count": 0,
-            "potential_pump_tweets": [],
-            "extracted_addresses": unique_addresses
-        }
-    
-    client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+    # Resolve what the validated regex extractor can; only the rest goes to the LLM
+    texts = [tweet.get('text', '') for tweet in tweets]
+    regex_addresses = address_extractor.extract_addresses_batch(texts)
+    all_extracted_addresses = [address for found in regex_addresses for address in found]
+    ambiguous_texts = [text for text, found in zip(texts, regex_addresses) if address_extractor.needs_llm(text, found)]
+    logger.info(f"Regex extraction resolved {len(set(all_extracted_addresses))} addresses; "
+                f"{len(ambiguous_texts)} of {len(tweets)} tweets need AI extraction.")
     
-    # Combined extraction results
-    all_extracted_addresses = []
+    # Use regex extraction only if AI key is missing
+    if ambiguous_texts and not llm_client.is_configured():
+        logger.warning("OpenAI API key not configured. Using regex for address extraction.")
+        ambiguous_texts = []
     
-    # Process tweets in batches
-    batch_size = 10 # Can likely use a larger batch now
-    for i in range(0, len(tweets), batch_size):
-        batch = tweets[i:i+batch_size]
-        batch_texts = [tweet.get('text', '') for tweet in batch]
-        
-        # Simplified prompt for address extraction ONLY
-        prompt = """
+    # Simplified prompt for address extraction ONLY
+    prompt_header = """
         Analyze the following tweets and extract ONLY the Solana token addresses (typically Base58 encoded strings of 32-44 characters) mentioned within them. Ignore any partial addresses or addresses from other blockchains.
         
         Return a single JSON object with one key: "extracted_addresses", which is an array of all unique Solana addresses found across all provided tweets.
         
         TWEETS:
         """
-        
-        for j, text in enumerate(batch_texts):
-            prompt += f"\n\nTweet {j+1}: {text}"
-        
-        try:
-            response = client.chat.completions.create(
-                model=settings.AI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an AI assistant that extracts Solana token addresses from text. Provide the output as a JSON object containing an array under the key 'extracted_addresses'."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"} 
-            )
-            
-            # Parse and process the AI response
-            try:
-                analysis = json.loads(response.choices[0].message.content)
-                addresses = analysis.get('extracted_addresses', [])
-                if addresses:
-                    all_extracted_addresses.extend(addresses)
-                
-            except (json.JSONDecodeError, AttributeError) as e:
-                logger.error(f"Error parsing AI response for address extraction: {e}")
-                # Fallback: use regex for this batch
-                for text in batch_texts:
-                    regex_addresses = extract_solana_address(text)
-                    if regex_addresses:
-                        all_extracted_addresses.extend(regex_addresses)
-                        
-        except Exception as e:
-            logger.error(f"Error using OpenAI API for address extraction: {e}")
-            # Fallback: use regex for this batch
-            for text in batch_texts:
-                regex_addresses = extract_solana_address(text)
-                if regex_addresses:
-                    all_extracted_addresses.extend(regex_addresses)
-    
-    # Deduplicate addresses
-    unique_addresses = list(set(all_extracted_addresses))
+    system_message = "You are an AI assistant that extracts Solana token addresses from text. Provide the output as a JSON object containing an array under the key 'extracted_addresses'."
+    
+    # Pack batches by estimated prompt tokens rather than by tweet count
+    batches = prompt_budget.pack_by_token_budget(
+        ambiguous_texts,
+        budget=settings.LLM_EXTRACTION_TOKEN_BUDGET,
+        overhead_tokens=prompt_budget.estimate_tokens(prompt_header + system_message),
+        per_item_overhead=prompt_budget.estimate_tokens("\n\nTweet 10: ")
+    )
+    
+    # Send all batches concurrently through the shared client
+    llm_requests = []
+    for batch in batches:
+        prompt = prompt_header
+        for j, index in enumerate(batch):
+            prompt += f"\n\nTweet {j+1}: {ambiguous_texts[index]}"
+        llm_requests.append({"system": system_message, "user": prompt})
+    
+    for analysis in llm_client.run_concurrent(llm_requests):
+        if isinstance(analysis, json.JSONDecodeError):
+            logger.error(f"Error parsing AI response for address extraction: {analysis}")
+        elif isinstance(analysis, Exception):
+            logger.error(f"Error using OpenAI API for address extraction: {analysis}")
+        else:
+            addresses = analysis.get('extracted_addresses', [])
+            if addresses:
+                all_extracted_addresses.extend(addresses)
+    
+    # Deduplicate addresses and drop anything that is not a real 32-byte key
+    unique_addresses = address_extractor.filter_valid(all_extracted_addresses)
     
     logger.info(f"Address extraction complete: Found {len(unique_addresses)} unique potential addresses.")
     
@@ -137,15 +117,109 @@ def analyze_tweet_with_ai(tweets: List[Dict[str, Any]]) -> Dict[str, Any]:
         "extracted_addresses": unique_addresses
     }
 
-def analyze_onchain_activity(transfers: List[Dict[str, Any]], addresses: List[str]=None) -> Dict[str, Any]:
+def partition_transfers(transfers: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Groups transfers by token address."""
+    partitions: Dict[str, List[Dict[str, Any]]] = {}
+    for tx in transfers:
+        partitions.setdefault(tx.get('token_address') or tx.get('mint') or 'unknown', []).append(tx)
+    return partitions
+
+def analyze_token_activity(token: str, transfers: List[Dict[str, Any]],
+                           anomaly_state: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Analyzes the transfers of a single token.
+    
+    Depends only on its arguments, so partitions can run in worker processes.
+    
+    Args:
+        token: Token address of the partition.
+        transfers: Transfers of this token only.
+        anomaly_state: The token's anomaly detector state (from anomaly_detector.export_states).
+        
+    Returns:
+        (per-token result, updated anomaly detector state)
+    """
+    total_volume = 0.0
+    senders = set()
+    receivers = set()
+    for tx in transfers:
+        # Extract basic info (v2 transfers use from_address/to_address, older ones src/dst)
+        try:
+            sender = tx.get('from_address', tx.get('src', tx.get('from', '')))
+            receiver = tx.get('to_address', tx.get('dst', tx.get('to', '')))
+            total_volume += float(tx.get('amount', tx.get('lamport', 0)))
+            if sender:
+                senders.add(sender)
+            if receiver:
+                receivers.add(receiver)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Error processing transfer data: {e}")
+    
+    # Volume spikes and outsized transfers relative to the token's own rolling baseline
+    unusual_patterns, anomaly_state = anomaly_detector.process_partition(token, transfers, anomaly_state)
+    
+    # Short pumps within this batch that hourly buckets would average away
+    volumes = volume_buckets.MultiResolutionVolume().add_transfers(transfers)
+    for resolution, spike in volume_buckets.detect_spikes(volumes).items():
+        if spike and resolution != "1h":  # Hourly spikes come from the anomaly detector
+            unusual_patterns.append({
+                'type': 'volume_spike',
+                'token': token,
+                'resolution': resolution,
+                'bucket_start': spike['bucket'],
+                'current_volume': spike['volume'],
+                'previous_volume': spike['baseline'],
+                'increase_factor': spike['factor']
+            })
+    
+    result = {
+        "token": token,
+        "total_volume": total_volume,
+        "transfer_count": len(transfers),
+        "unique_senders": len(senders),
+        "unique_receivers": len(receivers),
+        "unusual_patterns": unusual_patterns
+    }
+    return result, anomaly_state
+
+def _analyze_partitions(partitions: Dict[str, List[Dict[str, Any]]],
+                        states: Dict[str, Optional[Dict[str, Any]]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Runs analyze_token_activity for every partition, in worker processes when it pays off."""
+    tokens = list(partitions)
+    workers = settings.ONCHAIN_ANALYSIS_WORKERS or os.cpu_count() or 1
+    workers = min(workers, len(tokens))
+    transfer_count = sum(len(partition) for partition in partitions.values())
+    
+    if workers > 1 and transfer_count >= settings.ONCHAIN_PARALLEL_MIN_TRANSFERS:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Larger partitions first so a big token does not start last
+                ordered = sorted(tokens, key=lambda token: len(partitions[token]), reverse=True)
+                futures = {token: executor.submit(analyze_token_activity, token, partitions[token], states.get(token))
+                           for token in ordered}
+                return [futures[token].result() for token in tokens]
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning(f"Parallel on-chain analysis failed ({e}); analyzing partitions in-process")
+    
+    return [analyze_token_activity(token, partitions[token], states.get(token)) for token in tokens]
+
+def analyze_onchain_activity(transfers: List[Dict[str, Any]], addresses: List[str]=None,
+                             tweets_by_token: Dict[str, List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """Analyzes on-chain activity from a list of transfers, focusing on potential pump and dump patterns.
     
+    Transfers are partitioned by token and each partition is analyzed on its own, so
+    volumes and spikes of unrelated tokens never mix. Large batches are spread over
+    ONCHAIN_ANALYSIS_WORKERS processes. Large transfers and volume spikes are judged
+    against each token's rolling baseline in onchain_monitor.anomaly_detector, which is
+    kept across cycles.
+    
     Args:
         transfers: A list of transfer objects from Solscan.
         addresses: Optional list of addresses to specifically analyze.
+        tweets_by_token: Optional tweets per token address, joined into the per-token results.
         
     Returns:
-        A dictionary containing activity analysis results.
+        A dictionary containing activity analysis results. Totals cover all tokens;
+        "tokens" holds the result of each token, including its tweet counts.
     """
     if not transfers:
         return {
@@ -153,71 +227,38 @@ def analyze_onchain_activity(transfers: List[Dict[str, Any]], addresses: List[st
             "transfer_count": 0, 
             "unique_senders": 0, 
             "unique_receivers": 0,
-            "unusual_patterns": []
+            "unusual_patterns": [],
+            "tokens": {}
         }
 
-    logger.info(f"Analyzing on-chain activity for {len(transfers)} transfers...")
-    
-    # Basic metrics
-    transfer_count = len(transfers)
+    partitions = partition_transfers(transfers)
+    logger.info(f"Analyzing on-chain activity for {len(transfers)} transfers across {len(partitions)} tokens...")
+    
+    states = anomaly_detector.export_states(list(partitions))
+    results = _analyze_partitions(partitions, states)
+    anomaly_detector.import_states({result["token"]: state for result, state in results})
+    anomaly_detector.save()
+    
+    # Join each token's findings with the tweets that mention it
+    tweets_by_token = tweets_by_token or {}
+    token_results = {}
+    for result, _ in results:
+        token_tweets = tweets_by_token.get(result["token"], [])
+        result["distinct_messages"] = len(token_tweets)
+        result["tweet_count"] = sum(t.get('duplicate_count', 1) for t in token_tweets)
+        token_results[result["token"]] = result
     
-    # Initialize placeholders for metrics we'll try to extract
-    total_volume = 0.0
     senders = set()
     receivers = set()
-    unusual_patterns = []
-    
-    # Track time-based patterns (needs actual timestamps in the transfers)
-    # This would be more robust in a real implementation
-    volume_by_hour = {}
-    
     for tx in transfers:
-        # Extract basic info - you'll need to adjust based on actual Solscan response format
-        try:
-            # Example fields - adjust based on actual Solscan response format
-            sender = tx.get('src', tx.get('from', ''))
-            receiver = tx.get('dst', tx.get('to', ''))
-            amount = float(tx.get('amount', tx.get('lamport', 0)))
-            timestamp = tx.get('blockTime', 0)  # Unix timestamp
-            
-            # Add to basic metrics
-            total_volume += amount
-            if sender:
-                senders.add(sender)
-            if receiver:
-                receivers.add(receiver)
-                
-            # Group by hour for trend analysis
-            hour = timestamp // 3600  # Convert to hours
-            volume_by_hour[hour] = volume_by_hour.get(hour, 0) + amount
-            
-            # Look for large transfers - potential dumps
-            if amount > 1000:  # Adjust threshold as needed
-                unusual_patterns.append({
-                    'type': 'large_transfer',
-                    'sender': sender,
-                    'receiver': receiver,
-                    'amount': amount,
-                    'timestamp': timestamp
-                })
-                
-        except (ValueError, TypeError) as e:
-            logger.error(f"Error processing transfer data: {e}")
+        senders.add(tx.get('from_address', tx.get('src', tx.get('from', ''))))
+        receivers.add(tx.get('to_address', tx.get('dst', tx.get('to', ''))))
+    senders.discard('')
+    receivers.discard('')
     
-    # Analyze for volume spikes - this is simplistic, would be more robust with historical data
-    if len(volume_by_hour) > 1:
-        hours = sorted(volume_by_hour.keys())
-        for i in range(1, len(hours)):
-            curr_vol = volume_by_hour[hours[i]]
-            prev_vol = volume_by_hour[hours[i-1]]
-            if prev_vol > 0 and curr_vol / prev_vol > settings.VOLUME_SPIKE_THRESHOLD_PERCENT / 100:
-                unusual_patterns.append({
-                    'type': 'volume_spike',
-                    'hour': hours[i],
-                    'current_volume': curr_vol,
-                    'previous_volume': prev_vol,
-                    'increase_factor': curr_vol / prev_vol
-                })
+    transfer_count = len(transfers)
+    total_volume = sum(result["total_volume"] for result in token_results.values())
+    unusual_patterns = [pattern for result in token_results.values() for pattern in result["unusual_patterns"]]
     
     logger.info(f"On-chain analysis complete: Count={transfer_count}, Volume={total_volume:.2f}, Senders={len(senders)}, Receivers={len(receivers)}, Unusual patterns={len(unusual_patterns)}")
     
@@ -226,7 +267,8 @@ def analyze_onchain_activity(transfers: List[Dict[str, Any]], addresses: List[st
         "transfer_count": transfer_count,
         "unique_senders": len(senders),
         "unique_receivers": len(receivers),
-        "unusual_patterns": unusual_patterns
+        "unusual_patterns": unusual_patterns,
+        "tokens": token_results
     }
 
 def correlate_with_ai(tweet_analysis: Dict[str, Any], onchain_analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -237,16 +279,23 @@ def correlate_with_ai(tweet_analysis: Dict[str, Any], onchain_analysis: Dict[str
         onchain_analysis: Results from analyze_onchain_activity.
         
     Returns:
-        A list of correlation findings, with confidence scores and details.
+        A list of correlation findings, with confidence scores and details. Significant
+        time-lagged correlations from onchain_analysis["social_correlation"] come first.
     """
+    social_correlation = onchain_analysis.get("social_correlation", [])
+    numeric_findings = cross_correlation.to_findings(social_correlation)
+    for finding in numeric_findings:
+        logger.info(f"Cross-correlation finding: {finding['description']}")
+
     if not tweet_analysis.get("potential_pump_tweets") or not onchain_analysis.get("transfer_count"):
-        logger.info("Insufficient data for correlation analysis.")
-        return []
+        if not numeric_findings:
+            logger.info("Insufficient data for correlation analysis.")
+        return numeric_findings
     
-    if not settings.OPENAI_API_KEY or settings.OPENAI_API_KEY == "YOUR_OPENAI_API_KEY":
+    if not llm_client.is_configured():
         logger.warning("OpenAI API key not configured. Using simplified correlation logic.")
         # Fall back to simpler heuristics
-        correlations = []
+        correlations = list(numeric_findings)
         
         # Simple rule: If high sentiment and unusual patterns detected
         if (tweet_analysis.get("average_sentiment", 0) > settings.SENTIMENT_SPIKE_THRESHOLD and 
@@ -267,8 +316,6 @@ def correlate_with_ai(tweet_analysis: Dict[str, Any], onchain_analysis: Dict[str
         return correlations
     
     # If we have OpenAI API key, use GPT-4o-mini for correlation
-    client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-    
     # Prepare the data for the AI prompt
     tweet_data = {
         "average_pump_score": tweet_analysis.get("average_sentiment", 0),
@@ -284,7 +331,11 @@ def correlate_with_ai(tweet_analysis: Dict[str, Any], onchain_analysis: Dict[str
         "unique_senders": onchain_analysis.get("unique_senders", 0),
         "unique_receivers": onchain_analysis.get("unique_receivers", 0),
         "unusual_patterns_count": len(onchain_analysis.get("unusual_patterns", [])),
-        "unusual_patterns_samples": onchain_analysis.get("unusual_patterns", [])[:3]  # Limit to 3 samples for prompt size
+        "unusual_patterns_samples": onchain_analysis.get("unusual_patterns", [])[:3],  # Limit to 3 samples for prompt size
+        "lagged_correlations": [
+            {key: r[key] for key in ("token", "correlation", "best_lag_minutes", "leader", "mentions", "transfers")}
+            for r in social_correlation[:5]
+        ]
     }
     
     prompt = f"""
@@ -311,6 +362,10 @@ def correlate_with_ai(tweet_analysis: Dict[str, Any], onchain_analysis: Dict[str
     Sample unusual patterns:
     {json.dumps(onchain_data['unusual_patterns_samples'], indent=2)}
     
+    Time-lagged correlation of tweet mentions and transfer volume per token
+    (best_lag_minutes > 0 means volume followed the promotion by that many minutes):
+    {json.dumps(onchain_data['lagged_correlations'], indent=2)}
+    
     Based on this data, determine if there is evidence of a pump and dump scheme. Consider:
     1. High social media hype coinciding with unusual trading patterns
     2. Promises of huge returns paired with concentrated selling
@@ -325,37 +380,31 @@ def correlate_with_ai(tweet_analysis: Dict[str, Any], onchain_analysis: Dict[str
     """
     
     try:
-        response = client.chat.completions.create(
+        analysis = llm_client.chat_json(
+            system="You are a cryptocurrency fraud detection expert that analyzes social media and blockchain data to identify pump and dump schemes.",
+            user=prompt,
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a cryptocurrency fraud detection expert that analyzes social media and blockchain data to identify pump and dump schemes."},
-                {"role": "user", "content": prompt}
-            ],
             temperature=0.2,
-            response_format={"type": "json_object"},
             max_tokens=800
         )
+        findings = analysis.get('findings', [])
         
-        try:
-            analysis = json.loads(response.choices[0].message.content)
-            findings = analysis.get('findings', [])
-            
-            # Log and return findings
-            for finding in findings:
-                if finding.get('is_pump_and_dump', False) and finding.get('confidence', 0) > 0.5:
-                    logger.warning(f"AI detected potential pump and dump: {finding.get('description')} (confidence: {finding.get('confidence'):.2f})")
-                else:
-                    logger.info(f"AI correlation finding: {finding.get('description')} (confidence: {finding.get('confidence'):.2f})")
-            
-            return findings
-            
-        except (json.JSONDecodeError, AttributeError) as e:
-            logger.error(f"Error parsing AI correlation response: {e}")
-            return []
+        # Log and return findings
+        for finding in findings:
+            if finding.get('is_pump_and_dump', False) and finding.get('confidence', 0) > 0.5:
+                logger.warning(f"AI detected potential pump and dump: {finding.get('description')} (confidence: {finding.get('confidence'):.2f})")
+            else:
+                logger.info(f"AI correlation finding: {finding.get('description')} (confidence: {finding.get('confidence'):.2f})")
+        
+        return numeric_findings + findings
+        
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.error(f"Error parsing AI correlation response: {e}")
+        return numeric_findings
             
     except Exception as e:
         logger.error(f"Error using OpenAI API for correlation: {e}")
-        return []
+        return numeric_findings
 
 def find_correlations(sentiment_data: Dict[str, Any], onchain_data: Dict[str, Any]) -> List[Dict[str, Any]]:
     """Legacy function - now serves as wrapper around correlate_with_ai to maintain compatibility.
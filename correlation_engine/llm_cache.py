@@ -0,0 +1,169 @@
+"""Persistent, content-addressed cache of LLM responses.
+
+Each response is stored under the SHA-256 of everything that determines it: model,
+system prompt, user prompt, response_format and the remaining request parameters
+(temperature, max_tokens, ...). An unchanged tweet batch, token snapshot or correlation
+payload therefore hits the cache instead of paying for another completion.
+
+Entries expire after LLM_CACHE_TTL_SECONDS. The table is bounded to
+LLM_CACHE_MAX_ENTRIES rows, evicting the least recently used entries first. Hit/miss
+counts are kept per process and can be read with stats().
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used);
+"""
+
+_connection: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evicted": 0}
+
+def is_enabled() -> bool:
+    """True unless caching is switched off (LLM_CACHE_MAX_ENTRIES or LLM_CACHE_TTL_SECONDS set to 0)."""
+    return settings.LLM_CACHE_MAX_ENTRIES > 0 and settings.LLM_CACHE_TTL_SECONDS > 0
+
+def _get_connection() -> sqlite3.Connection:
+    """Opens (once) the cache database and makes sure the schema exists."""
+    global _connection
+    if _connection is None:
+        db_dir = os.path.dirname(settings.LLM_CACHE_PATH)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        _connection = sqlite3.connect(settings.LLM_CACHE_PATH, check_same_thread=False)
+        _connection.executescript(_SCHEMA)
+    return _connection
+
+def make_key(model: str, system: str, user: str, response_format: Optional[Dict[str, Any]] = None,
+             params: Optional[Dict[str, Any]] = None) -> str:
+    """Returns the cache key for a request.
+
+    Args:
+        model: Model name.
+        system: System prompt.
+        user: User prompt.
+        response_format: The response_format argument, if any.
+        params: Any other parameters that change the output (temperature, max_tokens, ...).
+    """
+    payload = json.dumps([model, system, user, response_format, params or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get(key: str) -> Optional[str]:
+    """Returns the cached response for a key, or None on a miss or expired entry."""
+    if not is_enabled():
+        return None
+    now = time.time()
+    with _lock:
+        try:
+            conn = _get_connection()
+            row = conn.execute("SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                _stats["misses"] += 1
+                return None
+            response, created_at = row
+            with conn:
+                if now - created_at > settings.LLM_CACHE_TTL_SECONDS:
+                    conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    _stats["expired"] += 1
+                    _stats["misses"] += 1
+                    return None
+                conn.execute("UPDATE llm_responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            _stats["hits"] += 1
+            return response
+        except sqlite3.Error as e:
+            logger.error(f"Error reading LLM cache: {e}")
+            return None
+
+def put(key: str, model: str, response: str) -> None:
+    """Stores a response and evicts the least recently used entries beyond LLM_CACHE_MAX_ENTRIES."""
+    if not is_enabled():
+        return
+    now = time.time()
+    with _lock:
+        try:
+            conn = _get_connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, last_used, hits) VALUES (?, ?, ?, ?, ?, 0)",
+                    (key, model, response, now, now)
+                )
+                _stats["stores"] += 1
+                count = conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+                excess = count - settings.LLM_CACHE_MAX_ENTRIES
+                if excess > 0:
+                    conn.execute(
+                        "DELETE FROM llm_responses WHERE key IN (SELECT key FROM llm_responses ORDER BY last_used LIMIT ?)",
+                        (excess,)
+                    )
+                    _stats["evicted"] += excess
+        except sqlite3.Error as e:
+            logger.error(f"Error writing LLM cache: {e}")
+
+def purge_expired() -> int:
+    """Deletes expired entries and returns how many were removed."""
+    if not is_enabled():
+        return 0
+    cutoff = time.time() - settings.LLM_CACHE_TTL_SECONDS
+    with _lock:
+        try:
+            conn = _get_connection()
+            with conn:
+                removed = conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (cutoff,)).rowcount
+            _stats["expired"] += removed
+            return removed
+        except sqlite3.Error as e:
+            logger.error(f"Error purging LLM cache: {e}")
+            return 0
+
+def stats() -> Dict[str, Any]:
+    """Returns hit/miss counters for this process plus the current number of entries."""
+    with _lock:
+        result = dict(_stats)
+        entries = 0
+        # Counting entries should not create an empty cache database
+        if is_enabled() and (_connection is not None or os.path.exists(settings.LLM_CACHE_PATH)):
+            try:
+                entries = _get_connection().execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            except sqlite3.Error as e:
+                logger.error(f"Error reading LLM cache size: {e}")
+    lookups = result["hits"] + result["misses"]
+    result["entries"] = entries
+    result["hit_rate"] = result["hits"] / lookups if lookups else 0.0
+    return result
+
+def log_stats() -> None:
+    """Logs the cache hit rate if there were any lookups."""
+    current = stats()
+    if current["hits"] or current["misses"]:
+        logger.info(f"LLM cache: {current['hits']} hits, {current['misses']} misses "
+                    f"({current['hit_rate']:.0%} hit rate), {current['entries']} entries, {current['evicted']} evicted")
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    purge_expired()
+    current = stats()
+    print(f"LLM cache at {settings.LLM_CACHE_PATH}: {current['entries']} entries "
+          f"(TTL {settings.LLM_CACHE_TTL_SECONDS}s, max {settings.LLM_CACHE_MAX_ENTRIES})")
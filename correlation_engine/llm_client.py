@@ -0,0 +1,153 @@
+"""Shared LLM execution layer.
+
+All OpenAI calls go through one client instance. run_concurrent sends a list of
+requests in parallel, at most LLM_MAX_CONCURRENT_REQUESTS at a time, and returns the
+results in request order, so a cycle with N prompts takes about one round trip
+instead of N. Requests are spaced to stay under LLM_REQUESTS_PER_MINUTE (if set), and
+rate-limit, timeout and connection errors are retried with exponential backoff.
+Responses to repeated requests are served from llm_cache.
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Union
+
+import openai
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+from config import settings
+from correlation_engine import llm_cache
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+_client: Optional[openai.OpenAI] = None
+_client_lock = threading.Lock()
+
+# Request spacing for LLM_REQUESTS_PER_MINUTE
+_rate_lock = threading.Lock()
+_next_request_time = 0.0
+
+def is_configured() -> bool:
+    """True if an OpenAI API key is set."""
+    return bool(settings.OPENAI_API_KEY) and settings.OPENAI_API_KEY != "YOUR_OPENAI_API_KEY"
+
+def get_client() -> openai.OpenAI:
+    """Returns the shared OpenAI client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Retries are handled below so they also respect the request spacing
+            _client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+        return _client
+
+def _wait_for_rate_limit() -> None:
+    """Blocks until the next request may start under LLM_REQUESTS_PER_MINUTE."""
+    global _next_request_time
+    if settings.LLM_REQUESTS_PER_MINUTE <= 0:
+        return
+    interval = 60.0 / settings.LLM_REQUESTS_PER_MINUTE
+    with _rate_lock:
+        now = time.monotonic()
+        start = max(now, _next_request_time)
+        _next_request_time = start + interval
+    if start > now:
+        time.sleep(start - now)
+
+@retry(
+    retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)),
+    stop=stop_after_attempt(4),
+    wait=wait_exponential(multiplier=1, min=2, max=30),
+    reraise=True,
+    before_sleep=lambda retry_state: logger.warning(
+        f"LLM call failed ({type(retry_state.outcome.exception()).__name__}), retrying in {retry_state.next_action.sleep} seconds..."
+    )
+)
+def chat_completion(messages: List[Dict[str, str]], model: str = None, **kwargs) -> str:
+    """Sends one chat completion request and returns the message content.
+
+    Args:
+        messages: Chat messages.
+        model: Model name (defaults to AI_MODEL).
+        **kwargs: Extra arguments for chat.completions.create (temperature, response_format, ...).
+    """
+    _wait_for_rate_limit()
+    response = get_client().chat.completions.create(
+        model=model or settings.AI_MODEL,
+        messages=messages,
+        **kwargs
+    )
+    return response.choices[0].message.content
+
+def chat_json(system: str, user: str, model: str = None, use_cache: bool = True, **kwargs) -> Dict[str, Any]:
+    """Sends a system + user prompt in JSON mode and returns the parsed JSON object.
+
+    Identical requests are answered from llm_cache while the cached response is fresh.
+
+    Args:
+        system: System prompt.
+        user: User prompt.
+        model: Model name (defaults to AI_MODEL).
+        use_cache: Set to False to always call the API (the response is still cached).
+        **kwargs: Extra arguments for chat.completions.create.
+
+    Raises:
+        json.JSONDecodeError if the model returns invalid JSON, or the OpenAI error after retries.
+    """
+    model = model or settings.AI_MODEL
+    response_format = {"type": "json_object"}
+    key = llm_cache.make_key(model, system, user, response_format, kwargs)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            try:
+                return json.loads(cached)
+            except json.JSONDecodeError:
+                logger.warning("Ignoring unparseable cached LLM response")
+
+    content = chat_completion(
+        [{"role": "system", "content": system}, {"role": "user", "content": user}],
+        model=model,
+        response_format=response_format,
+        **kwargs
+    )
+    result = json.loads(content)
+    # Only responses that parsed are worth replaying
+    llm_cache.put(key, model, content)
+    return result
+
+def run_concurrent(requests: List[Dict[str, Any]], max_workers: int = None) -> List[Union[Dict[str, Any], Exception]]:
+    """Runs several chat_json requests in parallel.
+
+    Args:
+        requests: Keyword arguments for chat_json, one dict per request.
+        max_workers: Maximum requests in flight (defaults to LLM_MAX_CONCURRENT_REQUESTS).
+
+    Returns:
+        One entry per request, in request order: the parsed JSON, or the exception
+        raised for that request, so callers can fall back per item.
+    """
+    if not requests:
+        return []
+    if max_workers is None:
+        max_workers = settings.LLM_MAX_CONCURRENT_REQUESTS
+
+    def run(request: Dict[str, Any]) -> Union[Dict[str, Any], Exception]:
+        try:
+            return chat_json(**request)
+        except Exception as e:
+            return e
+
+    if len(requests) == 1 or max_workers <= 1:
+        return [run(request) for request in requests]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(requests))) as executor:
+        results = list(executor.map(run, requests))
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    logger.info(f"Ran {len(requests)} LLM requests in {time.perf_counter() - start:.1f}s ({failed} failed)")
+    return results
@@ -0,0 +1,76 @@
+"""Prompt token estimates and token-budget batching for LLM calls.
+
+Token counts come from tiktoken when it is installed. Otherwise they are estimated
+from the UTF-8 length (about 4 bytes per token), which slightly overestimates
+emoji-heavy tweets rather than underestimating them.
+"""
+
+import logging
+from typing import List, Optional
+
+from config import settings
+
+# tiktoken is optional; without it token counts are estimated from the text length
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+_encoding = None
+
+def _get_encoding():
+    """Returns the tiktoken encoding for the configured model (loaded once)."""
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(settings.AI_MODEL)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("o200k_base")
+    return _encoding
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of prompt tokens for a text."""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        try:
+            return len(_get_encoding().encode(text))
+        except Exception as e:
+            logger.debug(f"tiktoken failed, falling back to length estimate: {e}")
+    return (len(text.encode("utf-8")) + 3) // 4
+
+def pack_by_token_budget(texts: List[str], budget: int, overhead_tokens: int = 0,
+                         per_item_overhead: int = 0, max_items: Optional[int] = None) -> List[List[int]]:
+    """Groups texts into batches whose estimated prompt size stays within a token budget.
+
+    Texts are packed greedily in order. A text that is too large for the budget on its
+    own still gets a batch of its own, so nothing is dropped.
+
+    Args:
+        texts: The texts to send.
+        budget: Maximum estimated prompt tokens per batch, including overhead.
+        overhead_tokens: Tokens used by the fixed part of the prompt (instructions, system message).
+        per_item_overhead: Extra tokens per text (numbering, separators).
+        max_items: Optional cap on texts per batch.
+
+    Returns:
+        Batches as lists of indices into texts.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = overhead_tokens
+    for index, text in enumerate(texts):
+        cost = estimate_tokens(text) + per_item_overhead
+        full = max_items is not None and len(current) >= max_items
+        if current and (used + cost > budget or full):
+            batches.append(current)
+            current, used = [], overhead_tokens
+        current.append(index)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
@@ -6,9 +6,18 @@ import os
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
-import openai
 
 from config import settings
+from correlation_engine import analysis_memo
+from correlation_engine import llm_client
+from correlation_engine import prompt_budget
+from correlation_engine import token_prompt
+from correlation_engine import verdict_backends
+from correlation_engine import wallet_stats
+from onchain_monitor import baseline_store
+from onchain_monitor import volume_buckets
+from social_aggregator import promotion_graph
+from social_aggregator import dedup
 
 # Configure logging
 logging.basicConfig(level=settings.LOG_LEVEL)
@@ -24,9 +33,80 @@ def analyze_token_transactions(token_data: Dict[str, Any], extracted_tweets: Lis
     Returns:
         Dictionary with analysis results
     """
+    # Nothing changed since the last analysis of this token: reuse it
+    fingerprint = analysis_memo.input_fingerprint(token_data, extracted_tweets) if token_data else None
+    if fingerprint:
+        previous = analysis_memo.lookup(token_data.get("token_address", "Unknown"), fingerprint)
+        if previous:
+            return previous
+    
+    result, needs_verdict = _heuristic_analysis(token_data, extracted_tweets)
+    if not needs_verdict:
+        return result
+    
+    # Second opinion from the configured backend (local model and/or AI)
+    verdict = {}
+    try:
+        verdict = verdict_backends.get_verdict(token_data, extracted_tweets, result)
+    except Exception as e:
+        logger.error(f"Error in {settings.ANALYSIS_BACKEND} verdict analysis: {e}")
+    
+    _apply_verdict(result, verdict)
+    analysis_memo.remember(result, fingerprint)
+    _save_analysis(result)
+    return result
+
+def analyze_token_transactions_batch(items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """Analyzes several tokens at once, sharing LLM requests between them.
+    
+    Tokens whose inputs are unchanged since their last analysis reuse it. The heuristics
+    run per token as in analyze_token_transactions; the tokens that need an LLM verdict
+    are then sent together through analyze_with_ai_batch.
+    
+    Args:
+        items: (token_data, extracted_tweets) pairs
+        
+    Returns:
+        One analysis result per item, in input order
+    """
+    results = []
+    fingerprints = []
+    pending = []
+    for index, (token_data, extracted_tweets) in enumerate(items):
+        fingerprint = analysis_memo.input_fingerprint(token_data, extracted_tweets) if token_data else None
+        fingerprints.append(fingerprint)
+        previous = analysis_memo.lookup(token_data.get("token_address", "Unknown"), fingerprint) if fingerprint else None
+        if previous:
+            results.append(previous)
+            continue
+        result, needs_verdict = _heuristic_analysis(token_data, extracted_tweets)
+        results.append(result)
+        if needs_verdict:
+            pending.append(index)
+    
+    verdicts = [{}] * len(pending)
+    if pending:
+        try:
+            verdicts = verdict_backends.get_verdicts([items[i] for i in pending], [results[i] for i in pending])
+        except Exception as e:
+            logger.error(f"Error in {settings.ANALYSIS_BACKEND} batch verdict analysis: {e}")
+    
+    for index, verdict in zip(pending, verdicts):
+        _apply_verdict(results[index], verdict)
+        analysis_memo.remember(results[index], fingerprints[index])
+        _save_analysis(results[index])
+    return results
+
+def _heuristic_analysis(token_data: Dict[str, Any], extracted_tweets: List[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+    """Computes the heuristic signals and preliminary verdict for a token.
+    
+    Returns:
+        (result, needs_verdict); needs_verdict is False when there is too little data
+        to analyze and the result is final.
+    """
     if not token_data:
         logger.warning("No token data provided for analysis")
-        return {"is_pump_dump": False, "confidence": 0, "reason": "No transaction data provided"}
+        return {"is_pump_dump": False, "confidence": 0, "reason": "No transaction data provided"}, False
     
     # Extract key metrics
     token_address = token_data.get("token_address", "Unknown")
@@ -42,7 +122,7 @@ def analyze_token_transactions(token_data: Dict[str, Any], extracted_tweets: Lis
             "is_pump_dump": False, 
             "confidence": 0.1, 
             "reason": f"Insufficient data: only {total_txns} transactions found"
-        }
+        }, False
     
     # Convert hourly volumes to a time series for analysis
     hourly_volumes = token_data.get("hourly_volumes", {})
@@ -51,65 +131,62 @@ def analyze_token_transactions(token_data: Dict[str, Any], extracted_tweets: Lis
         hour_dt = datetime.fromtimestamp(float(hour_ts))
         volume_data.append({"timestamp": hour_dt.isoformat(), "volume": volume})
     
-    # Check for volume spikes (simple heuristic)
-    has_volume_spike = False
+    # Check for volume spikes at every resolution (1m, 5m, 1h), so short pumps are not averaged away
+    if token_data.get("volume_buckets"):
+        volumes = volume_buckets.MultiResolutionVolume.from_dict(token_data["volume_buckets"])
+    else:
+        # Older data files only carry hourly volumes
+        volumes = volume_buckets.MultiResolutionVolume({"1h": volume_buckets.RESOLUTIONS["1h"]})
+        for hour_ts, volume in hourly_volumes.items():
+            volumes.add(float(hour_ts), float(volume))
+    # Spike factors and whale thresholds adapt to the token's (or its cohort's) history
+    created_time = (token_data.get("metadata") or {}).get("created_time")
+    spike_factors = baseline_store.spike_factors(token_address, created_time)
+    whale_thresholds = baseline_store.whale_thresholds(token_address, created_time)
+    spikes = volume_buckets.detect_spikes(volumes, factors=spike_factors)
+    fired = {name: spike for name, spike in spikes.items() if spike}
+    
+    has_volume_spike = bool(fired)
     volume_spike_factor = 0
-    previous_volumes = []
-    
-    if len(volume_data) >= 3:
-        for i in range(2, len(volume_data)):
-            current_vol = volume_data[i]["volume"]
-            avg_prev_vol = sum(v["volume"] for v in volume_data[i-2:i]) / 2
-            
-            if avg_prev_vol > 0 and current_vol > avg_prev_vol * 3:  # 3x spike
-                has_volume_spike = True
-                volume_spike_factor = current_vol / avg_prev_vol
-                logger.info(f"Volume spike detected: {volume_spike_factor:.2f}x increase")
-                break
-    
-    # Analyze wallet patterns
-    wallets = token_data.get("wallets", {})
-    
-    # Find wallets with high net outflow (potential dumpers)
-    potential_dumpers = []
-    for wallet_addr, stats in wallets.items():
-        # If wallet has received tokens and then sent out significantly more
-        if stats["received"] > 0 and stats["sent"] > stats["received"] * 1.5:
-            potential_dumpers.append({
-                "address": wallet_addr,
-                "received": stats["received"],
-                "sent": stats["sent"],
-                "net": stats["net"],
-                "dump_ratio": stats["sent"] / stats["received"] if stats["received"] > 0 else 0
-            })
-    
-    # Sort dumpers by dump ratio (highest first)
-    potential_dumpers.sort(key=lambda x: x["dump_ratio"], reverse=True)
-    
-    # Find wallets with high concentration (potential whales/insiders)
-    total_supply = sum(w["received"] for w in wallets.values())
-    whale_threshold = total_supply * 0.1  # 10% of total supply
-    
-    potential_whales = []
-    for wallet_addr, stats in wallets.items():
-        if stats["received"] > whale_threshold:
-            potential_whales.append({
-                "address": wallet_addr,
-                "received": stats["received"],
-                "percent_of_supply": (stats["received"] / total_supply) * 100 if total_supply > 0 else 0
-            })
-    
-    # Sort whales by holdings (highest first)
-    potential_whales.sort(key=lambda x: x["received"], reverse=True)
+    spike_resolution = None
+    if fired:
+        spike_resolution, strongest = max(fired.items(), key=lambda item: item[1]["factor"])
+        volume_spike_factor = strongest["factor"]
+        logger.info(f"Volume spike detected: {volume_spike_factor:.2f}x increase at {spike_resolution} resolution "
+                    f"(fired at {', '.join(fired)})")
+    
+    # Analyze wallet patterns on array-backed statistics (masks plus top-k selection)
+    wallets = wallet_stats.WalletStats(token_data.get("wallets", {}))
+    
+    # Wallets with high net outflow (potential dumpers), highest dump ratio first
+    dumper_count, potential_dumpers = wallets.dumpers(ratio=1.5, top_k=5)
+    
+    # Wallets with high concentration (potential whales/insiders), by default 10%+ of everything received
+    large_holder_percent = whale_thresholds["large_holder_percent"]
+    _, potential_whales, top_5_percent = wallets.whales(share=whale_thresholds["whale_share"], top_k=5,
+                                                        large_percent=large_holder_percent)
+    
+    # Thresholds above were taken before this snapshot joins the baseline. A snapshot is
+    # keyed on its newest transfer, so analysing it again (reused data, a manual run) adds nothing
+    last_transfer_time = max((tx.get("block_time") or 0 for tx in token_data.get("raw_transactions") or []), default=0)
+    baseline_store.observe(token_address, volumes, wallets.top_share(), created_time,
+                           snapshot=last_transfer_time or None)
     
     # Calculate preliminary confidence based on heuristics
     pump_dump_confidence = 0.0
     
-    # Factor 1: Buy/sell ratio - higher sell ratio is suspicious
-    if buy_txns + sell_txns > 0:
+    # Factor 1: Buy/sell ratio - higher sell ratio is suspicious. Transfers that touch no
+    # known pool/program/exchange are neither, so a token whose pool has not been learned
+    # yet can have no buys or sells at all; its sell ratio is unknown and does not count.
+    sell_ratio = 0.0
+    other_txns = token_data.get("other_transactions", max(total_txns - buy_txns - sell_txns, 0))
+    direction_known = buy_txns + sell_txns > 0
+    if direction_known:
         sell_ratio = sell_txns / (buy_txns + sell_txns)
         if sell_ratio > 0.7:  # More than 70% are sells
             pump_dump_confidence += 0.2
+    else:
+        logger.info(f"No transfers of {token_address} touch a known pool, program or exchange; buy/sell ratio unknown")
     
     # Factor 2: Volume spikes
     if has_volume_spike:
@@ -121,17 +198,48 @@ def analyze_token_transactions(token_data: Dict[str, Any], extracted_tweets: Lis
             pump_dump_confidence += 0.1
     
     # Factor 3: Dumpers presence
-    if len(potential_dumpers) > 0:
-        if len(potential_dumpers) > 5:
+    if dumper_count > 0:
+        if dumper_count > 5:
             pump_dump_confidence += 0.2
         else:
             pump_dump_confidence += 0.1
     
     # Factor 4: Wallet concentration
-    top_5_percent = sum(1 for w in potential_whales if w["percent_of_supply"] > 5)
-    if top_5_percent >= 3:  # 3+ wallets with 5%+ supply
+    if top_5_percent >= 3:  # 3+ wallets holding large_holder_percent+ of supply (5% by default)
+        pump_dump_confidence += 0.2
+    
+    # Factor 5: Accounts from known coordinated promotion rings
+    # (collapsed tweets carry every account that posted a copy in 'duplicate_authors')
+    promoter_usernames = []
+    for t in (extracted_tweets or []):
+        promoter_usernames.extend(t.get('duplicate_authors') or [t.get('author', {}).get('userName')])
+    promoter_usernames = [u for u in promoter_usernames if u]
+    coordinated_promotion = promotion_graph.get_ring_signal(token_address, promoter_usernames)
+    ring_member_count = len(coordinated_promotion["ring_members"])
+    if ring_member_count >= settings.RING_MIN_SIZE:
+        pump_dump_confidence += 0.1
+    
+    # Factor 6: The same message copy-pasted by many accounts
+    campaign = dedup.campaign_signal(extracted_tweets or [])
+    largest_campaign = campaign["largest_campaign"]
+    is_campaign = bool(largest_campaign) and largest_campaign["copies"] >= settings.DEDUP_CAMPAIGN_MIN_COPIES
+    if is_campaign:
+        pump_dump_confidence += 0.1
+    
+    # Factor 7: Price ran up and then fell from its peak (5m OHLCV bars built from swaps)
+    price_features = token_data.get("price_features") or {}
+    run_up = price_features.get("run_up", 0)
+    drawdown_from_peak = price_features.get("drawdown_from_peak", 0)
+    is_price_pump_dump = (run_up >= settings.OHLCV_RUN_UP_THRESHOLD
+                          and drawdown_from_peak >= settings.OHLCV_DRAWDOWN_THRESHOLD)
+    if is_price_pump_dump:
         pump_dump_confidence += 0.2
     
+    # Factor 8: Holders that were flagged as dumpers or whales in analyses of other tokens
+    known_bad_holders = token_data.get("known_bad_holders") or []
+    if known_bad_holders:
+        pump_dump_confidence += 0.2 if len(known_bad_holders) >= 3 else 0.1
+    
     # Determine if this looks like a pump and dump
     is_pump_dump = pump_dump_confidence > 0.5
     reasons = []
@@ -139,29 +247,19 @@ def analyze_token_transactions(token_data: Dict[str, Any], extracted_tweets: Lis
     if sell_ratio > 0.7:
         reasons.append(f"High sell ratio ({sell_ratio:.2f})")
     if has_volume_spike:
-        reasons.append(f"Volume spike ({volume_spike_factor:.2f}x)")
-    if len(potential_dumpers) > 0:
-        reasons.append(f"Found {len(potential_dumpers)} potential dumpers")
+        reasons.append(f"Volume spike ({volume_spike_factor:.2f}x at {spike_resolution} resolution)")
+    if dumper_count > 0:
+        reasons.append(f"Found {dumper_count} potential dumpers")
     if top_5_percent >= 3:
-        reasons.append(f"High concentration: {top_5_percent} wallets hold 5%+ of supply")
-    
-    # Use AI for deeper analysis if we have the API key
-    ai_analysis = {}
-    if settings.OPENAI_API_KEY and settings.OPENAI_API_KEY != "YOUR_OPENAI_API_KEY":
-        try:
-            ai_analysis = analyze_with_ai(token_data, extracted_tweets)
-            
-            # If AI analysis is confident, it overrides our heuristic
-            if ai_analysis.get("confidence", 0) > pump_dump_confidence:
-                is_pump_dump = ai_analysis.get("is_pump_dump", is_pump_dump)
-                pump_dump_confidence = ai_analysis.get("confidence", pump_dump_confidence)
-                
-                # Add AI reasons
-                ai_reasons = ai_analysis.get("reasons", [])
-                if ai_reasons:
-                    reasons.extend(ai_reasons)
-        except Exception as e:
-            logger.error(f"Error in AI analysis: {e}")
+        reasons.append(f"High concentration: {top_5_percent} wallets hold {large_holder_percent:.3g}%+ of supply")
+    if ring_member_count >= settings.RING_MIN_SIZE:
+        reasons.append(f"Coordinated promotion: {ring_member_count} accounts from known shill rings")
+    if is_campaign:
+        reasons.append(f"Copy-paste campaign: same message posted {largest_campaign['copies']} times by {largest_campaign['authors']} accounts")
+    if is_price_pump_dump:
+        reasons.append(f"Price ran up {run_up:.0%} then fell {drawdown_from_peak:.0%} from its peak")
+    if known_bad_holders:
+        reasons.append(f"{len(known_bad_holders)} top holders were flagged as dumpers or whales in earlier analyses")
     
     # Prepare the result
     result = {
@@ -169,40 +267,143 @@ def analyze_token_transactions(token_data: Dict[str, Any], extracted_tweets: Lis
         "is_pump_dump": is_pump_dump,
         "confidence": pump_dump_confidence,
         "reasons": reasons,
-        "potential_dumpers": potential_dumpers[:5],  # Top 5 dumpers
-        "top_holders": potential_whales[:5],  # Top 5 whales
+        "potential_dumpers": potential_dumpers,  # Top 5 dumpers
+        "top_holders": potential_whales,  # Top 5 whales
         "volume_analysis": {
             "has_spike": has_volume_spike,
             "spike_factor": volume_spike_factor,
+            "spike_resolution": spike_resolution,
+            "spikes_by_resolution": {name: round(spike["factor"], 2) if spike else None for name, spike in spikes.items()},
+            "spike_thresholds": {name: round(factor, 2) for name, factor in spike_factors.items()},
             "hourly_data": volume_data
         },
+        "price_analysis": {
+            "is_pump_dump_pattern": is_price_pump_dump,
+            **price_features
+        },
         "transaction_summary": {
             "total": total_txns,
             "buys": buy_txns,
             "sells": sell_txns,
+            "other": other_txns,
+            "direction_known": direction_known,
             "unique_wallets": unique_wallets
-        }
+        },
+        "whale_thresholds": whale_thresholds,
+        "known_bad_holders": known_bad_holders,
+        "coordinated_promotion": coordinated_promotion,
+        "campaign": campaign
     }
     
-    if ai_analysis:
+    return result, True
+
+def _apply_verdict(result: Dict[str, Any], verdict: Dict[str, Any]) -> None:
+    """Merges a backend verdict into a heuristic result (the more confident one wins)."""
+    if not verdict:
+        return
+    result["verdict_backend"] = verdict.get("backend")
+    if "local_score" in verdict:
+        result["local_score"] = verdict["local_score"]
+    
+    # If the backend is more confident, it overrides our heuristic
+    if verdict.get("confidence", 0) > result["confidence"]:
+        result["is_pump_dump"] = verdict.get("is_pump_dump", result["is_pump_dump"])
+        result["confidence"] = verdict.get("confidence", result["confidence"])
+        
+        # Add backend reasons
+        verdict_reasons = verdict.get("reasons", [])
+        if verdict_reasons:
+            result["reasons"].extend(verdict_reasons)
+    
+    if verdict.get("backend") == "llm":
         result["ai_analysis"] = {
-            "confidence": ai_analysis.get("confidence", 0),
-            "summary": ai_analysis.get("summary", ""),
-            "detailed_report": ai_analysis.get("detailed_report", "")
+            "confidence": verdict.get("confidence", 0),
+            "summary": verdict.get("summary", ""),
+            "detailed_report": verdict.get("detailed_report", "")
         }
-    
-    # Save the analysis to a file
+
+def _save_analysis(result: Dict[str, Any]) -> None:
+    """Saves an analysis result to data/analysis."""
+    token_address = result.get("token_address", "Unknown")
     try:
-        clean_address = token_address.replace("/", "_").replace(":", "_")
-        os.makedirs("./data/analysis", exist_ok=True)
+        os.makedirs(analysis_memo.ANALYSIS_DIR, exist_ok=True)
         
-        with open(f"./data/analysis/token_{clean_address}_analysis.json", 'w') as f:
+        with open(analysis_memo.analysis_path(token_address), 'w') as f:
             json.dump(result, f, indent=2)
         logger.info(f"Saved token analysis for {token_address}")
     except Exception as e:
         logger.error(f"Error saving analysis: {e}")
+
+AI_SYSTEM_MESSAGE = "You are an expert crypto analyst specializing in detecting pump and dump schemes on Solana. Analyze the provided comprehensive data (metadata, holders, transfers, defi activity, social context), paying close attention to wallet activity and transaction flow, and return your findings in the specified JSON format."
+
+AI_ANALYSIS_INSTRUCTIONS = """
+    **Analysis Request:**
+    1.  Based on ALL provided data (metadata, holders, transfers, defi activity, social), determine if this token is likely a pump and dump scheme (True/False).
+    2.  Provide a confidence score (0.0 to 1.0).
+    3.  Write a detailed narrative explaining **how**, **why**, and **when** this appears to be a pump and dump. Reference specific patterns from **all data sources**: token creation/supply details, holder distribution, transfer flow (net sellers and buyers, DEX interactions), DeFi activity (swaps, liquidity), volume changes, timing relative to social promotions, and social signals (hype language).
+    4.  Identify specific potential dumper wallet addresses based on **all available evidence** (e.g., early holders selling, large net sellers, wallets interacting with DEXs after hype). List these addresses clearly.
+    5.  Provide a concise summary conclusion.
+
+    **Output Format (JSON):**
+    {
+      "is_pump_dump": boolean,
+      "confidence": float,
+      "summary": "Concise summary conclusion.",
+      "detailed_narrative": "Detailed explanation covering how, why, when, analysis of all data sources (meta, holders, transfers, defi, social), and potential dumpers.",
+      "potential_dumpers": ["wallet_address_1", "wallet_address_2", ...]
+    }
+    """
+
+AI_BATCH_INSTRUCTIONS = """
+    **Analysis Request (for EACH token above, independently):**
+    1.  Determine if the token is likely a pump and dump scheme (True/False) from all of its data (metadata, holders, transfers, defi activity, social).
+    2.  Provide a confidence score (0.0 to 1.0).
+    3.  Write a short narrative (at most 3 sentences) explaining how, why and when it appears to be a pump and dump.
+    4.  List potential dumper wallet addresses taken from that token's data.
+    5.  Provide a concise summary conclusion.
+
+    **Output Format (JSON), one entry per token, using the token address exactly as given:**
+    {
+      "verdicts": [
+        {
+          "token_address": "address",
+          "is_pump_dump": boolean,
+          "confidence": float,
+          "summary": "Concise summary conclusion.",
+          "detailed_narrative": "Short explanation.",
+          "potential_dumpers": ["wallet_address_1", ...]
+        }
+      ]
+    }
+    """
+
+_SUMMARY_HEADER = "**Token Summary (JSON; amounts in token units, times in UTC, wallet lists ranked by net flow):**"
+
+def _build_ai_request(token_data: Dict[str, Any], extracted_tweets: List[Dict[str, Any]] = None) -> Dict[str, str]:
+    """Builds the single-token analysis request (system and user prompt) within AI_ANALYSIS_PROMPT_TOKEN_BUDGET."""
+    token_address = token_data.get('token_address', 'Unknown')
     
-    return result
+    # The token data is reduced to a fixed-schema summary sized to the token budget
+    header = f"""
+    Analyze the following Solana token ({token_address}) for pump and dump characteristics. Provide a detailed narrative.
+
+    {_SUMMARY_HEADER}
+    """
+    reserved_tokens = prompt_budget.estimate_tokens(AI_SYSTEM_MESSAGE + header + AI_ANALYSIS_INSTRUCTIONS)
+    summary, summary_tokens = token_prompt.build_compact_summary(token_data, extracted_tweets, reserved_tokens=reserved_tokens)
+    logger.info(f"AI analysis prompt for {token_address}: ~{summary_tokens + reserved_tokens} tokens "
+                f"({summary_tokens} summary, budget {settings.AI_ANALYSIS_PROMPT_TOKEN_BUDGET})")
+    return {"system": AI_SYSTEM_MESSAGE, "user": f"{header}{summary}\n{AI_ANALYSIS_INSTRUCTIONS}"}
+
+def _ai_failure(error: Exception) -> Dict[str, Any]:
+    """The result returned when AI analysis of a token fails."""
+    return {
+        "is_pump_dump": False,
+        "confidence": 0.0,
+        "summary": analysis_memo.AI_FAILURE_SUMMARY,
+        "detailed_narrative": f"Error during analysis: {error}",
+        "potential_dumpers": []
+    }
 
 def analyze_with_ai(token_data: Dict[str, Any], extracted_tweets: List[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Uses AI to analyze detailed token data and social signals for pump and dump patterns.
@@ -216,196 +417,100 @@ def analyze_with_ai(token_data: Dict[str, Any], extracted_tweets: List[Dict[str,
     """
     
     logger.info("Performing AI analysis on enriched token data...")
-    client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
     
-    # --- Prepare context for the AI ---
     token_address = token_data.get('token_address', 'Unknown')
-    wallets = token_data.get('wallets', {})
-    hourly_volumes = token_data.get('hourly_volumes', {})
-    raw_transactions = token_data.get('raw_transactions', [])
-    metadata = token_data.get('metadata', {})
-    holders_page_1 = token_data.get('holders_page_1', [])
-    defi_activities_page_1 = token_data.get('defi_activities_page_1', [])
-    
-    # --- Create Summaries for Prompt --- 
-    
-    # Basic Stats Summary
-    basic_stats_summary = (
-        f"- Token Address: {token_address}\n"
-        f"- Total Transactions Analyzed: {token_data.get('total_transactions', 0)}\n"
-        f"- Unique Wallets Involved: {len(wallets)}"
-    )
-    
-    # Metadata Summary
-    meta_summary = "Token metadata not available."
-    if metadata:
-        meta_summary = (
-            f"- Name: {metadata.get('name', 'N/A')}\n"
-            f"- Symbol: {metadata.get('symbol', 'N/A')}\n"
-            f"- Decimals: {metadata.get('decimals', 'N/A')}\n"
-            f"- Total Supply: {metadata.get('supply', 'N/A')}\n"
-            f"- Holders (from meta): {metadata.get('holder', 'N/A')}"
-        )
-
-    # Top Holders Summary (from explicit /holders call)
-    top_holders_summary = "Holder data not available or empty."
-    if holders_page_1:
-        top_holders_summary = f"Top {len(holders_page_1)} holders (Page 1):\n"
-        for i, holder in enumerate(holders_page_1[:5]): # Show top 5 from page 1
-             owner = holder.get('owner', 'N/A')
-             amount = holder.get('amount', 0)
-             # Calculate percentage if supply and decimals are known
-             supply_str = metadata.get('supply', '0')
-             decimals_raw = metadata.get('decimals') # Get raw value without default
-             percentage = "N/A" # Default to N/A
-             formatted_amount_str = str(amount) # Default to raw amount string
-
-             # Check if decimals is a valid number (int or float)
-             decimals_valid = False
-             if decimals_raw is not None:
-                 try:
-                     decimals = int(decimals_raw) # Try converting to int
-                     decimals_valid = True
-                 except (ValueError, TypeError):
-                     # ... (rest of decimal validation logic remains the same) ...
-                     pass # Keep decimals_valid as False for now
-
-             # Format amount string if decimals are valid
-             if decimals_valid:
-                 try:
-                     amount_int = int(amount)
-                     formatted_amount = amount_int / (10**decimals)
-                     # Format with reasonable precision, adjust as needed
-                     formatted_amount_str = f"{formatted_amount:,.4f}" 
-                 except (ValueError, TypeError):
-                     formatted_amount_str = f"{amount} (Raw)" # Indicate raw if conversion fails
-
-             # Proceed only if we have valid numbers for percentage
-             if supply_str.isdigit() and decimals_valid:
-                 try: 
-                     supply = int(supply_str)
-                     amount_int = int(amount)
-                     percentage = f"{(amount_int / supply) * 100:.4f}%"
-                 except (ValueError, TypeError) as calc_err:
-                     logger.error(f"Error calculating percentage for holder {owner}: {calc_err}")
-                     percentage = "N/A"
-                         
-             # Use the formatted amount string in the report line
-             top_holders_summary += f"  - Holder #{i+1}: {owner[:6]}... (Amount: {formatted_amount_str}, Approx: {percentage})\n"
-        
-    # Top Net Sellers Summary (Calculated from transfers)
-    net_sellers = []
-    for addr, data in wallets.items():
-        net_change = data['received'] - data['sent']
-        if net_change < 0: net_sellers.append({"address": addr, "net_sold": -net_change})
-    sorted_net_sellers = sorted(net_sellers, key=lambda item: item['net_sold'], reverse=True)
-    top_sellers_summary = "No significant net sellers found."
-    if sorted_net_sellers:
-        top_sellers_summary = "Top 5 Net Sellers (Calculated):\n"
-        for i, seller_data in enumerate(sorted_net_sellers[:5]):
-             top_sellers_summary += f"  - Seller #{i+1}: {seller_data['address'][:6]}... (Net Sold: {seller_data['net_sold']:.2f})\n"
-        
-    # Raw Transaction Sample Summary
-    raw_tx_sample_summary = "No raw transaction sample available."
-    if raw_transactions:
-        raw_tx_sample_summary = f"Sample of first {min(len(raw_transactions), 25)} raw transactions:\n"
-        for i, tx in enumerate(raw_transactions[:25]): 
-            ts = datetime.fromtimestamp(tx.get('blockTime', 0)).strftime('%Y-%m-%d %H:%M:%S')
-            src = tx.get('from_address', tx.get('src', 'N/A'))
-            dst = tx.get('to_address', tx.get('dst', 'N/A'))
-            amt = tx.get('amount', 0)
-            is_dex_like = "exchange" in dst.lower() or "swap" in dst.lower() or "pool" in dst.lower()
-            raw_tx_sample_summary += f"- {ts}: {src[:6]}.. -> {dst[:6]}.. ({amt}) {'[DEX?]' if is_dex_like else ''}\n"
-
-    # DeFi Activity Sample Summary
-    defi_activity_summary = "No recent DeFi activity data available."
-    if defi_activities_page_1:
-        defi_activity_summary = f"Sample of recent {len(defi_activities_page_1)} DeFi activities (Page 1):\n"
-        for i, activity in enumerate(defi_activities_page_1[:5]): # Show top 5 from page 1
-            ts = datetime.fromtimestamp(activity.get('block_time', 0)).strftime('%Y-%m-%d %H:%M:%S')
-            act_type = activity.get('activity_type', 'Unknown')
-            platform = activity.get('platform', ['Unknown'])[0][:10] # First platform, truncated
-            value = activity.get('value', 'N/A')
-            defi_activity_summary += f"  - {ts}: {act_type} on {platform} (Value: ${value:.2f})\n"
-
-    # Tweet Summary
-    tweet_summary = "No specific tweets provided for this token."
-    if extracted_tweets:
-        tweet_summary = f"Analysis should consider {len(extracted_tweets)} related tweets. Examples:\n"
-        for i, tweet in enumerate(extracted_tweets[:3]):
-            text = tweet.get('text', '')[:100]
-            author = tweet.get('author', {}).get('userName', 'Unknown')
-            tweet_summary += f"- @{author}: \"{text}...\"\n"
-            
-    # --- AI Prompt --- 
-    prompt = f"""
-    Analyze the following detailed Solana token data ({token_address}) and social context for pump and dump characteristics. Provide a detailed narrative.
-
-    **Token Metadata:**
-    {meta_summary}
-
-    **Holder Information:**
-    {top_holders_summary}
-
-    **Transaction Overview:**
-    {basic_stats_summary}
-    {top_sellers_summary}
-
-    **Recent DeFi Activity Sample:**
-    {defi_activity_summary}
-
-    **Raw Transaction Sample (Timestamp: From -> To (Amount) [DEX?]):**
-    {raw_tx_sample_summary}
-
-    **Social Context:**
-    {tweet_summary}
-
-    **Analysis Request:**
-    1.  Based on ALL provided data (metadata, holders, transfers, defi activity, social), determine if this token is likely a pump and dump scheme (True/False).
-    2.  Provide a confidence score (0.0 to 1.0).
-    3.  Write a detailed narrative explaining **how**, **why**, and **when** this appears to be a pump and dump. Reference specific patterns from **all data sources**: token creation/supply details, holder distribution, raw transaction flow (buys/sells, DEX interactions), DeFi activity (swaps, liquidity), volume changes, timing relative to social promotions, and social signals (hype language).
-    4.  Identify specific potential dumper wallet addresses based on **all available evidence** (e.g., early holders selling, large net sellers, wallets interacting with DEXs after hype). List these addresses clearly.
-    5.  Provide a concise summary conclusion.
-
-    **Output Format (JSON):**
-    {{
-      "is_pump_dump": boolean,
-      "confidence": float,
-      "summary": "Concise summary conclusion.",
-      "detailed_narrative": "Detailed explanation covering how, why, when, analysis of all data sources (meta, holders, transfers, defi, social), and potential dumpers.",
-      "potential_dumpers": ["wallet_address_1", "wallet_address_2", ...]
-    }}
-    """
+    request = _build_ai_request(token_data, extracted_tweets)
     
     # --- Log the prompt ---
-    logger.debug(f"Sending the following prompt to AI for token {token_address}:\n{prompt}")
+    logger.debug(f"Sending the following prompt to AI for token {token_address}:\n{request['user']}")
     
     # --- API Call --- 
     try:
-        response = client.chat.completions.create(
-            model=settings.AI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert crypto analyst specializing in detecting pump and dump schemes on Solana. Analyze the provided comprehensive data (metadata, holders, transfers, defi activity, social context), paying close attention to wallet activity and transaction flow, and return your findings in the specified JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        ai_result_str = response.choices[0].message.content
-        ai_result = json.loads(ai_result_str)
+        ai_result = llm_client.chat_json(**request)
         logger.info(f"AI analysis complete: is_pump_dump={ai_result.get('is_pump_dump')}, confidence={ai_result.get('confidence')}")
         # --- Log the raw response ---
-        logger.debug(f"Received raw AI response for token {token_address}:\n{ai_result_str}")
+        logger.debug(f"Received raw AI response for token {token_address}:\n{json.dumps(ai_result)}")
         return ai_result
         
     except Exception as e:
         logger.error(f"Error during AI analysis: {e}")
-        return {
-            "is_pump_dump": False,
-            "confidence": 0.0,
-            "summary": "AI analysis failed.",
-            "detailed_narrative": f"Error during analysis: {e}",
-            "potential_dumpers": []
-        }
+        return _ai_failure(e)
+
+def _is_valid_verdict(verdict: Any) -> bool:
+    """Checks that a per-token verdict from a batch response has the required fields."""
+    return (isinstance(verdict, dict)
+            and isinstance(verdict.get("is_pump_dump"), bool)
+            and isinstance(verdict.get("confidence"), (int, float)))
+
+def analyze_with_ai_batch(items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """Uses AI to analyze several tokens, packing their summaries into shared requests.
+    
+    Summaries are packed into batches of at most AI_BATCH_MAX_TOKENS tokens and
+    AI_BATCH_PROMPT_TOKEN_BUDGET estimated prompt tokens, and the batches are sent
+    concurrently. Tokens whose batch failed, or that are missing from or malformed in
+    the response, are retried with a single-token request.
+    
+    Args:
+        items: (token_data, extracted_tweets) pairs
+        
+    Returns:
+        One AI analysis result per item, in input order (same fields as analyze_with_ai).
+    """
+    if not items:
+        return []
+    if len(items) == 1:
+        return [analyze_with_ai(*items[0])]
+    
+    # Per-token summaries, each small enough to share a batch with others
+    intro = "\n    Analyze each of the following Solana tokens for pump and dump characteristics.\n"
+    reserved_tokens = prompt_budget.estimate_tokens(AI_SYSTEM_MESSAGE + intro + AI_BATCH_INSTRUCTIONS)
+    summary_budget = min(settings.AI_ANALYSIS_PROMPT_TOKEN_BUDGET, settings.AI_BATCH_PROMPT_TOKEN_BUDGET - reserved_tokens)
+    addresses = [token_data.get('token_address', 'Unknown') for token_data, _ in items]
+    sections = []
+    for (token_data, extracted_tweets), address in zip(items, addresses):
+        summary, _ = token_prompt.build_compact_summary(token_data, extracted_tweets, budget=summary_budget)
+        sections.append(f"\n    ### Token {address}\n    {_SUMMARY_HEADER}\n    {summary}\n")
+    
+    batches = prompt_budget.pack_by_token_budget(
+        sections,
+        budget=settings.AI_BATCH_PROMPT_TOKEN_BUDGET,
+        overhead_tokens=reserved_tokens,
+        max_items=settings.AI_BATCH_MAX_TOKENS
+    )
+    llm_requests = [
+        {"system": AI_SYSTEM_MESSAGE, "user": intro + "".join(sections[i] for i in batch) + AI_BATCH_INSTRUCTIONS}
+        for batch in batches
+    ]
+    logger.info(f"Batched AI analysis: {len(items)} tokens in {len(llm_requests)} requests")
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    for batch, response in zip(batches, llm_client.run_concurrent(llm_requests)):
+        if isinstance(response, Exception):
+            logger.warning(f"Batched AI analysis of {len(batch)} tokens failed ({response}); retrying them one by one")
+            continue
+        by_address = {}
+        for verdict in response.get("verdicts") or []:
+            if _is_valid_verdict(verdict):
+                by_address[str(verdict.get("token_address", "")).strip()] = verdict
+        for index in batch:
+            verdict = by_address.get(addresses[index])
+            if verdict is not None:
+                results[index] = verdict
+    
+    # Retry tokens without a usable verdict individually
+    retry = [i for i, result in enumerate(results) if result is None]
+    if retry:
+        logger.info(f"Retrying AI analysis individually for {len(retry)} tokens")
+        responses = llm_client.run_concurrent([_build_ai_request(*items[i]) for i in retry])
+        for index, response in zip(retry, responses):
+            if isinstance(response, Exception):
+                logger.error(f"Error during AI analysis of {addresses[index]}: {response}")
+                response = _ai_failure(response)
+            results[index] = response
+    
+    for address, result in zip(addresses, results):
+        logger.info(f"AI analysis complete for {address}: is_pump_dump={result.get('is_pump_dump')}, confidence={result.get('confidence')}")
+    return results
 
 def generate_pump_dump_report(token_address: str, token_data: dict, analysis_result: dict, token_tweets: list = None) -> str:
     """
@@ -703,17 +808,36 @@ def generate_pump_dump_report(token_address: str, token_data: dict, analysis_res
                 report.append(f"   Sample Tweet ({tweet_time}): \"{tweet_text}...\"")
         report.append("")
     
+    # --- Coordinated Promotion Section --- 
+    coordinated = analysis_result.get("coordinated_promotion", {})
+    if coordinated.get("rings") or coordinated.get("max_burst_accounts", 0) > 1:
+        report.append("COORDINATED PROMOTION")
+        report.append("-" * 40)
+        report.append(f"Most accounts posting within {coordinated.get('window_minutes', 0)} minutes: {coordinated.get('max_burst_accounts', 0)}")
+        rings = coordinated.get("rings", [])
+        if rings:
+            report.append(f"{len(coordinated.get('ring_members', []))} promoting accounts belong to {len(rings)} known shill ring(s):")
+            for ring in rings[:5]:
+                members = ", ".join(f"@{m}" for m in ring.get("members_promoting", [])[:10])
+                report.append(f" - Ring of {ring.get('size', 0)} accounts: {members}")
+        else:
+            report.append("No promoting account belongs to a known shill ring.")
+        report.append("")
+    
     # --- Related Tweets Section --- 
     if token_tweets:
         report.append("RELATED TWEETS (Sample)")
         report.append("-" * 40)
-        report.append(f"Found {len(token_tweets)} tweets mentioning this token")
+        total_copies = sum(t.get('duplicate_count', 1) for t in token_tweets)
+        report.append(f"Found {len(token_tweets)} distinct messages ({total_copies} tweets) mentioning this token")
         for i, tweet in enumerate(token_tweets[:5]): # Show sample
             author_data = tweet.get('author', {})
             username = author_data.get('userName', 'unknown')
             created_at = tweet.get('createdAt', 'unknown')
             text = tweet.get('text', 'No text')
-            report.append(f"\nTweet {i+1}: @{username} ({created_at})")
+            copies = tweet.get('duplicate_count', 1)
+            posted = f", posted {copies} times by {len(tweet.get('duplicate_authors', []))} accounts" if copies > 1 else ""
+            report.append(f"\nTweet {i+1}: @{username} ({created_at}{posted})")
             report.append(f"   Text: {text[:150]}...")
         report.append("")
     
@@ -0,0 +1,260 @@
+"""Compact, fixed-schema token summaries for the AI analysis prompt.
+
+Instead of pasting raw transactions, holders, DeFi activities and tweets into the
+prompt, the data is reduced to aggregates (counts, amount distribution, volume peak,
+net flows), top-k lists and a few tweet examples. The summary has the same keys for
+every token, and its size depends on top-k and the example limits, not on how much
+activity a token has.
+
+The summary is rendered as compact JSON and measured with prompt_budget. If it exceeds
+AI_ANALYSIS_PROMPT_TOKEN_BUDGET, progressively smaller detail levels are tried. The
+output is deterministic (sorted ties, rounded numbers, UTC timestamps), so unchanged
+token snapshots produce identical prompts and hit llm_cache.
+"""
+
+import json
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import settings
+from correlation_engine import prompt_budget
+from onchain_monitor import known_addresses
+from social_aggregator.twitter import parse_tweet_time
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Detail levels, from richest to smallest; the first one within budget is used
+DETAIL_LEVELS = [
+    {"top_k": 5, "examples": 3, "example_chars": 140},
+    {"top_k": 5, "examples": 2, "example_chars": 100},
+    {"top_k": 3, "examples": 1, "example_chars": 80},
+    {"top_k": 3, "examples": 0, "example_chars": 0},
+    {"top_k": 1, "examples": 0, "example_chars": 0},
+]
+
+def _num(value: Any) -> Optional[float]:
+    """Rounds a number to 4 significant digits (None if it is not numeric)."""
+    try:
+        return float(f"{float(value):.4g}")
+    except (TypeError, ValueError):
+        return None
+
+def _iso(timestamp: Any) -> Optional[str]:
+    """Formats a Unix timestamp as a UTC ISO string."""
+    try:
+        if not timestamp:
+            return None
+        return datetime.fromtimestamp(float(timestamp), tz=timezone.utc).strftime('%Y-%m-%dT%H:%MZ')
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def _decimals(token_data: Dict[str, Any]) -> Optional[int]:
+    """Returns the token decimals from metadata or the transfers, if known."""
+    candidates = [(token_data.get('metadata') or {}).get('decimals')]
+    candidates += [tx.get('token_decimals') for tx in (token_data.get('raw_transactions') or [])[:1]]
+    for value in candidates:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def build_token_summary(token_data: Dict[str, Any], extracted_tweets: List[Dict[str, Any]] = None,
+                        top_k: int = 5, examples: int = 3, example_chars: int = 140) -> Dict[str, Any]:
+    """Reduces detailed token data and tweets to a fixed-schema summary.
+
+    Args:
+        token_data: Detailed token data from get_detailed_token_transactions.
+        extracted_tweets: Tweets mentioning the token (collapsed or not).
+        top_k: Length of the top seller/buyer/holder/platform lists.
+        examples: Number of tweet examples.
+        example_chars: Maximum characters per tweet example.
+
+    Returns:
+        Dict with keys token, transfers, hourly_volume, wallets, holders, defi, social.
+    """
+    metadata = token_data.get('metadata') or {}
+    wallets = token_data.get('wallets') or {}
+    transfers = token_data.get('raw_transactions') or []
+    holders = token_data.get('holders_page_1') or []
+    activities = token_data.get('defi_activities_page_1') or []
+    hourly_volumes = token_data.get('hourly_volumes') or {}
+    decimals = _decimals(token_data)
+    scale = 10 ** decimals if decimals is not None else 1
+
+    # Transfer sample: amount distribution and timing
+    amounts = sorted(float(tx.get('amount', 0) or 0) / scale for tx in transfers)
+    times = sorted(t for t in (tx.get('block_time', tx.get('blockTime')) for tx in transfers) if t)
+    dex_like = int((known_addresses.categories(
+        [str(tx.get('to_address', tx.get('dst', ''))) for tx in transfers]) != 0).sum())
+    transfer_summary = {
+        "total": token_data.get('total_transactions', len(transfers)),
+        "sampled": len(transfers),
+        "buys": token_data.get('buy_transactions', 0),
+        "sells": token_data.get('sell_transactions', 0),
+        "to_dex_like": dex_like,
+        "first": _iso(times[0]) if times else None,
+        "last": _iso(times[-1]) if times else None,
+        "span_minutes": _num((times[-1] - times[0]) / 60) if times else 0,
+        "amount": {
+            "sum": _num(sum(amounts)),
+            "median": _num(_percentile(amounts, 0.5)),
+            "p90": _num(_percentile(amounts, 0.9)),
+            "max": _num(amounts[-1] if amounts else 0)
+        }
+    }
+
+    # Hourly volume: where the peak is and how much of the volume it holds
+    volume_items = sorted((float(hour), float(volume)) for hour, volume in hourly_volumes.items())
+    total_volume = sum(volume for _, volume in volume_items)
+    peak_hour, peak_volume = max(volume_items, key=lambda item: (item[1], -item[0]), default=(0, 0.0))
+    last_volume = volume_items[-1][1] if volume_items else 0.0
+    volume_summary = {
+        "hours": len(volume_items),
+        "peak_hour": _iso(peak_hour),
+        "peak_share": _num(peak_volume / total_volume) if total_volume else 0,
+        "last_to_peak": _num(last_volume / peak_volume) if peak_volume else 0
+    }
+
+    # Net flows per wallet
+    flows = [(address, float(stats.get('received', 0)) - float(stats.get('sent', 0))) for address, stats in wallets.items()]
+    sellers = sorted(((a, -net) for a, net in flows if net < 0), key=lambda item: (-item[1], item[0]))
+    buyers = sorted(((a, net) for a, net in flows if net > 0), key=lambda item: (-item[1], item[0]))
+    total_sold = sum(amount for _, amount in sellers)
+    wallet_summary = {
+        "count": len(wallets),
+        "net_sellers": len(sellers),
+        "net_buyers": len(buyers),
+        "top_sellers_share": _num(sum(a for _, a in sellers[:top_k]) / total_sold) if total_sold else 0,
+        "top_net_sellers": [{"address": a, "net_sold": _num(amount / scale)} for a, amount in sellers[:top_k]],
+        "top_net_buyers": [{"address": a, "net_bought": _num(amount / scale)} for a, amount in buyers[:top_k]]
+    }
+
+    # Holder concentration (first page of /holders)
+    supply = None
+    try:
+        supply = int(metadata.get('supply')) or None
+    except (TypeError, ValueError):
+        pass
+    top_holders = []
+    for holder in holders[:top_k]:
+        percent = None
+        if supply:
+            try:
+                percent = _num(int(holder.get('amount', 0)) / supply * 100)
+            except (TypeError, ValueError):
+                pass
+        top_holders.append({"owner": holder.get('owner'), "pct": percent})
+    holder_summary = {
+        "holder_count": metadata.get('holder'),
+        "top_pct_sum": _num(sum(h["pct"] for h in top_holders if h["pct"] is not None)) if supply else None,
+        "top": top_holders
+    }
+
+    # DeFi activity mix
+    values = [float(a.get('value') or 0) for a in activities if isinstance(a.get('value'), (int, float))]
+    activity_times = sorted(a.get('block_time') for a in activities if a.get('block_time'))
+    platforms = Counter((a.get('platform') or ['Unknown'])[0] for a in activities)
+    defi_summary = {
+        "count": len(activities),
+        "types": dict(sorted(Counter(a.get('activity_type', 'Unknown') for a in activities).items())),
+        "top_platforms": [{"platform": p, "count": c} for p, c in sorted(platforms.items(), key=lambda item: (-item[1], item[0]))[:top_k]],
+        "value_usd_sum": _num(sum(values)),
+        "value_usd_max": _num(max(values, default=0)),
+        "first": _iso(activity_times[0]) if activity_times else None,
+        "last": _iso(activity_times[-1]) if activity_times else None
+    }
+
+    # Social context
+    tweets = extracted_tweets or []
+    authors = set()
+    for tweet in tweets:
+        authors.update(tweet.get('duplicate_authors') or [tweet.get('author', {}).get('userName')])
+    authors.discard(None)
+    tweet_times = sorted(t for t in (parse_tweet_time(tweet.get('createdAt')) for tweet in tweets) if t)
+    ranked = sorted(tweets, key=lambda t: (-t.get('duplicate_count', 1), str(t.get('id', ''))))
+    social_summary = {
+        "distinct_messages": len(tweets),
+        "total_tweets": sum(t.get('duplicate_count', 1) for t in tweets),
+        "authors": len(authors),
+        "largest_campaign_copies": ranked[0].get('duplicate_count', 1) if ranked else 0,
+        "first": _iso(tweet_times[0]) if tweet_times else None,
+        "last": _iso(tweet_times[-1]) if tweet_times else None,
+        "examples": [
+            {
+                "author": t.get('author', {}).get('userName'),
+                "copies": t.get('duplicate_count', 1),
+                "text": " ".join((t.get('text') or '').split())[:example_chars]
+            }
+            for t in ranked[:examples]
+        ]
+    }
+
+    return {
+        "token": {
+            "address": token_data.get('token_address'),
+            "name": str(metadata.get('name', ''))[:40] or None,
+            "symbol": str(metadata.get('symbol', ''))[:16] or None,
+            "decimals": decimals,
+            "supply": _num(supply / scale) if supply else None,
+            "created": _iso(metadata.get('created_time'))
+        },
+        "transfers": transfer_summary,
+        "hourly_volume": volume_summary,
+        "wallets": wallet_summary,
+        "holders": holder_summary,
+        "defi": defi_summary,
+        "social": social_summary
+    }
+
+def render_summary(summary: Dict[str, Any]) -> str:
+    """Renders a summary as compact JSON (keys in schema order)."""
+    return json.dumps(summary, separators=(",", ":"), ensure_ascii=False)
+
+def build_compact_summary(token_data: Dict[str, Any], extracted_tweets: List[Dict[str, Any]] = None,
+                          budget: int = None, reserved_tokens: int = 0) -> Tuple[str, int]:
+    """Returns the rendered summary at the richest detail level that fits the budget.
+
+    Args:
+        token_data: Detailed token data.
+        extracted_tweets: Tweets mentioning the token.
+        budget: Maximum estimated prompt tokens (defaults to AI_ANALYSIS_PROMPT_TOKEN_BUDGET).
+        reserved_tokens: Tokens used by the rest of the prompt (instructions, system message).
+
+    Returns:
+        (rendered summary, estimated tokens of the summary)
+    """
+    if budget is None:
+        budget = settings.AI_ANALYSIS_PROMPT_TOKEN_BUDGET
+    rendered, tokens = "", 0
+    for level in DETAIL_LEVELS:
+        rendered = render_summary(build_token_summary(token_data, extracted_tweets, **level))
+        tokens = prompt_budget.estimate_tokens(rendered)
+        if tokens + reserved_tokens <= budget:
+            break
+    else:
+        logger.warning(f"Token summary for {token_data.get('token_address')} needs {tokens + reserved_tokens} tokens "
+                       f"even at the smallest detail level (budget {budget})")
+    return rendered, tokens
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    import glob
+
+    for path in sorted(glob.glob("./data/token_*_detailed_data.json")):
+        with open(path, 'r') as f:
+            token_data = json.load(f)
+        rendered, tokens = build_compact_summary(token_data)
+        print(f"{token_data.get('token_address')}: {tokens} summary tokens "
+              f"({token_data.get('total_transactions', 0)} transactions, {len(token_data.get('wallets', {}))} wallets)")
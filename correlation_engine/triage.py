@@ -0,0 +1,260 @@
+"""Tiered triage of extracted token addresses before the expensive analysis.
+
+Every extracted address used to get the full treatment: up to 500 transfers,
+metadata, holders, DeFi activities and possibly an LLM verdict. Tokens now climb
+three tiers and only go up when the cheaper tier finds them suspicious enough:
+
+- tier 0 (free): the tweets that mention the token. Quick-scan pump score, known
+  promoters, copy-paste campaign size, distinct authors and promotion-ring members.
+  Tokens scoring TRIAGE_TIER0_MIN_SCORE or more move on.
+- tier 1 (two Solscan calls): token metadata plus the first holder page. The
+  metadata is the /token/meta response of the mint check that closes tier 0; it is
+  only fetched again when the mint status came from the verification cache. Holders
+  flagged in past analyses (bad_wallet_filter), concentration of the top holders,
+  a fresh pump.fun launch and a small holder count add to half the tier 0 score.
+  Tokens scoring TRIAGE_TIER1_MIN_SCORE or more move on; the rest are marked
+  uninteresting in the verification cache so they are not re-fetched every cycle.
+- tier 2: the detailed fetch and pump-and-dump analysis (where the verdict backend
+  decides whether the LLM is consulted), with the tier 1 metadata and holder page
+  passed on instead of fetched again.
+
+How many tokens reach each tier (and the LLM) is counted per cycle and in total,
+persisted at TRIAGE_STATS_PATH.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import List, Dict, Any, Tuple
+
+from config import settings
+from onchain_monitor import bad_wallet_filter
+from onchain_monitor import baseline_store
+from onchain_monitor import known_addresses
+from onchain_monitor import solscan
+from onchain_monitor import verification_cache
+from social_aggregator import promotion_graph
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Counted stages, in order
+STAGES = ("tier0", "tier1", "tier2", "llm")
+
+_lock = threading.Lock()
+_stats: Dict[str, int] = {}
+_loaded = False
+
+def social_score(token_address: str, token_tweets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Tier 0: scores a token from the (collapsed) tweets that mention it.
+
+    Returns:
+        {"score" (0-1), "signals": [short descriptions]}
+    """
+    if not token_tweets:
+        return {"score": 0.0, "signals": []}
+    score = 0.0
+    signals = []
+
+    quick_score = max(min(t.get('quick_score', 0) or 0, 1.0) for t in token_tweets)
+    score += 0.5 * quick_score
+    if quick_score >= 0.6:
+        signals.append(f"pump language ({quick_score:.2f})")
+
+    if any(t.get('known_promoter') for t in token_tweets):
+        score += 0.2
+        signals.append("known promoter")
+
+    copies = max(t.get('duplicate_count', 1) for t in token_tweets)
+    if copies >= settings.DEDUP_CAMPAIGN_MIN_COPIES:
+        score += 0.2
+        signals.append(f"copy-paste campaign ({copies} copies)")
+
+    usernames = set()
+    for t in token_tweets:
+        usernames.update(t.get('duplicate_authors') or [t.get('author', {}).get('userName')])
+    usernames.discard(None)
+    if len(usernames) >= 3:
+        score += 0.1
+        signals.append(f"{len(usernames)} accounts")
+
+    ring_members = promotion_graph.get_ring_signal(token_address, sorted(usernames))["ring_members"]
+    if len(ring_members) >= settings.RING_MIN_SIZE:
+        score += 0.2
+        signals.append(f"{len(ring_members)} promotion ring members")
+
+    return {"score": min(score, 1.0), "signals": signals}
+
+def holder_concentration(token_info: Dict[str, Any], holders: List[Dict[str, Any]]) -> float:
+    """Share (0-1) of the supply held by the first holder page, ignoring pools and exchanges."""
+    metadata = (token_info or {}).get('data') or {}
+    try:
+        supply = float(metadata.get('supply') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    if supply <= 0 or not holders:
+        return 0.0
+    owners = [str(h.get('owner', '')) for h in holders]
+    market = known_addresses.categories(owners)
+    held = 0.0
+    for holder, category in zip(holders, market):
+        if not category:
+            try:
+                held += float(holder.get('amount') or 0)
+            except (TypeError, ValueError):
+                continue
+    return min(held / supply, 1.0)
+
+def onchain_score(token_address: str, token_info: Dict[str, Any], holders: List[Dict[str, Any]],
+                  bad_holders: List[str], social: Dict[str, Any]) -> Dict[str, Any]:
+    """Tier 1: half the tier 0 score plus metadata and holder signals.
+
+    Returns:
+        {"score" (0-1), "signals": [short descriptions], "holder_concentration"}
+    """
+    metadata = (token_info or {}).get('data') or {}
+    score = 0.5 * social["score"]
+    signals = []
+
+    if bad_holders:
+        score += 0.4
+        signals.append(f"{len(bad_holders)} flagged holders")
+
+    concentration = holder_concentration(token_info, holders)
+    if concentration >= settings.TRIAGE_CONCENTRATION_THRESHOLD:
+        score += 0.3
+        signals.append(f"top holders hold {concentration:.0%}")
+
+    if baseline_store.cohort_of(token_address, metadata.get('created_time')) == "fresh_pump":
+        score += 0.2
+        signals.append("fresh pump.fun launch")
+
+    holder_count = metadata.get('holder')
+    if isinstance(holder_count, (int, float)) and 0 < holder_count < 500:
+        score += 0.1
+        signals.append(f"{int(holder_count)} holders")
+
+    return {"score": min(score, 1.0), "signals": signals, "holder_concentration": concentration}
+
+def triage_tokens(addresses: List[str], token_tweet_map: Dict[str, List[Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Runs tiers 0 and 1 over the extracted addresses.
+
+    Args:
+        addresses: Extracted addresses.
+        token_tweet_map: Token -> tweets mentioning it (event_join.build_token_tweet_map).
+
+    Returns:
+        (tokens promoted to tier 2, most suspicious first, as dicts with "address",
+         "token_info", "holders", "bad_holders" and "triage"; counts per stage)
+    """
+    counts = {stage: 0 for stage in STAGES}
+
+    # Tier 0: tweet signals only
+    tier1_candidates = []
+    for address in addresses:
+        # Skip wallets, programs and recently ruled-out tokens before anything else
+        skip_reason = verification_cache.skip_reason(address)
+        if skip_reason:
+            logger.info(f"Skipping {address}: {skip_reason}")
+            continue
+        counts["tier0"] += 1
+        social = social_score(address, token_tweet_map.get(address, []))
+        if social["score"] < settings.TRIAGE_TIER0_MIN_SCORE:
+            logger.info(f"Triage: {address} stays at tier 0 (social score {social['score']:.2f})")
+            continue
+        is_mint, token_info = verification_cache.verify_mint_with_info(address)
+        if is_mint is False:
+            continue
+        tier1_candidates.append((address, social, token_info))
+
+    # Tier 1: metadata and the first holder page (screened against flagged wallets).
+    # The metadata comes from the mint check unless the mint status was cached.
+    candidates = {address: (social, token_info) for address, social, token_info in tier1_candidates}
+    promoted = []
+    for address, holders, bad_holders in bad_wallet_filter.screen_tokens([address for address, _, _ in tier1_candidates]):
+        counts["tier1"] += 1
+        social, token_info = candidates[address]
+        if not token_info:
+            token_info = solscan.get_token_info(address)
+        onchain = onchain_score(address, token_info, holders, bad_holders, social)
+        signals = social["signals"] + onchain["signals"]
+        if onchain["score"] < settings.TRIAGE_TIER1_MIN_SCORE:
+            logger.info(f"Triage: {address} stays at tier 1 (score {onchain['score']:.2f})")
+            verification_cache.mark_uninteresting(address, f"triage score {onchain['score']:.2f}")
+            continue
+        counts["tier2"] += 1
+        logger.info(f"Triage: {address} promoted to full analysis (score {onchain['score']:.2f}: {', '.join(signals) or 'no single strong signal'})")
+        promoted.append({
+            "address": address,
+            "token_info": token_info,
+            "holders": holders,
+            "bad_holders": bad_holders,
+            "triage": {
+                "social_score": round(social["score"], 3),
+                "score": round(onchain["score"], 3),
+                "holder_concentration": round(onchain["holder_concentration"], 4),
+                "signals": signals
+            }
+        })
+
+    promoted.sort(key=lambda token: -token["triage"]["score"])
+    return promoted, counts
+
+def _load() -> None:
+    """Loads the persisted counters once per process."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if not os.path.exists(settings.TRIAGE_STATS_PATH):
+        return
+    try:
+        with open(settings.TRIAGE_STATS_PATH, 'r') as f:
+            _stats.update(json.load(f))
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Error loading triage stats: {e}")
+
+def record_cycle(counts: Dict[str, int]) -> Dict[str, Any]:
+    """Adds one cycle's stage counts to the totals, logs the funnel and saves the totals.
+
+    Returns:
+        get_stats() after the update.
+    """
+    with _lock:
+        _load()
+        _stats["cycles"] = _stats.get("cycles", 0) + 1
+        for stage in STAGES:
+            _stats[stage] = _stats.get(stage, 0) + counts.get(stage, 0)
+        data = json.dumps(_stats)
+    logger.info("Triage funnel this cycle: " + " -> ".join(f"{stage} {counts.get(stage, 0)}" for stage in STAGES))
+    try:
+        stats_dir = os.path.dirname(settings.TRIAGE_STATS_PATH)
+        if stats_dir:
+            os.makedirs(stats_dir, exist_ok=True)
+        with open(settings.TRIAGE_STATS_PATH, 'w') as f:
+            f.write(data)
+    except OSError as e:
+        logger.error(f"Error saving triage stats: {e}")
+    return get_stats()
+
+def get_stats() -> Dict[str, Any]:
+    """Total tokens per stage and the share of tier 0 tokens that reached each stage."""
+    with _lock:
+        _load()
+        totals = {stage: _stats.get(stage, 0) for stage in STAGES}
+        cycles = _stats.get("cycles", 0)
+    entered = totals["tier0"]
+    return {
+        "cycles": cycles,
+        "totals": totals,
+        "shares": {stage: round(totals[stage] / entered, 4) if entered else 0.0 for stage in STAGES}
+    }
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    stats = get_stats()
+    print(f"Triage over {stats['cycles']} cycles:")
+    for stage in STAGES:
+        print(f"  {stage}: {stats['totals'][stage]} tokens ({stats['shares'][stage]:.1%} of tier 0)")
@@ -0,0 +1,374 @@
+"""Pluggable backends for the final pump-and-dump verdict.
+
+analyze_token_transactions computes heuristic signals for every token and then asks
+a backend for a second opinion:
+
+- LLMBackend: the existing analyze_with_ai call (seconds per token).
+- LocalBackend: a logistic model over the heuristic signals, trained offline on the
+  stored data/analysis/*.json results (microseconds per token).
+
+ANALYSIS_BACKEND selects "llm", "local" or "hybrid". In hybrid mode the local score
+is computed first and the LLM is only called when the score falls inside the
+uncertain band [LOCAL_SCORER_UNCERTAIN_LOW, LOCAL_SCORER_UNCERTAIN_HIGH]. Without a
+trained model, hybrid behaves like "llm". get_verdicts decides several tokens at once
+and sends the ones that need the LLM through one batched call.
+
+Train the local model with:
+    python -m correlation_engine.verdict_backends train
+"""
+
+import glob
+import json
+import logging
+import math
+import os
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import settings
+from correlation_engine import llm_client
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+FEATURE_NAMES = [
+    "log_transactions",
+    "sell_ratio",
+    "log_unique_wallets",
+    "wallets_per_transaction",
+    "dumper_count",
+    "max_dump_ratio",
+    "whale_count",
+    "top_holder_percent",
+    "has_volume_spike",
+    "log_spike_factor",
+    "ring_members",
+    "log_campaign_copies",
+    "campaign_authors",
+    "log_promotion_tweets",
+]
+
+def extract_features(result: Dict[str, Any]) -> List[float]:
+    """Builds the feature vector from a heuristic analysis result.
+
+    Works on both the in-progress result of analyze_token_transactions and the stored
+    data/analysis/*.json files; signals missing from older files count as 0.
+    """
+    summary = result.get("transaction_summary") or {}
+    total = summary.get("total", 0) or 0
+    buys = summary.get("buys", 0) or 0
+    sells = summary.get("sells", 0) or 0
+    unique_wallets = summary.get("unique_wallets", 0) or 0
+    dumpers = result.get("potential_dumpers") or []
+    holders = result.get("top_holders") or []
+    volume = result.get("volume_analysis") or {}
+    promotion = result.get("coordinated_promotion") or {}
+    campaign = result.get("campaign") or {}
+    largest = campaign.get("largest_campaign") or {}
+
+    return [
+        math.log1p(total),
+        sells / (buys + sells) if buys + sells else 0.0,
+        math.log1p(unique_wallets),
+        unique_wallets / total if total else 0.0,
+        float(len(dumpers)),
+        min(max((d.get("dump_ratio", 0) for d in dumpers), default=0.0), 100.0),
+        float(len(holders)),
+        max((h.get("percent_of_supply", 0) for h in holders), default=0.0) / 100.0,
+        1.0 if volume.get("has_spike") else 0.0,
+        math.log1p(volume.get("spike_factor", 0) or 0),
+        float(len(promotion.get("ring_members") or [])),
+        math.log1p(largest.get("copies", 0) or 0),
+        float(largest.get("authors", 0) or 0),
+        math.log1p(campaign.get("total_tweets", 0) or 0),
+    ]
+
+def _sigmoid(z: float) -> float:
+    """Numerically stable logistic function."""
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+class VerdictBackend:
+    """Interface for pump-and-dump verdict backends."""
+
+    name = "base"
+
+    def is_available(self) -> bool:
+        """True if the backend can produce a verdict right now."""
+        raise NotImplementedError
+
+    def analyze(self, token_data: Dict[str, Any], extracted_tweets: List[Dict[str, Any]],
+                heuristic_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns {"is_pump_dump", "confidence", "reasons", ...} for a token.
+
+        Args:
+            token_data: Detailed token data as passed to analyze_token_transactions.
+            extracted_tweets: Tweets mentioning the token.
+            heuristic_result: The heuristic analysis result built so far.
+        """
+        raise NotImplementedError
+
+    def analyze_batch(self, items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+                      heuristic_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns one verdict per (token_data, extracted_tweets) item, in order."""
+        return [self.analyze(token_data, tweets, result) for (token_data, tweets), result in zip(items, heuristic_results)]
+
+class LLMBackend(VerdictBackend):
+    """The existing AI analysis (analyze_with_ai)."""
+
+    name = "llm"
+
+    def is_available(self) -> bool:
+        return llm_client.is_configured()
+
+    def analyze(self, token_data, extracted_tweets, heuristic_result):
+        # Imported here because pump_dump_analyzer imports this module
+        from correlation_engine import pump_dump_analyzer
+        return pump_dump_analyzer.analyze_with_ai(token_data, extracted_tweets)
+
+    def analyze_batch(self, items, heuristic_results):
+        from correlation_engine import pump_dump_analyzer
+        return pump_dump_analyzer.analyze_with_ai_batch(items)
+
+class LocalBackend(VerdictBackend):
+    """Logistic model over the heuristic signals, loaded from LOCAL_VERDICT_MODEL_PATH."""
+
+    name = "local"
+
+    def __init__(self, model_path: str = None):
+        self.model_path = model_path or settings.LOCAL_VERDICT_MODEL_PATH
+        self._model: Optional[Dict[str, Any]] = None
+        self._mtime: Optional[float] = None
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        """Loads the model, reloading it when the file changes after retraining."""
+        try:
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            self._model, self._mtime = None, None
+            return None
+        if mtime != self._mtime:
+            try:
+                with open(self.model_path, 'r') as f:
+                    model = json.load(f)
+                if model.get("feature_names") != FEATURE_NAMES:
+                    logger.warning(f"Local verdict model at {self.model_path} was trained on different features; retrain it")
+                    model = None
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Error loading local verdict model: {e}")
+                model = None
+            self._model, self._mtime = model, mtime
+        return self._model
+
+    def is_available(self) -> bool:
+        return self._load() is not None
+
+    def score(self, heuristic_result: Dict[str, Any]) -> Optional[float]:
+        """Returns the pump-and-dump probability for a heuristic result, or None without a model."""
+        model = self._load()
+        if model is None:
+            return None
+        z = model["bias"]
+        for x, mean, std, weight in zip(extract_features(heuristic_result), model["means"], model["stds"], model["weights"]):
+            z += weight * (x - mean) / std
+        return _sigmoid(z)
+
+    def analyze(self, token_data, extracted_tweets, heuristic_result):
+        probability = self.score(heuristic_result)
+        if probability is None:
+            return {}
+        is_pump_dump = probability > 0.5
+        # Confidence is in the verdict given, so a clear "not a pump" can outweigh a
+        # suspicious heuristic in _apply_verdict; the raw P(pump) stays in local_score
+        return {
+            "is_pump_dump": is_pump_dump,
+            "confidence": max(probability, 1.0 - probability),
+            "local_score": probability,
+            "reasons": [f"Local model score {probability:.2f} ({'pump and dump' if is_pump_dump else 'not a pump and dump'})"],
+            "backend": self.name
+        }
+
+_backends: Dict[str, VerdictBackend] = {}
+
+def get_backend(name: str) -> VerdictBackend:
+    """Returns the shared backend instance for a name ("llm" or "local")."""
+    if name not in _backends:
+        if name == "llm":
+            _backends[name] = LLMBackend()
+        elif name == "local":
+            _backends[name] = LocalBackend()
+        else:
+            raise ValueError(f"Unknown verdict backend: {name}")
+    return _backends[name]
+
+def is_uncertain(score: float) -> bool:
+    """True when a local score falls inside the configured uncertain band."""
+    return settings.LOCAL_SCORER_UNCERTAIN_LOW <= score <= settings.LOCAL_SCORER_UNCERTAIN_HIGH
+
+def get_verdict(token_data: Dict[str, Any], extracted_tweets: List[Dict[str, Any]],
+                heuristic_result: Dict[str, Any], mode: str = None) -> Dict[str, Any]:
+    """Returns the second-opinion verdict for a token according to ANALYSIS_BACKEND.
+
+    Returns:
+        The backend's verdict with a 'backend' key ("llm" or "local"), plus 'local_score'
+        when the local model was consulted; {} if no backend is available.
+    """
+    return get_verdicts([(token_data, extracted_tweets)], [heuristic_result], mode)[0]
+
+def get_verdicts(items: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+                 heuristic_results: List[Dict[str, Any]], mode: str = None) -> List[Dict[str, Any]]:
+    """Batch version of get_verdict: the tokens that need the LLM share batched requests.
+
+    Args:
+        items: (token_data, extracted_tweets) pairs.
+        heuristic_results: The heuristic result for each item.
+        mode: Overrides ANALYSIS_BACKEND.
+
+    Returns:
+        One verdict per item, in order ({} where no backend is available).
+    """
+    mode = mode or settings.ANALYSIS_BACKEND
+    if mode not in ("llm", "local", "hybrid"):
+        logger.warning(f"Unknown ANALYSIS_BACKEND '{mode}', using hybrid")
+        mode = "hybrid"
+    llm = get_backend("llm")
+    local = get_backend("local")
+
+    local_scores: List[Optional[float]] = [None] * len(items)
+    if mode in ("local", "hybrid"):
+        local_scores = [local.score(result) for result in heuristic_results]
+
+    llm_indices = []
+    if llm.is_available():
+        llm_indices = [
+            i for i, score in enumerate(local_scores)
+            if mode == "llm" or (mode == "hybrid" and (score is None or is_uncertain(score)))
+        ]
+    llm_verdicts = {}
+    if llm_indices:
+        batch = llm.analyze_batch([items[i] for i in llm_indices], [heuristic_results[i] for i in llm_indices])
+        llm_verdicts = dict(zip(llm_indices, batch))
+    if mode == "hybrid":
+        confident = sum(1 for score in local_scores if score is not None and not is_uncertain(score))
+        if confident:
+            logger.info(f"Local model score is outside the uncertain band for {confident} of {len(items)} tokens; skipping LLM analysis for them")
+
+    verdicts = []
+    for i, (token_data, extracted_tweets) in enumerate(items):
+        if i in llm_verdicts:
+            verdict = dict(llm_verdicts[i])
+            verdict["backend"] = llm.name
+        elif local_scores[i] is not None:
+            verdict = local.analyze(token_data, extracted_tweets, heuristic_results[i])
+        else:
+            verdicts.append({})
+            continue
+        if local_scores[i] is not None:
+            verdict["local_score"] = local_scores[i]
+        verdicts.append(verdict)
+    return verdicts
+
+def load_training_data(analysis_dir: str = "./data/analysis") -> Tuple[List[List[float]], List[int]]:
+    """Reads stored analysis results as (features, labels).
+
+    Results whose verdict came from the local model itself are skipped, so the model
+    is not retrained on its own predictions.
+    """
+    features, labels = [], []
+    for path in sorted(glob.glob(os.path.join(analysis_dir, "*.json"))):
+        try:
+            with open(path, 'r') as f:
+                result = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Skipping unreadable analysis file {path}: {e}")
+            continue
+        if result.get("verdict_backend") == "local" or "is_pump_dump" not in result:
+            continue
+        features.append(extract_features(result))
+        labels.append(1 if result["is_pump_dump"] else 0)
+    return features, labels
+
+def train_local_model(analysis_dir: str = "./data/analysis", output_path: str = None,
+                      iterations: int = 2000, learning_rate: float = 0.1, l2: float = 0.01) -> Dict[str, Any]:
+    """Trains the local logistic model on stored analyses and saves it.
+
+    Raises:
+        ValueError if there are too few samples or only one class is present.
+    """
+    output_path = output_path or settings.LOCAL_VERDICT_MODEL_PATH
+    features, labels = load_training_data(analysis_dir)
+    positives = sum(labels)
+    if len(labels) < 10:
+        raise ValueError(f"Need at least 10 stored analyses to train, found {len(labels)}")
+    if positives == 0 or positives == len(labels):
+        raise ValueError(f"All {len(labels)} stored analyses have the same verdict; "
+                         "a model needs both pump-and-dump and clean tokens to learn from")
+
+    n, dims = len(features), len(FEATURE_NAMES)
+    means = [sum(row[j] for row in features) / n for j in range(dims)]
+    stds = []
+    for j in range(dims):
+        variance = sum((row[j] - means[j]) ** 2 for row in features) / n
+        stds.append(math.sqrt(variance) or 1.0)
+    scaled = [[(row[j] - means[j]) / stds[j] for j in range(dims)] for row in features]
+
+    weights = [0.0] * dims
+    bias = math.log(positives / (n - positives))
+    for _ in range(iterations):
+        grad_w = [0.0] * dims
+        grad_b = 0.0
+        for row, label in zip(scaled, labels):
+            error = _sigmoid(bias + sum(w * x for w, x in zip(weights, row))) - label
+            grad_b += error
+            for j in range(dims):
+                grad_w[j] += error * row[j]
+        bias -= learning_rate * grad_b / n
+        weights = [w - learning_rate * (g / n + l2 * w) for w, g in zip(weights, grad_w)]
+
+    correct = sum(
+        1 for row, label in zip(scaled, labels)
+        if (_sigmoid(bias + sum(w * x for w, x in zip(weights, row))) > 0.5) == bool(label)
+    )
+    model = {
+        "feature_names": FEATURE_NAMES,
+        "means": means,
+        "stds": stds,
+        "weights": weights,
+        "bias": bias,
+        "samples": n,
+        "positives": positives,
+        "training_accuracy": correct / n,
+        "trained_at": time.time()
+    }
+    model_dir = os.path.dirname(output_path)
+    if model_dir:
+        os.makedirs(model_dir, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(model, f, indent=2)
+    logger.info(f"Trained local verdict model on {n} analyses ({positives} pump-and-dump), "
+                f"training accuracy {correct / n:.2f}; saved to {output_path}")
+    return model
+
+# Train with "train", otherwise score the stored analyses with the current model
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "train":
+        try:
+            train_local_model()
+        except ValueError as e:
+            print(f"Not training: {e}")
+    else:
+        backend = LocalBackend()
+        if not backend.is_available():
+            print(f"No local verdict model at {settings.LOCAL_VERDICT_MODEL_PATH}; run with 'train' first")
+        else:
+            results = [json.load(open(path)) for path in sorted(glob.glob("./data/analysis/*.json"))]
+            start = time.perf_counter()
+            scores = [backend.score(result) for result in results]
+            elapsed = time.perf_counter() - start
+            uncertain = sum(1 for score in scores if is_uncertain(score))
+            print(f"Scored {len(scores)} analyses in {elapsed * 1000:.2f} ms; {uncertain} fall in the uncertain band and would go to the LLM")
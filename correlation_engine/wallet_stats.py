@@ -0,0 +1,162 @@
+"""Array-backed wallet statistics for the pump-and-dump heuristics.
+
+The per-wallet {"sent", "received", "net"} dicts from get_detailed_token_transactions
+are copied once into NumPy arrays. The dumper and whale criteria are then boolean
+masks over those arrays, and only the top k wallets are ranked: np.argpartition
+selects candidates in O(n) and only those are sorted, instead of sorting every match.
+
+Results are the same as the original loops: ties keep wallet insertion order (like a
+stable sort), totals are accumulated left to right (like sum()), and the returned
+entries are built from the original dict values.
+"""
+
+import logging
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+def top_k_indices(keys: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest keys, largest first, ties in index order.
+
+    Args:
+        keys: 1-d array of sort keys.
+        k: Number of indices to return.
+    """
+    n = len(keys)
+    if n == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        # Everything tied with the k-th largest key is kept so ties resolve by index
+        kth = keys[np.argpartition(-keys, k - 1)[k - 1]]
+        candidates = np.flatnonzero(keys >= kth)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -keys[candidates]))
+    return candidates[order][:k]
+
+def sequential_sum(values: np.ndarray) -> float:
+    """Sums left to right, matching Python's sum() over the same floats."""
+    if len(values) == 0:
+        return 0
+    return float(np.cumsum(values)[-1])
+
+class WalletStats:
+    """Sent/received totals per wallet, stored as parallel arrays."""
+
+    def __init__(self, wallets: Dict[str, Dict[str, Any]]):
+        self.wallets = wallets
+        self.addresses = list(wallets)
+        count = len(self.addresses)
+        self.received = np.fromiter((stats["received"] for stats in wallets.values()), dtype=float, count=count)
+        self.sent = np.fromiter((stats["sent"] for stats in wallets.values()), dtype=float, count=count)
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def top_share(self) -> float:
+        """Largest share (0-1) of everything received that went to a single wallet."""
+        total = sequential_sum(self.received)
+        return float(self.received.max() / total) if total > 0 else 0.0
+
+    def dumpers(self, ratio: float = 1.5, top_k: int = 5) -> Tuple[int, List[Dict[str, Any]]]:
+        """Wallets that sent out more than `ratio` times what they received.
+
+        Returns:
+            (number of such wallets, the top_k with the highest sent/received ratio)
+        """
+        mask = (self.received > 0) & (self.sent > self.received * ratio)
+        indices = np.flatnonzero(mask)
+        dump_ratios = self.sent[indices] / self.received[indices]
+        top = []
+        for i in indices[top_k_indices(dump_ratios, top_k)]:
+            stats = self.wallets[self.addresses[i]]
+            top.append({
+                "address": self.addresses[i],
+                "received": stats["received"],
+                "sent": stats["sent"],
+                "net": stats["net"],
+                "dump_ratio": stats["sent"] / stats["received"] if stats["received"] > 0 else 0
+            })
+        return len(indices), top
+
+    def whales(self, share: float = 0.1, top_k: int = 5, large_percent: float = 5) -> Tuple[int, List[Dict[str, Any]], int]:
+        """Wallets that received more than `share` of everything received.
+
+        Returns:
+            (number of such wallets, the top_k by amount received, how many of them
+            hold more than large_percent of the supply)
+        """
+        total_supply = sequential_sum(self.received)
+        indices = np.flatnonzero(self.received > total_supply * share)
+        received = self.received[indices]
+        if total_supply > 0:
+            percents = received / total_supply * 100
+        else:
+            percents = np.zeros(len(indices))
+        top = []
+        for j in top_k_indices(received, top_k):
+            address = self.addresses[indices[j]]
+            top.append({
+                "address": address,
+                "received": self.wallets[address]["received"],
+                "percent_of_supply": float(percents[j])
+            })
+        return len(indices), top, int((percents > large_percent).sum())
+
+# Benchmark against the original dict loops
+if __name__ == '__main__':
+    import random
+    import time
+
+    def loop_analysis(wallets):
+        potential_dumpers = []
+        for wallet_addr, stats in wallets.items():
+            if stats["received"] > 0 and stats["sent"] > stats["received"] * 1.5:
+                potential_dumpers.append({
+                    "address": wallet_addr, "received": stats["received"], "sent": stats["sent"], "net": stats["net"],
+                    "dump_ratio": stats["sent"] / stats["received"] if stats["received"] > 0 else 0
+                })
+        potential_dumpers.sort(key=lambda x: x["dump_ratio"], reverse=True)
+        total_supply = sum(w["received"] for w in wallets.values())
+        potential_whales = []
+        for wallet_addr, stats in wallets.items():
+            if stats["received"] > total_supply * 0.1:
+                potential_whales.append({
+                    "address": wallet_addr, "received": stats["received"],
+                    "percent_of_supply": (stats["received"] / total_supply) * 100 if total_supply > 0 else 0
+                })
+        potential_whales.sort(key=lambda x: x["received"], reverse=True)
+        top_5_percent = sum(1 for w in potential_whales if w["percent_of_supply"] > 5)
+        return len(potential_dumpers), potential_dumpers[:5], len(potential_whales), potential_whales[:5], top_5_percent
+
+    random.seed(8)
+    for size in (10000, 100000, 1000000):
+        wallets = {}
+        for i in range(size):
+            received = float(random.choice([0, random.randint(1, 10 ** 6), random.randint(1, 10 ** 12)]))
+            sent = float(random.choice([0, random.randint(1, 10 ** 6), received * 2, received * 3]))
+            wallets[f"wallet{i}"] = {"sent": sent, "received": received, "net": received - sent}
+        for whale in range(3):
+            wallets[f"whale{whale}"] = {"sent": 0.0, "received": 10.0 ** 12 * size / (whale + 2), "net": 10.0 ** 12 * size / (whale + 2)}
+
+        started = time.perf_counter()
+        expected = loop_analysis(wallets)
+        loop_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        stats = WalletStats(wallets)
+        load_time = time.perf_counter() - started
+        started = time.perf_counter()
+        dumper_count, top_dumpers = stats.dumpers()
+        whale_count, top_whales, large = stats.whales()
+        array_time = time.perf_counter() - started
+
+        assert (dumper_count, top_dumpers, whale_count, top_whales, large) == expected
+        print(f"{size:>8} wallets: loops {loop_time * 1000:8.1f} ms | arrays {array_time * 1000:7.1f} ms "
+              f"(+ {load_time * 1000:.1f} ms to load) | {dumper_count} dumpers, {whale_count} whales, identical")
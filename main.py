@@ -10,10 +10,21 @@ from typing import List, Dict, Any
 
 from config import settings
 from social_aggregator import twitter
+from social_aggregator import promoter_index
+from social_aggregator import promotion_graph
+from social_aggregator import pump_matcher
+from social_aggregator import dedup
 # from social_aggregator import telegram, discord # Uncomment when implemented
 from onchain_monitor import solscan
+from onchain_monitor import verification_cache
+from onchain_monitor import bad_wallet_filter
+from onchain_monitor import baseline_store
 from correlation_engine import engine
 from correlation_engine import pump_dump_analyzer
+from correlation_engine import cross_correlation
+from correlation_engine import event_join
+from correlation_engine import llm_cache
+from correlation_engine import triage
 from alerting import alert
 
 # Configure logging
@@ -62,24 +73,26 @@ def run_monitor_cycle(test_mode=False):
         logger.warning("No tweets found. Skipping this monitoring cycle.")
         return
     
+    # Pre-flag tweets from accounts that already promoted tokens which later dumped
+    # (test mode leaves the persistent promoter index alone)
+    if not test_mode:
+        promoter_index.flag_known_promoters(recent_tweets)
+    
+    # Collapse copy-paste campaigns into one representative per message, so the quick scan,
+    # AI extraction and token matching below scale with distinct messages, not raw tweets
+    all_tweets = recent_tweets
+    recent_tweets = dedup.collapse_near_duplicates(all_tweets)
+    
     # Quick scan for high-confidence pump indicators before AI analysis
     high_confidence_tweets = []
-    for tweet in recent_tweets:
-        text = tweet.get('text', '').lower()
-        # Check for token contract address
-        has_token_address = any(x in text.lower() for x in ["contract", "token address", "address:", "ca:"])
-        # Check for pump indicators
-        has_pump_indicators = any(x in text for x in ["100x", "1000x", "moonshot", "to the moon", "🚀"])
-        # Check for urgency
-        has_urgency = any(x in text.lower() for x in ["don't miss", "hurry", "last chance", "early"])
-        
-        score = 0
-        if has_token_address:
-            score += 0.4
-        if has_pump_indicators:
-            score += 0.3
-        if has_urgency:
-            score += 0.3
+    # Token address, pump and urgency indicators are matched in one pass per tweet
+    quick_scores = pump_matcher.score_tweets(recent_tweets, "quick_scan")
+    for tweet, quick_score in zip(recent_tweets, quick_scores):
+        score = quick_score["score"]
+        # Kept on the tweet for the tier 0 triage of the tokens it mentions
+        tweet['quick_score'] = score
+        if tweet.get('known_promoter'):
+            score += settings.KNOWN_PROMOTER_SCORE_BOOST
             
         if score >= 0.6:  # High confidence threshold
             author = tweet.get('author', {}).get('userName', 'Unknown')
@@ -87,14 +100,16 @@ def run_monitor_cycle(test_mode=False):
                 'author': author,
                 'text': tweet.get('text'),
                 'confidence': score,
-                'url': tweet.get('url', '')
+                'url': tweet.get('url', ''),
+                'known_promoter': tweet.get('known_promoter'),
+                'copies': tweet.get('duplicate_count', 1)
             })
     
     # Log summary of high-confidence tweets
     if high_confidence_tweets:
         logger.warning(f"Found {len(high_confidence_tweets)} high-confidence pump-and-dump tweets!")
         for i, t in enumerate(high_confidence_tweets[:3], 1):  # Show up to 3 examples
-            logger.warning(f"High confidence tweet #{i}: @{t['author']} ({t['confidence']:.2f})")
+            logger.warning(f"High confidence tweet #{i}: @{t['author']} ({t['confidence']:.2f}, {t['copies']} copies)")
             logger.warning(f"  {t['text'][:100]}..." if len(t['text']) > 100 else t['text'])
 
     # 2. Analyze Tweets with AI to extract sentiment and token addresses
@@ -178,39 +193,42 @@ def run_monitor_cycle(test_mode=False):
     else:
         all_onchain_transfers = []
         
-        # First check the extracted addresses (from tweets)
-        for address in extracted_addresses:
+        # First check the extracted addresses (from tweets); tokens with data are
+        # collected and analyzed together so their AI verdicts can share requests
+        pending_tokens = []
+        tweets_by_token = {}
+        tweet_copies_by_token = {}
+        # Index tweets by token once (one extractor pass) instead of scanning every tweet per address
+        token_tweet_map = event_join.build_token_tweet_map(recent_tweets, extracted_addresses)
+        tweet_lookup = dedup.duplicate_index(all_tweets)
+        # Tiered triage: tweet signals (tier 0), then metadata and the first holder page
+        # (tier 1); only tokens that still look suspicious get the full fetch and analysis
+        promoted_tokens, triage_counts = triage.triage_tokens(extracted_addresses, token_tweet_map)
+        for promoted in promoted_tokens:
+            address = promoted["address"]
             # Use the detailed transaction analysis for token addresses
             logger.info(f"Fetching detailed transaction data for token: {address}")
-            token_data = solscan.get_detailed_token_transactions(address, hours_lookback=48)
+            token_data = solscan.get_detailed_token_transactions(address, hours_lookback=48, holders=promoted["holders"],
+                                                                 token_info=promoted["token_info"])
             
             if token_data:
-                # Save token address and related tweets for detailed analysis
-                logger.info(f"Performing detailed pump and dump analysis for token: {address}")
-                
-                # Find tweets that mention this specific token
-                token_tweets = []
-                for tweet in recent_tweets:
-                    if address.lower() in tweet.get('text', '').lower():
-                        token_tweets.append(tweet)
+                token_data["known_bad_holders"] = promoted["bad_holders"]
+                token_data["triage"] = promoted["triage"]
+                # Tweets that mention this specific token
+                token_tweets = token_tweet_map.get(address, [])
                 
                 if token_tweets:
-                    logger.info(f"Found {len(token_tweets)} tweets mentioning token {address}")
+                    total_copies = sum(t.get('duplicate_count', 1) for t in token_tweets)
+                    logger.info(f"Found {len(token_tweets)} distinct messages ({total_copies} tweets) mentioning token {address}")
                 
-                # Run pump and dump analysis
-                analysis_result = pump_dump_analyzer.analyze_token_transactions(token_data, token_tweets)
-                
-                # If it appears to be a pump and dump, generate a detailed report
-                if analysis_result.get("is_pump_dump", False):
-                    confidence = analysis_result.get("confidence", 0)
-                    logger.warning(f"PUMP AND DUMP DETECTED for token {address} with {confidence:.2f} confidence")
-                    
-                    # Generate detailed report
-                    report = pump_dump_analyzer.generate_pump_dump_report(address, token_data, analysis_result, token_tweets)
-                    
-                    # Also send an alert
-                    subject = f"ALERT: Pump and Dump Detected for Token {address[:10]}..."
-                    alert.send_alert(subject, report)
+                # Feed the co-promotion graph before analysis so ring membership is up to date;
+                # every copy counts here since each one is a separate account posting
+                token_copies = dedup.expand_duplicates(token_tweets, all_tweets, index=tweet_lookup)
+                promotion_records = twitter.build_promotion_records(token_copies)
+                promotion_graph.add_promotions(address, promotion_records, persist=False)
+                pending_tokens.append((address, token_data, token_tweets, promotion_records))
+                tweets_by_token[address] = token_tweets
+                tweet_copies_by_token[address] = token_copies
             
             # Also get standard transfers for correlation analysis
             token_transfers = solscan.get_token_transfers(address, limit=50)
@@ -218,6 +236,43 @@ def run_monitor_cycle(test_mode=False):
                 logger.info(f"Found {len(token_transfers)} transfers for extracted token address: {address}")
                 all_onchain_transfers.extend(token_transfers)
         
+        # Run pump and dump analysis for all fetched tokens at once
+        if pending_tokens:
+            logger.info(f"Performing detailed pump and dump analysis for {len(pending_tokens)} tokens")
+            analysis_results = pump_dump_analyzer.analyze_token_transactions_batch(
+                [(token_data, token_tweets) for _, token_data, token_tweets, _ in pending_tokens]
+            )
+        else:
+            analysis_results = []
+        
+        for (address, token_data, token_tweets, promotion_records), analysis_result in zip(pending_tokens, analysis_results):
+            # Keep the promoter index up to date with who promoted this token and how it turned out
+            promoter_index.record_promotions(address, promotion_records)
+            promoter_index.set_token_verdict(address, analysis_result.get("is_pump_dump", False), analysis_result.get("confidence", 0))
+            verification_cache.record_analysis(address, analysis_result)
+            bad_wallet_filter.record_analysis(analysis_result)
+            
+            # If it appears to be a pump and dump, generate a detailed report
+            # (unchanged tokens reuse their last analysis and were reported then)
+            if analysis_result.get("is_pump_dump", False) and not analysis_result.get("reused_analysis"):
+                confidence = analysis_result.get("confidence", 0)
+                logger.warning(f"PUMP AND DUMP DETECTED for token {address} with {confidence:.2f} confidence")
+                
+                # Generate detailed report
+                report = pump_dump_analyzer.generate_pump_dump_report(address, token_data, analysis_result, token_tweets)
+                
+                # Also send an alert
+                subject = f"ALERT: Pump and Dump Detected for Token {address[:10]}..."
+                alert.send_alert(subject, report)
+        
+        verification_cache.save()
+        bad_wallet_filter.save()
+        promotion_graph.save()
+        baseline_store.save()
+        triage_counts["llm"] = sum(1 for result in analysis_results
+                                   if result.get("verdict_backend") == "llm" and not result.get("reused_analysis"))
+        triage.record_cycle(triage_counts)
+        
         # If no transfers found from extracted addresses, check the configured watch tokens
         if not all_onchain_transfers:
             for token_address in settings.SOLANA_WATCH_TOKENS:
@@ -259,7 +314,13 @@ def run_monitor_cycle(test_mode=False):
             ]
         }
     else:
-        onchain_results = engine.analyze_onchain_activity(all_onchain_transfers, addresses=extracted_addresses)
+        onchain_results = engine.analyze_onchain_activity(all_onchain_transfers, addresses=extracted_addresses,
+                                                          tweets_by_token=tweets_by_token)
+        # Attach to each large transfer / spike the tweets about its token posted shortly before it
+        event_join.attach_preceding_tweets(onchain_results["unusual_patterns"],
+                                           event_join.TweetTimeIndex(tweet_copies_by_token))
+        # Deterministic lead/lag between tweet mentions and volume, before any LLM call
+        onchain_results["social_correlation"] = cross_correlation.correlate_tokens(all_tweets, all_onchain_transfers)
     
     # 5. Find Correlations
     logger.info("--- Finding Correlations Using AI ---")
@@ -331,6 +392,8 @@ def run_monitor_cycle(test_mode=False):
     else:
         logger.info("No significant correlations detected in this cycle.")
 
+    if not test_mode:
+        llm_cache.log_stats()
     logger.info("Monitor cycle finished.")
 
 def analyze_specific_token(token_address: str, scan_twitter: bool = True):
@@ -356,6 +419,7 @@ def analyze_specific_token(token_address: str, scan_twitter: bool = True):
             
     # 1. Scan Twitter for mentions of this token (if requested)
     token_tweets = []
+    all_token_tweets = []
     if scan_twitter:
         logger.info("Scanning Twitter for mentions of this token...")
         
@@ -364,7 +428,8 @@ def analyze_specific_token(token_address: str, scan_twitter: bool = True):
         
         if tweets:
             logger.info(f"Found {len(tweets)} tweets mentioning token {token_address}")
-            token_tweets = tweets
+            all_token_tweets = tweets
+            token_tweets = dedup.collapse_near_duplicates(tweets)
         else:
             logger.warning(f"No tweets found mentioning token {token_address}")
     
@@ -379,17 +444,25 @@ def analyze_specific_token(token_address: str, scan_twitter: bool = True):
     # 3. Analyze for pump and dump patterns
     logger.info("Performing pump and dump analysis...")
     analysis_result = pump_dump_analyzer.analyze_token_transactions(token_data, token_tweets)
+    baseline_store.save()
+    
+    promoter_index.record_promotions(token_address, twitter.build_promotion_records(all_token_tweets))
+    promoter_index.set_token_verdict(token_address, analysis_result.get("is_pump_dump", False), analysis_result.get("confidence", 0))
     
     # 4. If it's a potential pump and dump, find all Twitter promoters
     promoters = []
     if analysis_result.get("is_pump_dump", False) or analysis_result.get("confidence", 0) > 0.3:
         logger.info(f"Potential pump and dump detected. Finding Twitter promoters...")
         promoters = twitter.find_promoters_for_token(token_address, since_days=7)
+        promotion_graph.save()
         
         if promoters:
             logger.info(f"Found {len(promoters)} Twitter accounts promoting this token")
             # Include promoters in the analysis result for the report
             analysis_result["promoters"] = promoters
+            analysis_result["coordinated_promotion"] = promotion_graph.get_ring_signal(
+                token_address, [p['username'] for p in promoters]
+            )
             
             # Log top promoters
             for i, promoter in enumerate(promoters[:3], 1):  # Top 3
@@ -0,0 +1,382 @@
+"""Streaming per-token anomaly detection for on-chain transfers.
+
+Each token keeps a small rolling state that is updated one transfer at a time:
+
+- transfer amounts: streaming p50/p99 estimates (P² algorithm, five markers per
+  quantile) and an EWMA of the amount. A transfer is outsized when it is above the
+  token's own p99 and at least ANOMALY_LARGE_TRANSFER_MEDIAN_MULTIPLE times its median.
+- hourly volume: an EWMA plus the last ANOMALY_BASELINE_HOURS completed hours, from
+  which the rolling median and MAD are taken when an hour closes. An hour is a spike
+  when its running volume exceeds the median by ANOMALY_VOLUME_SPIKE_Z robust
+  standard deviations and the EWMA by VOLUME_SPIKE_THRESHOLD_PERCENT.
+
+Every update is O(1): quantile markers and EWMAs are constant-size, and the median/MAD
+of the fixed-size hour window is only recomputed once per closed hour. Transfers that
+were already seen (every cycle re-fetches the most recent ones) are skipped. The state
+is persisted as JSON at ANOMALY_STATE_PATH so baselines survive restarts.
+"""
+
+import copy
+import json
+import logging
+import math
+import os
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Scale factor turning a MAD into a standard deviation estimate for normal data
+MAD_SCALE = 1.4826
+
+_lock = threading.Lock()
+_states: Dict[str, Dict[str, Any]] = {}
+_loaded = False
+_dirty = False
+
+# --- Streaming quantiles (P² algorithm) ---
+
+def _new_quantile(p: float) -> Dict[str, Any]:
+    """Creates the state of a streaming estimator for quantile p."""
+    return {"p": p, "q": [], "n": [0, 1, 2, 3, 4], "np": [0, 2 * p, 4 * p, 2 + 2 * p, 4]}
+
+def _update_quantile(state: Dict[str, Any], x: float) -> None:
+    """Adds one observation to a P² quantile estimator in O(1)."""
+    q, n, desired, p = state["q"], state["n"], state["np"], state["p"]
+    if len(q) < 5:
+        q.append(x)
+        q.sort()
+        return
+
+    if x < q[0]:
+        q[0] = x
+        k = 0
+    elif x >= q[4]:
+        q[4] = x
+        k = 3
+    else:
+        k = 0
+        while k < 3 and x >= q[k + 1]:
+            k += 1
+    for i in range(k + 1, 5):
+        n[i] += 1
+    increments = (0, p / 2, p, (1 + p) / 2, 1)
+    for i in range(5):
+        desired[i] += increments[i]
+
+    # Move the middle markers towards their desired positions
+    for i in range(1, 4):
+        d = desired[i] - n[i]
+        if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+            d = 1 if d > 0 else -1
+            parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+            )
+            if q[i - 1] < parabolic < q[i + 1]:
+                q[i] = parabolic
+            else:
+                q[i] += d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+            n[i] += d
+
+def _quantile_value(state: Dict[str, Any]) -> Optional[float]:
+    """Returns the current quantile estimate (None before any observation)."""
+    q = state["q"]
+    if not q:
+        return None
+    if len(q) < 5:
+        return q[min(len(q) - 1, int(round(state["p"] * (len(q) - 1))))]
+    return q[2]
+
+# --- Rolling median / MAD over the hour window ---
+
+def _median(values: List[float]) -> float:
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+def _new_state() -> Dict[str, Any]:
+    """Creates the rolling state for a token."""
+    return {
+        "transfers": 0,
+        "amount_ewma": None,
+        "p50": _new_quantile(0.5),
+        "p99": _new_quantile(0.99),
+        "hour": None,              # Start of the current (open) hour
+        "hour_volume": 0.0,
+        "hour_flagged": False,
+        "hours": [],               # Volumes of the last ANOMALY_BASELINE_HOURS closed hours
+        "volume_ewma": None,
+        "volume_median": 0.0,
+        "volume_mad": 0.0,
+        "last_time": 0,
+        "last_ids": []             # Transfer ids seen at last_time
+    }
+
+def _ewma(previous: Optional[float], value: float) -> float:
+    if previous is None:
+        return value
+    alpha = settings.ANOMALY_EWMA_ALPHA
+    return alpha * value + (1 - alpha) * previous
+
+def _close_hours(state: Dict[str, Any], hour: int) -> None:
+    """Closes the open hour (and any empty hours in between) before moving to `hour`."""
+    window = settings.ANOMALY_BASELINE_HOURS
+    if state["hour"] is not None:
+        # Idle hours count as zero volume; more than a window of them resets the window
+        missing = min((hour - state["hour"]) // 3600 - 1, window)
+        closed = [state["hour_volume"]] + [0.0] * max(missing, 0)
+        for volume in closed:
+            state["volume_ewma"] = _ewma(state["volume_ewma"], volume)
+        state["hours"] = (state["hours"] + closed)[-window:]
+        state["volume_median"] = _median(state["hours"])
+        state["volume_mad"] = _median([abs(v - state["volume_median"]) for v in state["hours"]])
+    state["hour"] = hour
+    state["hour_volume"] = 0.0
+    state["hour_flagged"] = False
+
+def _check_volume(state: Dict[str, Any], token: str) -> Optional[Dict[str, Any]]:
+    """Returns a volume_spike anomaly the first time the open hour crosses the threshold."""
+    if state["hour_flagged"] or len(state["hours"]) < settings.ANOMALY_MIN_HISTORY_HOURS:
+        return None
+    volume = state["hour_volume"]
+    median = state["volume_median"]
+    scale = max(MAD_SCALE * state["volume_mad"], 0.1 * median, 1e-9)
+    robust_z = (volume - median) / scale
+    baseline = state["volume_ewma"] or 0.0
+    if robust_z < settings.ANOMALY_VOLUME_SPIKE_Z or volume <= baseline * settings.VOLUME_SPIKE_THRESHOLD_PERCENT / 100:
+        return None
+    state["hour_flagged"] = True
+    return {
+        "type": "volume_spike",
+        "token": token,
+        "hour": state["hour"] // 3600,
+        "current_volume": volume,
+        "previous_volume": baseline,
+        "baseline_median": median,
+        "increase_factor": volume / baseline if baseline > 0 else None,
+        "robust_z": round(robust_z, 2)
+    }
+
+def _check_amount(state: Dict[str, Any], token: str, amount: float, timestamp: int,
+                  sender: str, receiver: str) -> Optional[Dict[str, Any]]:
+    """Returns a large_transfer anomaly if the amount is outsized for this token."""
+    if state["transfers"] < settings.ANOMALY_MIN_TRANSFERS:
+        return None
+    p99 = _quantile_value(state["p99"])
+    median = _quantile_value(state["p50"]) or 0.0
+    if p99 is None or amount <= p99 or amount < median * settings.ANOMALY_LARGE_TRANSFER_MEDIAN_MULTIPLE:
+        return None
+    return {
+        "type": "large_transfer",
+        "token": token,
+        "sender": sender,
+        "receiver": receiver,
+        "amount": amount,
+        "timestamp": timestamp,
+        "baseline_p99": p99,
+        "baseline_median": median,
+        "median_multiple": amount / median if median > 0 else None
+    }
+
+def _load() -> None:
+    """Loads the persisted state once per process."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if not os.path.exists(settings.ANOMALY_STATE_PATH):
+        return
+    try:
+        with open(settings.ANOMALY_STATE_PATH, 'r') as f:
+            _states.update(json.load(f))
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Error loading anomaly detector state: {e}")
+
+def save() -> None:
+    """Persists the per-token state if it changed."""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        data = json.dumps(_states)
+        _dirty = False
+    try:
+        state_dir = os.path.dirname(settings.ANOMALY_STATE_PATH)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        with open(settings.ANOMALY_STATE_PATH, 'w') as f:
+            f.write(data)
+    except OSError as e:
+        logger.error(f"Error saving anomaly detector state: {e}")
+
+def update(token: str, amount: float, timestamp: int, tx_id: str = None,
+           sender: str = "", receiver: str = "") -> List[Dict[str, Any]]:
+    """Feeds one transfer into the token's rolling state.
+
+    Transfers must arrive in time order per token; anything older than the newest
+    transfer seen, or already seen at the same timestamp, is ignored.
+
+    Returns:
+        The anomalies this transfer triggered (large_transfer and/or volume_spike).
+    """
+    global _dirty
+    with _lock:
+        _load()
+        state = _states.get(token)
+        if state is None:
+            state = _states[token] = _new_state()
+        anomalies = _apply(state, token, amount, timestamp, tx_id, sender, receiver)
+        _dirty = True
+    return anomalies
+
+def _apply(state: Dict[str, Any], token: str, amount: float, timestamp: int, tx_id: str = None,
+           sender: str = "", receiver: str = "") -> List[Dict[str, Any]]:
+    """Applies one transfer to a token state (no locking or persistence)."""
+    anomalies = []
+    if timestamp < state["last_time"] or (timestamp == state["last_time"] and tx_id and tx_id in state["last_ids"]):
+        return anomalies
+    if timestamp > state["last_time"]:
+        state["last_time"] = timestamp
+        state["last_ids"] = []
+    if tx_id:
+        state["last_ids"].append(tx_id)
+
+    # Check against the baseline before the transfer becomes part of it
+    large = _check_amount(state, token, amount, timestamp, sender, receiver)
+    if large:
+        anomalies.append(large)
+    state["transfers"] += 1
+    state["amount_ewma"] = _ewma(state["amount_ewma"], amount)
+    _update_quantile(state["p50"], amount)
+    _update_quantile(state["p99"], amount)
+
+    hour = timestamp - timestamp % 3600
+    if state["hour"] is None or hour > state["hour"]:
+        _close_hours(state, hour)
+    state["hour_volume"] += amount
+    spike = _check_volume(state, token)
+    if spike:
+        anomalies.append(spike)
+    return anomalies
+
+def _transfer_events(transfers: List[Dict[str, Any]]) -> List[Tuple[int, str, float, Dict[str, Any]]]:
+    """Returns (timestamp, token, amount, transfer) tuples in time order."""
+    events = []
+    for tx in transfers:
+        try:
+            token = tx.get('token_address') or tx.get('mint') or 'unknown'
+            amount = float(tx.get('amount', tx.get('lamport', 0)) or 0)
+            timestamp = int(tx.get('block_time', tx.get('blockTime', 0)) or 0)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Error reading transfer for anomaly detection: {e}")
+            continue
+        if timestamp:
+            events.append((timestamp, token, amount, tx))
+    events.sort(key=lambda event: event[0])
+    return events
+
+def process_transfers(transfers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Feeds a batch of Solscan transfers through the detector in time order.
+
+    Returns:
+        All anomalies found, in time order.
+    """
+    anomalies = []
+    for timestamp, token, amount, tx in _transfer_events(transfers):
+        anomalies.extend(update(
+            token, amount, timestamp,
+            tx_id=tx.get('trans_id') or tx.get('signature'),
+            sender=tx.get('from_address', tx.get('src', '')),
+            receiver=tx.get('to_address', tx.get('dst', ''))
+        ))
+    if anomalies:
+        logger.info(f"Anomaly detector flagged {len(anomalies)} events across {len({a['token'] for a in anomalies})} tokens")
+    return anomalies
+
+def process_partition(token: str, transfers: List[Dict[str, Any]],
+                      state: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Runs one token's transfers through a detached state, without touching the shared one.
+
+    Safe to call from worker processes: the state comes in from export_states and the
+    updated state goes back through import_states.
+
+    Returns:
+        (anomalies in time order, updated state)
+    """
+    state = state or _new_state()
+    anomalies = []
+    for timestamp, _, amount, tx in _transfer_events(transfers):
+        anomalies.extend(_apply(
+            state, token, amount, timestamp,
+            tx_id=tx.get('trans_id') or tx.get('signature'),
+            sender=tx.get('from_address', tx.get('src', '')),
+            receiver=tx.get('to_address', tx.get('dst', ''))
+        ))
+    return anomalies, state
+
+def export_states(tokens: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Returns deep copies of the states of the given tokens (None for unseen tokens)."""
+    with _lock:
+        _load()
+        return {token: copy.deepcopy(_states.get(token)) for token in tokens}
+
+def import_states(states: Dict[str, Dict[str, Any]]) -> None:
+    """Replaces token states with ones updated by process_partition."""
+    global _dirty
+    with _lock:
+        _load()
+        _states.update(states)
+        if states:
+            _dirty = True
+
+def get_baseline(token: str) -> Optional[Dict[str, Any]]:
+    """Returns a summary of a token's current baseline, or None if it has no state."""
+    with _lock:
+        _load()
+        state = _states.get(token)
+        if state is None:
+            return None
+        return {
+            "transfers": state["transfers"],
+            "amount_median": _quantile_value(state["p50"]),
+            "amount_p99": _quantile_value(state["p99"]),
+            "amount_ewma": state["amount_ewma"],
+            "hours_of_history": len(state["hours"]),
+            "volume_ewma": state["volume_ewma"],
+            "volume_median": state["volume_median"],
+            "volume_mad": state["volume_mad"]
+        }
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    import random
+    import time
+
+    random.seed(3)
+    settings.ANOMALY_STATE_PATH = ""  # Keep the demo out of the real state file
+    start_time = 1745000000 - 1745000000 % 3600
+    transfers = []
+    for minute in range(60 * 72):
+        timestamp = start_time + minute * 60
+        # Normal trading: a few lognormal transfers per minute; hour 60 is pumped
+        count = random.randint(0, 3) if minute // 60 != 60 else random.randint(10, 20)
+        for n in range(count):
+            transfers.append({"token_address": "DemoToken", "amount": random.lognormvariate(5, 1),
+                              "block_time": timestamp, "trans_id": f"{minute}-{n}"})
+    transfers.append({"token_address": "DemoToken", "amount": 250000.0, "block_time": start_time + 70 * 3600, "trans_id": "whale"})
+
+    started = time.perf_counter()
+    found = process_transfers(transfers)
+    elapsed = time.perf_counter() - started
+    print(f"Processed {len(transfers)} transfers in {elapsed * 1000:.1f} ms ({elapsed / len(transfers) * 1e6:.1f} us per transfer)")
+    for anomaly in found:
+        print(f"  {anomaly['type']}: " + ", ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in anomaly.items() if k not in ("type", "token")))
+    print(f"Re-processing the same batch flags {len(process_transfers(transfers))} events")
+    print(f"Baseline: {get_baseline('DemoToken')}")
@@ -0,0 +1,255 @@
+"""Bloom filter of wallets flagged in past analyses, for screening new tokens.
+
+A token used to cost a full transfer fetch and analysis before we learned that its
+early holders were wallets we had flagged before. This filter holds every wallet
+that past analyses flagged:
+
+- potential dumpers (sent out much more than they received) of every analyzed token
+- top holders (whales) of tokens judged to be a pump and dump; whales of other tokens
+  are often team or treasury wallets and are left out
+
+Known pool, program and exchange addresses (known_addresses) are never added, since
+they sit at the top of almost every holder list.
+
+The filter is a bit array sized for BAD_WALLET_FILTER_CAPACITY wallets at
+BAD_WALLET_FILTER_ERROR_RATE false positives (14.4 bits per wallet at 0.1%), with
+double hashing over one blake2b digest. It is persisted at BAD_WALLET_FILTER_PATH
+and rebuilt from the saved analyses when it is missing or
+has grown past its capacity. screen_tokens checks the first holder page of each
+candidate token and orders the candidates: tokens held by flagged wallets first,
+clean tokens last (and at most BAD_WALLET_MAX_CLEAN_TOKENS of them per cycle).
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import math
+import os
+import struct
+import threading
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from config import settings
+from correlation_engine import analysis_memo
+from onchain_monitor import known_addresses
+from onchain_monitor import solscan
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# File header: bit count, hash count, wallets added, capacity
+_HEADER = struct.Struct("<QIQQ")
+
+class BloomFilter:
+    """Fixed-size Bloom filter over address strings."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(int(capacity), 1)
+        self.bit_count = max(int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)), 64)
+        self.hash_count = max(int(round(self.bit_count / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def _positions(self, address: str) -> List[int]:
+        digest = hashlib.blake2b(address.encode("utf-8"), digest_size=16).digest()
+        first, second = struct.unpack("<QQ", digest)
+        second |= 1
+        return [(first + i * second) % self.bit_count for i in range(self.hash_count)]
+
+    def add(self, address: str) -> bool:
+        """Adds an address; returns False if it was (probably) present already."""
+        new = False
+        for position in self._positions(address):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, address: str) -> bool:
+        for position in self._positions(address):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(self.bit_count, self.hash_count, self.count, self.capacity) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        bit_count, hash_count, count, capacity = _HEADER.unpack_from(data)
+        bloom = cls.__new__(cls)
+        bloom.capacity, bloom.bit_count, bloom.hash_count, bloom.count = capacity, bit_count, hash_count, count
+        bloom.bits = bytearray(data[_HEADER.size:])
+        if len(bloom.bits) != (bit_count + 7) // 8:
+            raise ValueError("truncated Bloom filter")
+        return bloom
+
+_lock = threading.Lock()
+_filter: Optional[BloomFilter] = None
+_dirty = False
+
+def flagged_wallets(result: Dict[str, Any]) -> List[str]:
+    """Wallets an analysis result flags: its dumpers, plus its whales if it is a pump and dump."""
+    wallets = [d.get("address") for d in result.get("potential_dumpers") or []]
+    if result.get("is_pump_dump"):
+        wallets.extend(w.get("address") for w in result.get("top_holders") or [])
+    wallets = [w for w in wallets if w]
+    if not wallets:
+        return []
+    market = known_addresses.categories(wallets)
+    return [w for w, category in zip(wallets, market) if not category]
+
+def _saved_results() -> Iterable[Dict[str, Any]]:
+    """Yields every saved token analysis."""
+    for path in glob.glob(os.path.join(analysis_memo.ANALYSIS_DIR, "token_*_analysis.json")):
+        try:
+            with open(path, 'r') as f:
+                yield json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.debug(f"Skipping unreadable analysis {path}: {e}")
+
+def _rebuild(capacity: int) -> BloomFilter:
+    """Builds a filter from every saved analysis."""
+    wallets = set()
+    for result in _saved_results():
+        wallets.update(flagged_wallets(result))
+    capacity = max(capacity, 2 * len(wallets))
+    bloom = BloomFilter(capacity, settings.BAD_WALLET_FILTER_ERROR_RATE)
+    for wallet in wallets:
+        bloom.add(wallet)
+    logger.info(f"Built bad wallet filter from past analyses: {len(wallets)} wallets, {len(bloom.bits) / 1024:.0f} KiB")
+    return bloom
+
+def _load() -> BloomFilter:
+    """Loads the persisted filter once per process, rebuilding it if needed."""
+    global _filter, _dirty
+    if _filter is not None:
+        return _filter
+    path = settings.BAD_WALLET_FILTER_PATH
+    if path and os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                _filter = BloomFilter.from_bytes(f.read())
+            return _filter
+        except (OSError, struct.error, ValueError) as e:
+            logger.error(f"Error loading bad wallet filter: {e}")
+    _filter = _rebuild(settings.BAD_WALLET_FILTER_CAPACITY)
+    _dirty = True
+    return _filter
+
+def record_analysis(result: Dict[str, Any]) -> int:
+    """Adds the wallets flagged by an analysis; returns how many were new."""
+    global _filter, _dirty
+    wallets = flagged_wallets(result)
+    if not wallets:
+        return 0
+    with _lock:
+        bloom = _load()
+        added = sum(1 for wallet in wallets if bloom.add(wallet))
+        if added:
+            _dirty = True
+        if bloom.count > bloom.capacity:
+            # Past capacity the false positive rate climbs; start over twice as large
+            _filter = _rebuild(bloom.capacity * 2)
+            for wallet in wallets:
+                _filter.add(wallet)
+    return added
+
+def check(wallets: Iterable[str]) -> List[str]:
+    """Returns the wallets that are (probably) flagged, in input order."""
+    with _lock:
+        bloom = _load()
+        return [wallet for wallet in wallets if wallet and wallet in bloom]
+
+def _own_flagged(token_address: str) -> set:
+    """Wallets flagged by the token's own last analysis (not evidence about the token)."""
+    path = analysis_memo.analysis_path(token_address)
+    if not os.path.exists(path):
+        return set()
+    try:
+        with open(path, 'r') as f:
+            return set(flagged_wallets(json.load(f)))
+    except (OSError, json.JSONDecodeError):
+        return set()
+
+def screen(token_address: str, holders: List[Dict[str, Any]]) -> List[str]:
+    """Holders of a token that were flagged in analyses of other tokens."""
+    owners = list(dict.fromkeys(h.get("owner") for h in holders or [] if h.get("owner")))
+    hits = check(owners)
+    if hits:
+        own = _own_flagged(token_address)
+        hits = [wallet for wallet in hits if wallet not in own]
+    return hits
+
+def screen_tokens(addresses: List[str]) -> List[Tuple[str, List[Dict[str, Any]], List[str]]]:
+    """Screens candidate tokens by their first holder page and orders them for analysis.
+
+    Tokens with more flagged holders come first; clean tokens keep their order after
+    them, and beyond BAD_WALLET_MAX_CLEAN_TOKENS (0 = no limit) they are left for a later
+    cycle.
+
+    Returns:
+        (address, first holder page, flagged holders) per token to analyze; the holder
+        page can be passed on to get_detailed_token_transactions.
+    """
+    screened = []
+    for address in addresses:
+        holders = solscan.get_token_holders(address, page=1, page_size=20)
+        if not isinstance(holders, list):
+            holders = []
+        hits = screen(address, holders)
+        if hits:
+            logger.warning(f"Token {address} is held by {len(hits)} wallets flagged in past analyses; fast-tracking it")
+        screened.append((address, holders, hits))
+
+    flagged = sorted((item for item in screened if item[2]), key=lambda item: -len(item[2]))
+    clean = [item for item in screened if not item[2]]
+    limit = settings.BAD_WALLET_MAX_CLEAN_TOKENS
+    if limit and len(clean) > limit:
+        logger.info(f"Deferring {len(clean) - limit} tokens with no flagged holders to a later cycle")
+        clean = clean[:limit]
+    return flagged + clean
+
+def save() -> None:
+    """Persists the filter if it changed."""
+    global _dirty
+    path = settings.BAD_WALLET_FILTER_PATH
+    with _lock:
+        if not _dirty or not path or _filter is None:
+            return
+        data = _filter.to_bytes()
+        _dirty = False
+    try:
+        store_dir = os.path.dirname(path)
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    except OSError as e:
+        logger.error(f"Error saving bad wallet filter: {e}")
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    import random
+    import time
+
+    random.seed(11)
+    bloom = BloomFilter(100000, 0.001)
+    flagged = [f"flagged{i}" for i in range(100000)]
+    started = time.perf_counter()
+    for wallet in flagged:
+        bloom.add(wallet)
+    add_time = time.perf_counter() - started
+    assert all(wallet in bloom for wallet in flagged[:1000])
+    started = time.perf_counter()
+    false_positives = sum(1 for i in range(100000) if f"clean{i}" in bloom)
+    check_time = time.perf_counter() - started
+    print(f"{bloom.count} wallets in {len(bloom.bits) / 1024:.0f} KiB ({bloom.hash_count} hashes): "
+          f"{add_time * 10:.1f} us per add, {check_time * 10:.1f} us per check, "
+          f"false positive rate {false_positives / 100000:.3%}")
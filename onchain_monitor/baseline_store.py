@@ -0,0 +1,270 @@
+"""Per-token and cohort baselines for adaptive spike and concentration thresholds.
+
+The heuristic analysis used fixed thresholds: a spike is 3x the trailing average, a
+whale holds 10% of the supply and a large holder 5%. What is normal differs a lot
+between a mature token and a pump.fun launch a few hours old. This store keeps,
+for every token and for every cohort, running statistics of:
+
+- spike ratios per resolution (1m/5m/1h): log(1 + bucket volume / trailing mean)
+  for every closed bucket
+- top-wallet concentration: the largest share of everything received held by one
+  wallet, once per analysis
+
+Each statistic is three numbers (count, mean, M2) updated with Welford's algorithm,
+so an update is O(1) per new bucket and a query is O(1). Each cycle only adds buckets
+newer than the last one seen for the token, so no old snapshot file is re-read, and a
+snapshot that was already observed (same newest transfer) adds nothing. The count is
+capped at BASELINE_WINDOW, so older observations decay geometrically and a run of
+pumps cannot hold a cohort's thresholds at their cap for good.
+There are two cohorts: "fresh_pump" (a ...pump mint created less than
+BASELINE_FRESH_TOKEN_HOURS ago) and "other".
+
+Thresholds come from the token's own history once it has BASELINE_MIN_OBSERVATIONS
+observations. Before that they come from its cohort, and with no history at all they
+fall back to the static defaults. State is persisted as JSON at BASELINE_STORE_PATH.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import settings
+from onchain_monitor import volume_buckets
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Thresholds used when neither the token nor its cohort has enough history
+DEFAULT_SPIKE_FACTOR = 3.0
+DEFAULT_WHALE_SHARE = 0.1
+DEFAULT_LARGE_HOLDER_PERCENT = 5.0
+
+_lock = threading.Lock()
+_store: Dict[str, Dict[str, Any]] = {"tokens": {}, "cohorts": {}}
+_loaded = False
+_dirty = False
+
+# --- Welford running statistics: [count, mean, M2] ---
+def _add(stat: List[float], x: float) -> None:
+    """Adds one observation to a running statistic, weighing about the last BASELINE_WINDOW."""
+    window = max(settings.BASELINE_WINDOW, 2)
+    if stat[0] >= window:
+        # Shrink the count to window - 1 and rescale M2 so the variance estimate is unchanged;
+        # each new observation then moves the mean by 1/window, like an EWMA
+        stat[2] *= (window - 2) / (stat[0] - 1)
+        stat[0] = window - 1
+    stat[0] += 1
+    delta = x - stat[1]
+    stat[1] += delta / stat[0]
+    stat[2] += delta * (x - stat[1])
+
+def _std(stat: List[float]) -> float:
+    """Sample standard deviation of a running statistic."""
+    return math.sqrt(stat[2] / (stat[0] - 1)) if stat[0] > 1 else 0.0
+
+def _load() -> None:
+    """Loads the persisted store once per process."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if not os.path.exists(settings.BASELINE_STORE_PATH):
+        return
+    try:
+        with open(settings.BASELINE_STORE_PATH, 'r') as f:
+            _store.update(json.load(f))
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Error loading baseline store: {e}")
+
+def save() -> None:
+    """Persists the store if it changed."""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        data = json.dumps(_store)
+        _dirty = False
+    try:
+        store_dir = os.path.dirname(settings.BASELINE_STORE_PATH)
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        with open(settings.BASELINE_STORE_PATH, 'w') as f:
+            f.write(data)
+    except OSError as e:
+        logger.error(f"Error saving baseline store: {e}")
+
+def cohort_of(token_address: str, created_time: Any = None, now: float = None) -> str:
+    """Returns the cohort of a token: "fresh_pump" for young ...pump mints, else "other"."""
+    if not str(token_address).endswith("pump"):
+        return "other"
+    try:
+        age_hours = ((now or time.time()) - float(created_time)) / 3600
+    except (TypeError, ValueError):
+        return "other"
+    return "fresh_pump" if age_hours < settings.BASELINE_FRESH_TOKEN_HOURS else "other"
+
+def _entry(container: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """Returns the statistics entry for a token or cohort, creating it if needed."""
+    entry = container.get(key)
+    if entry is None:
+        entry = container[key] = {"stats": {}, "last_bucket": {}}
+    return entry
+
+def _stat(entry: Dict[str, Any], name: str) -> List[float]:
+    """Returns a named running statistic of an entry, creating it if needed."""
+    return entry["stats"].setdefault(name, [0, 0.0, 0.0])
+
+def _spike_ratios(series: List[Tuple[int, float]], window: int, after: int) -> List[Tuple[int, float]]:
+    """(bucket, log1p(volume / trailing mean)) for closed buckets newer than `after`.
+
+    The last bucket is still open and is skipped; trailing windows follow the same
+    "at least half active" rule as volume_buckets.detect_spike.
+    """
+    min_active = max(1, math.ceil(window / 2))
+    ratios = []
+    for i in range(max(window, 0), len(series) - 1):
+        start, volume = series[i]
+        if start <= after:
+            continue
+        trailing = [v for _, v in series[i - window:i]]
+        if sum(1 for v in trailing if v > 0) < min_active:
+            continue
+        baseline = sum(trailing) / window
+        if baseline > 0:
+            ratios.append((start, math.log1p(volume / baseline)))
+    return ratios
+
+def observe(token_address: str, volumes: volume_buckets.MultiResolutionVolume = None,
+            top_wallet_share: float = None, created_time: Any = None, snapshot: Any = None) -> bool:
+    """Adds what is new in a token snapshot to the token and cohort baselines.
+
+    Args:
+        token_address: Token mint.
+        volumes: The token's multi-resolution volume buckets; only buckets newer than the
+                 last one seen for this token are added.
+        top_wallet_share: Largest share (0-1) of everything received held by one wallet.
+        created_time: Token creation time (Unix seconds), used for the cohort.
+        snapshot: Identifies the snapshot (e.g. its newest transfer time); a token snapshot
+                  equal to the last one observed is skipped.
+
+    Returns:
+        False if the snapshot had already been observed.
+    """
+    global _dirty
+    cohort = cohort_of(token_address, created_time)
+    with _lock:
+        _load()
+        token_entry = _entry(_store["tokens"], token_address)
+        if snapshot is not None and token_entry.get("snapshot") == snapshot:
+            return False
+        cohort_entry = _entry(_store["cohorts"], cohort)
+        token_entry["cohort"] = cohort
+        if snapshot is not None:
+            token_entry["snapshot"] = snapshot
+
+        if volumes is not None:
+            for name, resolution in volumes.resolutions.items():
+                after = token_entry["last_bucket"].get(name, 0)
+                ratios = _spike_ratios(volumes.series(name), resolution["spike_window"], after)
+                for _, ratio in ratios:
+                    _add(_stat(token_entry, f"spike_{name}"), ratio)
+                    _add(_stat(cohort_entry, f"spike_{name}"), ratio)
+                if ratios:
+                    token_entry["last_bucket"][name] = ratios[-1][0]
+
+        if top_wallet_share is not None and top_wallet_share > 0:
+            _add(_stat(token_entry, "top_wallet_share"), top_wallet_share)
+            _add(_stat(cohort_entry, "top_wallet_share"), top_wallet_share)
+
+        token_entry["updated_at"] = time.time()
+        _dirty = True
+    return True
+
+def _reference(token_address: str, name: str, cohort: str) -> Optional[Tuple[List[float], str]]:
+    """The statistic to derive a threshold from: the token's own, else its cohort's."""
+    _load()
+    token_entry = _store["tokens"].get(token_address) or {}
+    stat = (token_entry.get("stats") or {}).get(name)
+    if stat and stat[0] >= settings.BASELINE_MIN_OBSERVATIONS:
+        return stat, "token"
+    cohort_entry = _store["cohorts"].get(token_entry.get("cohort", cohort)) or {}
+    stat = (cohort_entry.get("stats") or {}).get(name)
+    if stat and stat[0] >= settings.BASELINE_MIN_OBSERVATIONS:
+        return stat, "cohort"
+    return None
+
+def spike_factors(token_address: str, created_time: Any = None) -> Dict[str, float]:
+    """Adaptive spike factor per resolution (volume / trailing mean that counts as a spike).
+
+    The factor is expm1(mean + BASELINE_SPIKE_Z * std) of the log ratios, clamped to
+    [BASELINE_MIN_SPIKE_FACTOR, BASELINE_MAX_SPIKE_FACTOR].
+    """
+    cohort = cohort_of(token_address, created_time)
+    factors = {}
+    with _lock:
+        for name in volume_buckets.RESOLUTIONS:
+            reference = _reference(token_address, f"spike_{name}", cohort)
+            if reference is None:
+                factors[name] = DEFAULT_SPIKE_FACTOR
+                continue
+            stat, _ = reference
+            factor = math.expm1(stat[1] + settings.BASELINE_SPIKE_Z * _std(stat))
+            factors[name] = min(max(factor, settings.BASELINE_MIN_SPIKE_FACTOR), settings.BASELINE_MAX_SPIKE_FACTOR)
+    return factors
+
+def whale_thresholds(token_address: str, created_time: Any = None) -> Dict[str, Any]:
+    """Adaptive whale share and large-holder percentage.
+
+    The whale share is mean + BASELINE_WHALE_Z * std of the top-wallet share, clamped to
+    [0.05, 0.5]; the large-holder percentage is half of it, as with the static 10%/5%.
+
+    Returns:
+        {"whale_share", "large_holder_percent", "source" ("token", "cohort" or "default")}
+    """
+    cohort = cohort_of(token_address, created_time)
+    with _lock:
+        reference = _reference(token_address, "top_wallet_share", cohort)
+    if reference is None:
+        return {"whale_share": DEFAULT_WHALE_SHARE, "large_holder_percent": DEFAULT_LARGE_HOLDER_PERCENT, "source": "default"}
+    stat, source = reference
+    share = min(max(stat[1] + settings.BASELINE_WHALE_Z * _std(stat), 0.05), 0.5)
+    return {"whale_share": share, "large_holder_percent": share * 50, "source": source}
+
+def get_baseline(token_address: str) -> Optional[Dict[str, Any]]:
+    """Returns count/mean/std of every statistic kept for a token, or None."""
+    with _lock:
+        _load()
+        entry = _store["tokens"].get(token_address)
+        if entry is None:
+            return None
+        return {
+            "cohort": entry.get("cohort"),
+            "stats": {name: {"count": int(stat[0]), "mean": stat[1], "std": _std(stat)} for name, stat in entry["stats"].items()}
+        }
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    import random
+
+    random.seed(6)
+    settings.BASELINE_STORE_PATH = ""  # Keep the demo out of the real store
+    now = time.time()
+    start_time = volume_buckets.bucket_start(now - 48 * 3600, 3600)
+    token = "DemoToken1111111111111111111111111111111pump"
+
+    # Twelve cycles of a jumpy young launch, four hours of new transfers each
+    for cycle in range(12):
+        volumes = volume_buckets.MultiResolutionVolume()
+        for minute in range(cycle * 240, (cycle + 1) * 240):
+            volumes.add(start_time + minute * 60, random.lognormvariate(5, 1.5))
+        observe(token, volumes, top_wallet_share=random.uniform(0.15, 0.35), created_time=start_time)
+
+    print(f"Cohort: {cohort_of(token, start_time)}")
+    print(f"Spike factors: { {name: round(f, 2) for name, f in spike_factors(token, start_time).items()} }")
+    print(f"Whale thresholds: {whale_thresholds(token, start_time)}")
+    print(f"Unknown token falls back to: {spike_factors('Other111')}, {whale_thresholds('Other111')}")
@@ -0,0 +1,297 @@
+"""Known AMM pool, program and exchange addresses, for buy/sell classification.
+
+Buy/sell counts used to come from "exchange"/"swap"/"pool" substring checks on the
+receiver, which never match a base58 address, so every transfer counted as a buy.
+This module keeps a set of addresses that are the market side of a trade:
+
+- seeds: DEX/launchpad programs, the Raydium AMM authority and a few exchange hot wallets
+- learned: the counterparties of the trader in transfers that belong to an observed
+  swap (same trans_id as a DeFi swap activity), i.e. pool vault owners
+
+The set is an open-addressing hash table of 64-bit address fingerprints (load factor
+at most 0.5, linear probing) with a category byte per slot. It is saved as a single
+.npy file at KNOWN_ADDRESSES_PATH and loaded memory-mapped, so a lookup touches a
+handful of slots and a large set costs nothing to open. Fingerprints and probes are
+computed with NumPy over a whole batch of addresses at once.
+
+classify_transfers labels a transfer from a known address as a buy, one to a known
+address as a sell, and anything else (wallet to wallet, or pool to pool routing hops)
+as neither.
+"""
+
+import logging
+import os
+import threading
+from typing import List, Dict, Any, Iterable, Optional
+
+import numpy as np
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Category stored per address (0 marks an unknown address)
+CATEGORIES = {"pool": 1, "program": 2, "cex": 3}
+CATEGORY_NAMES = {code: name for name, code in CATEGORIES.items()}
+
+# Direction codes returned by classify_transfers
+BUY, SELL, OTHER = 1, -1, 0
+
+SEED_ADDRESSES = {
+    "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8": "program",  # Raydium AMM v4
+    "CPMMoo8L3F4NbTegBCKVNunggL7H1ZpdTHKxQB5qKP1C": "program",  # Raydium CPMM
+    "CAMMCzo5YL8w4VFF8KVHrK22GGUsp5VTaW7grrKgrWqK": "program",  # Raydium CLMM
+    "whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc": "program",  # Orca Whirlpool
+    "JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QnyVTaV4": "program",  # Jupiter v6
+    "6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ14M5uBEwF6P": "program",  # pump.fun
+    "pAMMBay6oceH9fJKBRHGP5D4bD4sWpmSwMn52FMfXEA": "program",  # pump.fun AMM
+    "LBUZKhRxPF3XUpBCjp4YzTKgLccjZhTSDM9YuVaPwxo": "program",  # Meteora DLMM
+    "Eo7WjKq67rjJQSZxS6z3YkapzY3eMj6Xy8X5EQVn5UaB": "program",  # Meteora pools
+    "5Q544fKrFoe6tsEbD7S8EmxGTJYAKtTVhAW5Q5pge4j1": "pool",     # Raydium AMM v4 authority (owns every pool vault)
+    "5tzFkiKscXHK5ZXCGbXZxdw7gTjjD1mBwuoFbhUvuAi9": "cex",      # Binance
+    "H8sMJSCQxfKiFTCfDR3DUMLPwcRbM61LGFJ8N4dK3WjS": "cex",      # Coinbase
+    "5VCwKtCXgCJ6kit5FybXjvriW3xELsFDhYrPSqtJNmcD": "cex",      # OKX
+    "AC5RDfQFmDS1deWZos921JfqscXdByf8BKHs5ACWjtW2": "cex",      # Bybit
+}
+
+# Base58 Solana addresses are at most 44 characters (padded to whole 8-byte words)
+KEY_BYTES = 48
+TABLE_DTYPE = np.dtype([("key", "<u8"), ("category", "u1")])
+
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+_lock = threading.Lock()
+_table: Optional[np.ndarray] = None
+_dirty = False
+
+def fingerprints(addresses: Iterable[str]) -> np.ndarray:
+    """64-bit fingerprints of addresses, hashed eight characters at a time.
+
+    0 is reserved for empty slots, so a fingerprint of 0 is mapped to 1.
+    """
+    addresses = list(addresses)
+    if not addresses:
+        return np.zeros(0, dtype=np.uint64)
+    try:
+        encoded = np.asarray(addresses, dtype=f"S{KEY_BYTES}")
+    except UnicodeEncodeError:
+        encoded = np.asarray([str(a).encode("ascii", "replace")[:KEY_BYTES] for a in addresses], dtype=f"S{KEY_BYTES}")
+    words = encoded.view("<u8").reshape(len(addresses), KEY_BYTES // 8)
+    keys = np.full(len(addresses), _FNV_OFFSET, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for column in range(words.shape[1]):
+            keys ^= words[:, column]
+            keys *= _FNV_PRIME
+            keys ^= keys >> np.uint64(29)
+        # Final mix so the low bits used as slot numbers depend on every character
+        keys ^= keys >> np.uint64(33)
+        keys *= np.uint64(0xff51afd7ed558ccd)
+        keys ^= keys >> np.uint64(33)
+    keys[keys == 0] = 1
+    return keys
+
+def build_table(keys: np.ndarray, categories: np.ndarray) -> np.ndarray:
+    """Builds a hash table (load factor <= 0.5) from fingerprints and category codes.
+
+    Later duplicates of a fingerprint override earlier ones.
+    """
+    keys = np.asarray(keys, dtype=np.uint64)
+    categories = np.asarray(categories, dtype=np.uint8)
+    # Keep the last category given for each fingerprint
+    reversed_keys = keys[::-1]
+    keys, first = np.unique(reversed_keys, return_index=True)
+    categories = categories[::-1][first]
+
+    capacity = 64
+    while capacity < 2 * len(keys):
+        capacity *= 2
+    table = np.zeros(capacity, dtype=TABLE_DTYPE)
+    mask = np.uint64(capacity - 1)
+
+    # Linear probing, one probe step for all unplaced keys at a time
+    remaining = np.arange(len(keys))
+    probe = np.uint64(0)
+    while len(remaining):
+        slots = ((keys[remaining] + probe) & mask).astype(np.int64)
+        empty = table["key"][slots] == 0
+        slots, candidates = slots[empty], remaining[empty]
+        # Only the first key aiming at a slot takes it this round
+        slots, first = np.unique(slots, return_index=True)
+        placed = candidates[first]
+        table["key"][slots] = keys[placed]
+        table["category"][slots] = categories[placed]
+        remaining = remaining[~np.isin(remaining, placed)]
+        probe += np.uint64(1)
+    return table
+
+def lookup_table(table: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Category codes (0 = unknown) of fingerprints in a table built by build_table."""
+    result = np.zeros(len(keys), dtype=np.uint8)
+    if not len(keys) or not len(table):
+        return result
+    slot_keys = table["key"]
+    mask = np.uint64(len(table) - 1)
+    pending = np.arange(len(keys))
+    probe = np.uint64(0)
+    # The table is at most half full, so every probe sequence reaches an empty slot
+    while len(pending):
+        slots = ((keys[pending] + probe) & mask).astype(np.int64)
+        found = slot_keys[slots]
+        hit = found == keys[pending]
+        result[pending[hit]] = table["category"][slots[hit]]
+        pending = pending[~hit & (found != 0)]
+        probe += np.uint64(1)
+    return result
+
+def _load() -> np.ndarray:
+    """Opens the stored table memory-mapped, or builds one from the seeds."""
+    global _table, _dirty
+    if _table is not None:
+        return _table
+    path = settings.KNOWN_ADDRESSES_PATH
+    if path and os.path.exists(path):
+        try:
+            _table = np.load(path, mmap_mode="r")
+            return _table
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading known addresses: {e}")
+    _table = build_table(fingerprints(SEED_ADDRESSES), [CATEGORIES[c] for c in SEED_ADDRESSES.values()])
+    _dirty = True
+    return _table
+
+def categories(addresses: Iterable[str]) -> np.ndarray:
+    """Category codes for a batch of addresses (0 = unknown)."""
+    keys = fingerprints(addresses)
+    with _lock:
+        table = _load()
+    return lookup_table(table, keys)
+
+def category_of(address: str) -> Optional[str]:
+    """Category name of a known address ("pool", "program" or "cex"), or None."""
+    code = int(categories([address])[0])
+    return CATEGORY_NAMES.get(code)
+
+def add(addresses: Iterable[str], category: str = "pool") -> int:
+    """Adds addresses to the set; returns how many were new."""
+    addresses = list(dict.fromkeys(a for a in addresses if a))
+    if not addresses:
+        return 0
+    global _table, _dirty
+    keys = fingerprints(addresses)
+    with _lock:
+        table = _load()
+        new_keys = keys[lookup_table(table, keys) == 0]
+        if not len(new_keys):
+            return 0
+        occupied = table[table["key"] != 0]
+        _table = build_table(np.concatenate([occupied["key"], new_keys]),
+                             np.concatenate([occupied["category"], np.full(len(new_keys), CATEGORIES[category], dtype=np.uint8)]))
+        _dirty = True
+    return len(new_keys)
+
+def observe(activities: List[Dict[str, Any]], transfers: List[Dict[str, Any]]) -> int:
+    """Learns pool and program addresses from DeFi activities and their transfers.
+
+    Programs come from the activities' "platform"/"sources" lists. Pools are the
+    addresses that exchanged tokens with the trader in a transfer with the same
+    trans_id as a swap activity.
+
+    Returns:
+        The number of new addresses.
+    """
+    traders = {}
+    programs = set()
+    for activity in activities:
+        for key in ("platform", "sources"):
+            value = activity.get(key) or []
+            programs.update([value] if isinstance(value, str) else value)
+        if "SWAP" in str(activity.get("activity_type", "")) and activity.get("trans_id"):
+            traders[activity["trans_id"]] = activity.get("from_address")
+
+    pools = set()
+    for tx in transfers:
+        trader = traders.get(tx.get("trans_id"))
+        if not trader:
+            continue
+        for address in (tx.get("from_address"), tx.get("to_address")):
+            if address and address != trader:
+                pools.add(address)
+
+    added = add(sorted(programs), "program") + add(sorted(pools - programs), "pool")
+    if added:
+        logger.info(f"Learned {added} new pool/program addresses from {len(traders)} swaps")
+    return added
+
+def classify_transfers(senders: List[str], receivers: List[str]) -> np.ndarray:
+    """Direction of each transfer: BUY (from a known address), SELL (to one) or OTHER."""
+    count = len(senders)
+    with_categories = categories(list(senders) + list(receivers))
+    from_known = with_categories[:count] != 0
+    to_known = with_categories[count:] != 0
+    directions = np.full(count, OTHER, dtype=np.int8)
+    directions[from_known & ~to_known] = BUY
+    directions[to_known & ~from_known] = SELL
+    return directions
+
+def save() -> None:
+    """Writes the table if it changed (to a new file, so open memory maps stay valid)."""
+    global _dirty, _table
+    path = settings.KNOWN_ADDRESSES_PATH
+    with _lock:
+        if not _dirty or not path:
+            return
+        table = np.asarray(_table)
+        _dirty = False
+    try:
+        store_dir = os.path.dirname(path)
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        temp_path = f"{path}.tmp.npy"
+        np.save(temp_path, table)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.error(f"Error saving known addresses: {e}")
+
+# Benchmark against a Python set
+if __name__ == '__main__':
+    import random
+    import sys
+    import time
+    from correlation_engine import address_extractor
+
+    random.seed(10)
+    settings.KNOWN_ADDRESSES_PATH = ""  # Keep the demo out of the real store
+    wallets = [address_extractor._encode_base58(bytes(random.getrandbits(8) for _ in range(32))) for _ in range(20000)]
+    pools = [address_extractor._encode_base58(bytes(random.getrandbits(8) for _ in range(32))) for _ in range(100000)]
+
+    started = time.perf_counter()
+    add(pools, "pool")
+    build_time = time.perf_counter() - started
+    print(f"Table: {len(_table)} slots for {int((_table['key'] != 0).sum())} addresses, built in {build_time * 1000:.1f} ms")
+
+    everyone = wallets + pools[:2000] + list(SEED_ADDRESSES)
+    senders = [random.choice(everyone) for _ in range(500000)]
+    receivers = [random.choice(everyone) for _ in range(500000)]
+
+    started = time.perf_counter()
+    directions = classify_transfers(senders, receivers)
+    array_time = time.perf_counter() - started
+
+    known = set(pools) | set(SEED_ADDRESSES)
+    started = time.perf_counter()
+    expected = [BUY if s in known and r not in known else SELL if r in known and s not in known else OTHER
+                for s, r in zip(senders, receivers)]
+    set_time = time.perf_counter() - started
+
+    assert directions.tolist() == expected
+    print(f"{len(senders)} transfers: arrays {array_time * 1000:.1f} ms, Python set {set_time * 1000:.1f} ms "
+          f"(string hashes cached), identical")
+    set_bytes = sys.getsizeof(known) + sum(sys.getsizeof(address) for address in known)
+    print(f"Memory: table file {_table.nbytes / 2 ** 20:.1f} MiB (memory-mapped, nothing to parse on open), "
+          f"Python set {set_bytes / 2 ** 20:.1f} MiB")
+    print(f"Buys {int((directions == BUY).sum())}, sells {int((directions == SELL).sum())}, "
+          f"other {int((directions == OTHER).sum())}")
+    print(f"Category of the Raydium authority: {category_of('5Q544fKrFoe6tsEbD7S8EmxGTJYAKtTVhAW5Q5pge4j1')}")
@@ -0,0 +1,258 @@
+"""OHLCV price bars built from DeFi swap activity.
+
+Transfers say how much moved but not at what price. Swap activities do: each one
+has the token amount on one side of the route and the USD value of the swap. This
+module turns swaps into a USD price per trade and keeps open/high/low/close/volume
+bars at 1m, 5m and 1h per token:
+
+- OHLCVBars.add updates one bar per resolution in O(1). Bars remember the times of
+  their open and close trades, so swaps can arrive in any order (Solscan pages are
+  newest first).
+- Bars are stored per token as compact JSON arrays under OHLCV_STORE_DIR, with the
+  newest swap time and ids seen, so each cycle only pages swaps newer than that.
+- price_features derives the price run-up (peak over the lowest price before it),
+  the drawdown from that peak to the latest close, and the largest peak-to-trough
+  drawdown. The pump_dump_analyzer uses these features.
+"""
+
+import json
+import logging
+import os
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import settings
+from onchain_monitor import volume_buckets
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Bar size and bars kept per resolution (same grid as the volume buckets)
+RESOLUTIONS = {name: {"seconds": r["seconds"], "retention": r["retention"]} for name, r in volume_buckets.RESOLUTIONS.items()}
+
+# Positions in a stored bar
+OPEN, HIGH, LOW, CLOSE, VOLUME, TRADES, OPEN_TIME, CLOSE_TIME = range(8)
+
+def swap_price(activity: Dict[str, Any], token_address: str) -> Optional[Tuple[int, float, float]]:
+    """Extracts (block time, USD price, USD volume) for a token from a swap activity.
+
+    The token must be one end of the top-level route; the price is the swap's USD value
+    divided by the token amount. Returns None for anything else.
+    """
+    if "SWAP" not in str(activity.get('activity_type', '')):
+        return None
+    routers = activity.get('routers') or {}
+    try:
+        value = float(activity.get('value') or 0)
+        timestamp = int(activity.get('block_time') or 0)
+        if routers.get('token1') == token_address:
+            amount = float(routers['amount1']) / 10 ** int(routers['token1_decimals'])
+        elif routers.get('token2') == token_address:
+            amount = float(routers['amount2']) / 10 ** int(routers['token2_decimals'])
+        else:
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+    if value <= 0 or amount <= 0 or not timestamp:
+        return None
+    return timestamp, value / amount, value
+
+class OHLCVBars:
+    """Open/high/low/close/volume bars at several resolutions, updated together."""
+
+    def __init__(self, resolutions: Dict[str, Dict[str, int]] = None):
+        self.resolutions = resolutions or RESOLUTIONS
+        self.bars: Dict[str, Dict[int, List[float]]] = {name: {} for name in self.resolutions}
+        self.last_time = 0
+        self.last_ids: List[str] = []
+
+    def add(self, timestamp: int, price: float, volume: float) -> None:
+        """Adds one trade to the bar containing it at every resolution."""
+        for name, resolution in self.resolutions.items():
+            start = volume_buckets.bucket_start(timestamp, resolution["seconds"])
+            bar = self.bars[name].get(start)
+            if bar is None:
+                self.bars[name][start] = [price, price, price, price, volume, 1, timestamp, timestamp]
+                continue
+            bar[HIGH] = max(bar[HIGH], price)
+            bar[LOW] = min(bar[LOW], price)
+            bar[VOLUME] += volume
+            bar[TRADES] += 1
+            if timestamp < bar[OPEN_TIME]:
+                bar[OPEN], bar[OPEN_TIME] = price, timestamp
+            if timestamp >= bar[CLOSE_TIME]:
+                bar[CLOSE], bar[CLOSE_TIME] = price, timestamp
+
+    def add_swaps(self, activities: List[Dict[str, Any]], token_address: str) -> int:
+        """Adds swap activities newer than the last ones seen; returns how many were added.
+
+        Pass everything fetched in a cycle in one call, in any order: anything older than
+        the previous call's newest swap is skipped. Activities at that newest time are
+        skipped by transaction id, and a transaction listed twice (aggregated route plus
+        its single swap) counts once.
+        """
+        seen = set(self.last_ids)
+        added = 0
+        newest_time, newest_ids = self.last_time, list(self.last_ids)
+        for activity in activities:
+            trade = swap_price(activity, token_address)
+            if trade is None:
+                continue
+            timestamp, price, volume = trade
+            trans_id = str(activity.get('trans_id', ''))
+            if timestamp < self.last_time or (trans_id and trans_id in seen):
+                continue
+            seen.add(trans_id)
+            self.add(timestamp, price, volume)
+            added += 1
+            if timestamp > newest_time:
+                newest_time, newest_ids = timestamp, []
+            if timestamp == newest_time and trans_id:
+                newest_ids.append(trans_id)
+        self.last_time, self.last_ids = newest_time, newest_ids
+        self.trim()
+        return added
+
+    def trim(self) -> None:
+        """Drops bars older than the retention window of each resolution."""
+        for name, resolution in self.resolutions.items():
+            cutoff = volume_buckets.bucket_start(self.last_time, resolution["seconds"]) - resolution["seconds"] * (resolution["retention"] - 1)
+            series = self.bars[name]
+            for start in [s for s in series if s < cutoff]:
+                del series[start]
+
+    def series(self, name: str) -> List[Tuple[int, List[float]]]:
+        """Returns (bar start, bar) pairs in time order; gaps without trades have no bar."""
+        return sorted(self.bars[name].items())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly form: {"last_time", "last_ids", "bars": {resolution: {start: bar}}}."""
+        return {
+            "last_time": self.last_time,
+            "last_ids": self.last_ids,
+            "bars": {name: {str(start): bar for start, bar in self.series(name)} for name in self.resolutions}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OHLCVBars":
+        """Rebuilds bars saved with to_dict."""
+        bars = cls()
+        bars.last_time = int(data.get("last_time", 0))
+        bars.last_ids = list(data.get("last_ids", []))
+        for name, series in (data.get("bars") or {}).items():
+            if name in bars.bars:
+                bars.bars[name] = {int(start): list(bar) for start, bar in series.items()}
+        return bars
+
+def _store_path(token_address: str) -> str:
+    """Returns the path of the stored bars for a token."""
+    clean_address = token_address.replace("/", "_").replace(":", "_")
+    return os.path.join(settings.OHLCV_STORE_DIR, f"token_{clean_address}_ohlcv.json")
+
+def load(token_address: str) -> OHLCVBars:
+    """Loads a token's stored bars (empty bars if there are none)."""
+    path = _store_path(token_address)
+    if not os.path.exists(path):
+        return OHLCVBars()
+    try:
+        with open(path, 'r') as f:
+            return OHLCVBars.from_dict(json.load(f))
+    except (OSError, json.JSONDecodeError, ValueError) as e:
+        logger.error(f"Error loading OHLCV bars for {token_address}: {e}")
+        return OHLCVBars()
+
+def save(token_address: str, bars: OHLCVBars) -> None:
+    """Stores a token's bars as compact JSON."""
+    try:
+        os.makedirs(settings.OHLCV_STORE_DIR, exist_ok=True)
+        with open(_store_path(token_address), 'w') as f:
+            json.dump(bars.to_dict(), f, separators=(",", ":"))
+    except OSError as e:
+        logger.error(f"Error saving OHLCV bars for {token_address}: {e}")
+
+def price_features(bars: OHLCVBars, resolution: str = "5m", since: int = 0) -> Dict[str, Any]:
+    """Price run-up and drawdown features from one resolution of bars.
+
+    Args:
+        bars: The token's bars.
+        resolution: Bar resolution to use.
+        since: Ignore bars starting before this time (e.g. the analysis window).
+
+    Returns:
+        {"bars", "first_price", "last_price", "peak_price", "peak_time", "price_change",
+         "run_up" (peak / lowest low before it - 1), "drawdown_from_peak" (1 - last close / peak),
+         "max_drawdown" (largest fall from a running high to a later low), "volume_usd"}
+    """
+    series = [(start, bar) for start, bar in bars.series(resolution) if start >= since]
+    if not series:
+        return {"bars": 0}
+
+    lowest_before, best_run_up, peak, peak_time = float("inf"), 0.0, 0.0, None
+    running_high, max_drawdown = 0.0, 0.0
+    for start, bar in series:
+        lowest_before = min(lowest_before, bar[LOW])
+        if bar[HIGH] > peak:
+            peak, peak_time = bar[HIGH], start
+            best_run_up = max(best_run_up, peak / lowest_before - 1 if lowest_before > 0 else 0.0)
+        running_high = max(running_high, bar[HIGH])
+        if running_high > 0:
+            max_drawdown = max(max_drawdown, 1 - bar[LOW] / running_high)
+
+    first_price, last_price = series[0][1][OPEN], series[-1][1][CLOSE]
+    return {
+        "bars": len(series),
+        "first_price": first_price,
+        "last_price": last_price,
+        "peak_price": peak,
+        "peak_time": peak_time,
+        "price_change": last_price / first_price - 1 if first_price > 0 else 0.0,
+        "run_up": best_run_up,
+        "drawdown_from_peak": 1 - last_price / peak if peak > 0 else 0.0,
+        "max_drawdown": max_drawdown,
+        "volume_usd": sum(bar[VOLUME] for _, bar in series)
+    }
+
+def update(token_address: str, activities: List[Dict[str, Any]], bars: OHLCVBars = None) -> OHLCVBars:
+    """Adds newly fetched swap activities to a token's bars and saves them.
+
+    Args:
+        token_address: Token mint.
+        activities: Everything fetched this cycle (see OHLCVBars.add_swaps).
+        bars: The token's bars if already loaded (loaded from the store otherwise).
+    """
+    bars = bars or load(token_address)
+    added = bars.add_swaps(activities, token_address)
+    if added:
+        save(token_address, bars)
+        logger.info(f"Added {added} swaps to the OHLCV bars of {token_address}")
+    return bars
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    import random
+
+    random.seed(9)
+    token = "DemoToken1111111111111111111111111111111pump"
+    start_time = 1745000000
+    price = 0.0001
+    activities = []
+    for second in range(0, 6 * 3600, 15):
+        # Flat, then a two-hour pump to ~8x, then a dump
+        drift = 1.004 if 2 * 3600 <= second < 4 * 3600 else 0.992 if second >= 4 * 3600 else 1.0
+        price *= drift * random.uniform(0.995, 1.005)
+        amount = random.uniform(1e5, 1e6)
+        activities.append({
+            "trans_id": f"tx{second}", "block_time": start_time + second, "activity_type": "ACTIVITY_TOKEN_SWAP",
+            "value": price * amount, "routers": {"token1": "So11111111111111111111111111111111111111112", "token1_decimals": 9,
+                                                 "amount1": 1, "token2": token, "token2_decimals": 6, "amount2": amount * 1e6}
+        })
+
+    bars = OHLCVBars()
+    # Newest first, as Solscan pages return them
+    activities.reverse()
+    bars.add_swaps(activities[100:], token)
+    print(f"Bars: " + ", ".join(f"{name}={len(bars.bars[name])}" for name in bars.resolutions))
+    print(f"Next cycle (newest page again) adds {bars.add_swaps(activities[:200], token)} swaps")
+    features = price_features(bars)
+    print(f"Run-up {features['run_up']:.0%}, drawdown from peak {features['drawdown_from_peak']:.0%}, "
+          f"max drawdown {features['max_drawdown']:.0%}, {features['bars']} bars")
@@ -6,11 +6,14 @@ import time
 import json
 import os
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from config import settings
+from onchain_monitor import known_addresses
+from onchain_monitor import ohlcv
+from onchain_monitor import volume_buckets
 
 # Configure logging
 logging.basicConfig(level=settings.LOG_LEVEL)
@@ -120,6 +123,59 @@ def get_token_info(token_address: str) -> Dict[str, Any]:
         logger.error(f"Failed to fetch token info: {e}")
         return {}
 
+def check_token_mint(token_address: str) -> Optional[bool]:
+    """Checks with a single /token/meta call whether an address is a token mint.
+    
+    Args:
+        token_address: The address to check
+        
+    Returns:
+        True for a token mint, False for anything else, or None if it could not be
+        determined (see fetch_token_meta).
+    """
+    return fetch_token_meta(token_address)[0]
+
+def fetch_token_meta(token_address: str) -> Tuple[Optional[bool], Dict[str, Any]]:
+    """Fetches /token/meta once and tells whether the address is a token mint.
+    
+    Unlike get_token_info this does not retry: a rejected address is an answer, not
+    a failure.
+    
+    Args:
+        token_address: The address to check
+        
+    Returns:
+        (True for a token mint, False for anything else (wallet, program, unknown
+        account) or None if it could not be determined (no API key, network error,
+        rate limit); the response in get_token_info's format for a mint, else {})
+    """
+    if not settings.SOLSCAN_API_KEY or settings.SOLSCAN_API_KEY == "YOUR_SOLSCAN_PRO_API_KEY":
+        logger.warning("Solscan API key not configured. Skipping token mint check.")
+        return None, {}
+    
+    headers = {"token": settings.SOLSCAN_API_KEY}
+    try:
+        response = requests.get(SOLSCAN_API_BASE_URL + "/token/meta", headers=headers, params={"address": token_address}, timeout=30)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to check token mint {token_address}: {e}")
+        return None, {}
+    
+    if response.status_code in (400, 404):
+        return False, {}
+    if response.status_code != 200:
+        logger.warning(f"Token mint check for {token_address} returned HTTP {response.status_code}")
+        return None, {}
+    try:
+        body = response.json()
+    except ValueError:
+        return None, {}
+    if body.get("success") is False:
+        return False, {}
+    data = body.get("data") or {}
+    if "decimals" in data or "supply" in data:
+        return True, body
+    return False, {}
+
 def get_token_holders(token_address: str, page: int = 1, page_size: int = 20) -> List[Dict[str, Any]]:
     """Fetches the first page of token holders.
     
@@ -217,12 +273,39 @@ def get_token_defi_activities(token_address: str, page: int = 1, page_size: int
         logger.error(f"An unexpected error occurred while fetching token DeFi activities: {e}")
         return []
 
-def get_detailed_token_transactions(token_address: str, hours_lookback: int = 24) -> Dict[str, Any]:
+def get_token_swap_activities(token_address: str, since: int, max_pages: int = None) -> List[Dict[str, Any]]:
+    """Pages DeFi activities of a token, newest first, back to a given time.
+    
+    Args:
+        token_address: The address of the token
+        since: Stop once activities are older than this Unix time
+        max_pages: Maximum pages of 100 to fetch (defaults to OHLCV_MAX_PAGES)
+        
+    Returns:
+        The activities at or after `since` (all types; swaps are picked out by the caller).
+    """
+    max_pages = max_pages or settings.OHLCV_MAX_PAGES
+    activities = []
+    for page in range(1, max_pages + 1):
+        batch = get_token_defi_activities(token_address, page=page, page_size=100)
+        activities.extend(a for a in batch if (a.get("block_time") or 0) >= since)
+        if len(batch) < 100 or min((a.get("block_time") or 0) for a in batch) < since:
+            break
+        time.sleep(0.5)
+    else:
+        logger.info(f"Stopped paging DeFi activities for {token_address} after {max_pages} pages")
+    return activities
+
+def get_detailed_token_transactions(token_address: str, hours_lookback: int = 24,
+                                    holders: Optional[List[Dict[str, Any]]] = None,
+                                    token_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Fetches detailed transfers, metadata, holders, and defi activities for a token.
     
     Args:
         token_address: The mint address of the token
         hours_lookback: Hours to look back for transaction data (used for display/context, fetch gets all)
+        holders: First page of holders if already fetched (e.g. by triage)
+        token_info: /token/meta response if already fetched (e.g. by triage)
         
     Returns:
         A dictionary with combined token data
@@ -258,31 +341,42 @@ def get_detailed_token_transactions(token_address: str, hours_lookback: int = 24
         logger.warning(f"No transactions found for token: {token_address}")
         # Still try to fetch other data
 
-    # 2. Fetch Token Metadata
-    logger.info(f"Fetching metadata for token: {token_address}")
-    token_info = get_token_info(token_address)
-    time.sleep(0.5)
+    # 2. Fetch Token Metadata, unless the caller already has it
+    if not token_info:
+        logger.info(f"Fetching metadata for token: {token_address}")
+        token_info = get_token_info(token_address)
+        time.sleep(0.5)
 
-    # 3. Fetch Token Holders (First Page)
-    logger.info(f"Fetching holders for token: {token_address}")
-    token_holders = get_token_holders(token_address, page=1, page_size=20)
+    # 3. Fetch Token Holders (First Page), unless the caller already has them
+    if holders is not None:
+        token_holders = holders
+    else:
+        logger.info(f"Fetching holders for token: {token_address}")
+        token_holders = get_token_holders(token_address, page=1, page_size=20)
     if not isinstance(token_holders, list):
         logger.warning(f"Received unexpected type for token_holders: {type(token_holders)}. Defaulting to empty list.")
         token_holders = []
     time.sleep(0.5)
 
-    # 4. Fetch Recent DeFi Activities (First Page)
-    logger.info(f"Fetching recent DeFi activities for token: {token_address}")
-    token_defi_activities = get_token_defi_activities(token_address, page=1, page_size=20)
-    if not isinstance(token_defi_activities, list):
-        logger.warning(f"Received unexpected type for token_defi_activities: {type(token_defi_activities)}. Defaulting to empty list.")
-        token_defi_activities = []
-
-    # Process transfers to get heuristic buy/sell/wallet counts (as before)
-    buy_transactions_count = 0
-    sell_transactions_count = 0
+    # 4. Page DeFi activities since the newest one already in the token's OHLCV bars, and build price features
+    window_start = int(time.time()) - hours_lookback * 3600
+    bars = ohlcv.load(token_address)
+    swap_activities = get_token_swap_activities(token_address, since=max(window_start, bars.last_time))
+    bars = ohlcv.update(token_address, swap_activities, bars)
+    price_features = ohlcv.price_features(bars, since=window_start)
+    # The pages come newest first, so the recent activities shown in reports are their head
+    token_defi_activities = swap_activities[:20]
+
+    # Learn pool/program addresses from the swaps, so buys and sells can be told apart below
+    known_addresses.observe(swap_activities, all_transfers)
+    known_addresses.save()
+
+    # Process transfers to get wallet totals and volumes
+    senders = []
+    receivers = []
     wallets = {}
     hourly_volumes = {}
+    volumes = volume_buckets.MultiResolutionVolume()
     for tx in all_transfers:
         # Simplified processing logic from before
         sender = tx.get("from_address", tx.get("src", "Unknown"))
@@ -297,10 +391,14 @@ def get_detailed_token_transactions(token_address: str, hours_lookback: int = 24
         wallets[receiver]["received"] += amount
         if tx_hour not in hourly_volumes: hourly_volumes[tx_hour] = 0
         hourly_volumes[tx_hour] += amount
-        if "exchange" in receiver.lower() or "swap" in receiver.lower() or "pool" in receiver.lower():
-             sell_transactions_count += 1
-        else:
-             buy_transactions_count += 1
+        volumes.add(tx_time, amount)
+        senders.append(sender)
+        receivers.append(receiver)
+
+    # Buys come from a known pool/program/exchange, sells go to one (classified as one batch)
+    directions = known_addresses.classify_transfers(senders, receivers)
+    buy_transactions_count = int((directions == known_addresses.BUY).sum())
+    sell_transactions_count = int((directions == known_addresses.SELL).sum())
 
     # Combine all data
     result = {
@@ -311,8 +409,11 @@ def get_detailed_token_transactions(token_address: str, hours_lookback: int = 24
         "total_transactions": len(all_transfers),
         "buy_transactions": buy_transactions_count, # Heuristic count
         "sell_transactions": sell_transactions_count, # Heuristic count
+        "other_transactions": len(all_transfers) - buy_transactions_count - sell_transactions_count, # Wallet to wallet
         "unique_wallets": len(wallets),
         "hourly_volumes": hourly_volumes,
+        "volume_buckets": volumes.to_dict(), # 1m / 5m / 1h volume series
+        "price_features": price_features, # Run-up / drawdown from the 5m OHLCV bars
         "wallets": {addr: {**stats, "net": stats["received"] - stats["sent"]} for addr, stats in wallets.items()}, # Add net
         "raw_transactions": all_transfers[:50],  # Include a larger sample of raw txns
     }
@@ -0,0 +1,176 @@
+"""Cache of which addresses are worth a detailed token fetch.
+
+Addresses pulled from tweets are often wallets, program ids or tokens that were
+already ruled out. Two things are remembered per address:
+
+- whether it is a token mint, from one cheap /token/meta call. A mint stays a mint,
+  so positive results never expire; negative results expire after
+  NON_MINT_CACHE_TTL_SECONDS in case an address was checked before its mint existed.
+  The /token/meta response itself is not cached (holder counts change), but
+  verify_mint_with_info hands it to the caller so it is not fetched twice.
+- a short-lived "nothing interesting" verdict (no transaction data, insufficient
+  data, or a low pump-and-dump confidence), which expires after
+  UNINTERESTING_TOKEN_TTL_SECONDS so tokens are looked at again if they wake up.
+
+Lookups are plain dict reads, so ruled-out addresses are skipped in O(1) before any
+Solscan request is made. The cache is persisted as JSON at VERIFICATION_CACHE_PATH.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from config import settings
+from onchain_monitor import known_addresses
+from onchain_monitor import solscan
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_entries: Dict[str, Dict[str, Any]] = {}
+_loaded = False
+_dirty = False
+
+def _load() -> None:
+    """Loads the persisted cache once per process."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if not os.path.exists(settings.VERIFICATION_CACHE_PATH):
+        return
+    try:
+        with open(settings.VERIFICATION_CACHE_PATH, 'r') as f:
+            _entries.update(json.load(f))
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Error loading verification cache: {e}")
+
+def save() -> None:
+    """Persists the cache if it changed, dropping entries that no longer say anything."""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        now = time.time()
+        for address in [a for a, entry in _entries.items() if _is_stale(entry, now)]:
+            del _entries[address]
+        data = dict(_entries)
+        _dirty = False
+    try:
+        cache_dir = os.path.dirname(settings.VERIFICATION_CACHE_PATH)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        with open(settings.VERIFICATION_CACHE_PATH, 'w') as f:
+            json.dump(data, f)
+    except OSError as e:
+        logger.error(f"Error saving verification cache: {e}")
+
+def _mint_status(entry: Dict[str, Any], now: float) -> Optional[bool]:
+    """Returns the cached mint status of an entry, or None if unknown or expired."""
+    is_mint = entry.get("is_mint")
+    if is_mint is False and now - entry.get("checked_at", 0) > settings.NON_MINT_CACHE_TTL_SECONDS:
+        return None
+    return is_mint
+
+def _is_stale(entry: Dict[str, Any], now: float) -> bool:
+    """True when an entry has neither a valid mint status nor an active verdict."""
+    return _mint_status(entry, now) is None and entry.get("verdict_until", 0) <= now
+
+def skip_reason(address: str) -> Optional[str]:
+    """Returns why an address can be skipped right now, or None if it should be analyzed."""
+    known = known_addresses.category_of(address)
+    if known:
+        return f"known {known} address"
+    now = time.time()
+    with _lock:
+        _load()
+        entry = _entries.get(address)
+        if not entry:
+            return None
+        if _mint_status(entry, now) is False:
+            return "not a token mint"
+        if entry.get("verdict_until", 0) > now:
+            return f"ruled out recently ({entry.get('verdict')})"
+    return None
+
+def verify_mint(address: str) -> Optional[bool]:
+    """Returns whether an address is a token mint, calling /token/meta only on a cache miss.
+
+    Returns:
+        True or False, or None if Solscan could not tell (nothing is cached then).
+    """
+    return verify_mint_with_info(address)[0]
+
+def verify_mint_with_info(address: str) -> Tuple[Optional[bool], Dict[str, Any]]:
+    """verify_mint, also returning the /token/meta response when it had to be fetched.
+
+    Returns:
+        (mint status as in verify_mint; the /token/meta response, or {} when the status
+         came from the cache or the address is not a mint)
+    """
+    global _dirty
+    now = time.time()
+    with _lock:
+        _load()
+        cached = _mint_status(_entries.get(address, {}), now)
+    if cached is not None:
+        return cached, {}
+
+    is_mint, token_info = solscan.fetch_token_meta(address)
+    if is_mint is None:
+        return None, {}
+    with _lock:
+        entry = _entries.setdefault(address, {})
+        entry["is_mint"] = is_mint
+        entry["checked_at"] = now
+        _dirty = True
+    if not is_mint:
+        logger.info(f"Address {address} is not a token mint; skipping it for {settings.NON_MINT_CACHE_TTL_SECONDS // 3600}h")
+    return is_mint, token_info
+
+def mark_uninteresting(address: str, reason: str, ttl_seconds: int = None) -> None:
+    """Records a short-lived "nothing interesting here" verdict for a token.
+
+    Args:
+        address: The token address.
+        reason: Short explanation shown when the token is skipped.
+        ttl_seconds: How long to skip the token (defaults to UNINTERESTING_TOKEN_TTL_SECONDS).
+    """
+    global _dirty
+    if ttl_seconds is None:
+        ttl_seconds = settings.UNINTERESTING_TOKEN_TTL_SECONDS
+    with _lock:
+        _load()
+        entry = _entries.setdefault(address, {})
+        entry["verdict"] = reason
+        entry["verdict_until"] = time.time() + ttl_seconds
+        _dirty = True
+
+def record_analysis(address: str, analysis_result: Dict[str, Any]) -> bool:
+    """Marks a token as uninteresting if its analysis found nothing worth another look soon.
+
+    Returns:
+        True if the token was marked uninteresting.
+    """
+    confidence = analysis_result.get("confidence", 0) or 0
+    # A local model's confidence is in its own verdict; its P(pump) is kept in local_score
+    if analysis_result.get("local_score") is not None:
+        confidence = analysis_result["local_score"]
+    if analysis_result.get("is_pump_dump", False) or confidence >= settings.UNINTERESTING_MAX_CONFIDENCE:
+        return False
+    reasons = analysis_result.get("reasons") or [analysis_result.get("reason", "low pump-and-dump confidence")]
+    mark_uninteresting(address, f"confidence {confidence:.2f}: {reasons[0] if reasons else 'no signals'}")
+    return True
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    _load()
+    now = time.time()
+    non_mints = sum(1 for entry in _entries.values() if _mint_status(entry, now) is False)
+    ruled_out = sum(1 for entry in _entries.values() if entry.get("verdict_until", 0) > now)
+    print(f"Verification cache: {len(_entries)} addresses, {non_mints} non-mints, {ruled_out} recently ruled out")
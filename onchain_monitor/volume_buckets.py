@@ -0,0 +1,192 @@
+"""Multi-resolution volume buckets (1m / 5m / 1h) built in one pass over transfers.
+
+Hourly buckets average a 15-minute pump away. MultiResolutionVolume keeps 1-minute,
+5-minute and 1-hour series at the same time: each transfer updates one bucket per
+resolution in O(1). Finer series are trimmed to a bounded retention window, and
+coarser series can always be rebuilt from finer ones with downsample().
+
+detect_spike compares each bucket with the mean of the buckets just before it, using
+a trailing window sized per resolution, so the same "N times the recent average"
+check can run at every resolution. The trailing windows are computed for all buckets
+at once with NumPy.
+"""
+
+import logging
+import math
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Bucket size, buckets kept, and trailing buckets a spike is compared against
+RESOLUTIONS = {
+    "1m": {"seconds": 60, "retention": 1440, "spike_window": 10},   # 24 hours
+    "5m": {"seconds": 300, "retention": 576, "spike_window": 6},    # 48 hours
+    "1h": {"seconds": 3600, "retention": 168, "spike_window": 2},   # 7 days
+}
+
+def bucket_start(timestamp: float, seconds: int) -> int:
+    """Returns the start of the bucket (Unix seconds, UTC-aligned) containing a timestamp."""
+    timestamp = int(timestamp)
+    return timestamp - timestamp % seconds
+
+class MultiResolutionVolume:
+    """Volume series at several resolutions, updated together."""
+
+    def __init__(self, resolutions: Dict[str, Dict[str, int]] = None):
+        self.resolutions = resolutions or RESOLUTIONS
+        self.buckets: Dict[str, Dict[int, float]] = {name: {} for name in self.resolutions}
+        self.latest = 0
+
+    def add(self, timestamp: float, amount: float) -> None:
+        """Adds one transfer to every resolution."""
+        if not timestamp:
+            return
+        for name, resolution in self.resolutions.items():
+            start = bucket_start(timestamp, resolution["seconds"])
+            series = self.buckets[name]
+            series[start] = series.get(start, 0.0) + amount
+            # Trim lazily so each add stays O(1) amortized
+            if len(series) > 2 * resolution["retention"]:
+                self._trim(name)
+        self.latest = max(self.latest, int(timestamp))
+
+    def add_transfers(self, transfers: List[Dict[str, Any]]) -> "MultiResolutionVolume":
+        """Adds Solscan transfers (block_time / amount) and returns self."""
+        for tx in transfers:
+            try:
+                self.add(tx.get('block_time', tx.get('blockTime', 0)) or 0, float(tx.get('amount', 0) or 0))
+            except (ValueError, TypeError) as e:
+                logger.error(f"Error bucketing transfer volume: {e}")
+        return self
+
+    def _trim(self, name: str) -> None:
+        """Drops buckets older than the retention window of a resolution."""
+        resolution = self.resolutions[name]
+        cutoff = bucket_start(self.latest, resolution["seconds"]) - resolution["seconds"] * (resolution["retention"] - 1)
+        series = self.buckets[name]
+        for start in [s for s in series if s < cutoff]:
+            del series[start]
+
+    def series(self, name: str, fill_gaps: bool = True) -> List[Tuple[int, float]]:
+        """Returns (bucket start, volume) pairs in time order, within retention.
+
+        Args:
+            name: Resolution name ("1m", "5m" or "1h").
+            fill_gaps: Include empty buckets between the first and last one as 0.
+        """
+        self._trim(name)
+        series = self.buckets[name]
+        if not series:
+            return []
+        if not fill_gaps:
+            return sorted(series.items())
+        seconds = self.resolutions[name]["seconds"]
+        first, last = min(series), max(series)
+        return [(start, series.get(start, 0.0)) for start in range(first, last + seconds, seconds)]
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """Returns the non-empty buckets as JSON-friendly dicts ({resolution: {start: volume}})."""
+        return {name: {str(start): volume for start, volume in self.series(name, fill_gaps=False)} for name in self.resolutions}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, float]]) -> "MultiResolutionVolume":
+        """Rebuilds buckets saved with to_dict (e.g. from a detailed token data file)."""
+        volumes = cls()
+        for name, series in (data or {}).items():
+            if name in volumes.buckets:
+                volumes.buckets[name] = {int(float(start)): float(volume) for start, volume in series.items()}
+                if series:
+                    volumes.latest = max(volumes.latest, max(volumes.buckets[name]))
+        return volumes
+
+def downsample(series: List[Tuple[int, float]], seconds: int) -> List[Tuple[int, float]]:
+    """Sums a (start, volume) series into coarser buckets of `seconds`."""
+    coarse: Dict[int, float] = {}
+    for start, volume in series:
+        key = bucket_start(start, seconds)
+        coarse[key] = coarse.get(key, 0.0) + volume
+    return sorted(coarse.items())
+
+def detect_spike(series: List[Tuple[int, float]], window: int, factor: float = 3.0) -> Optional[Dict[str, Any]]:
+    """Finds the largest bucket that exceeds `factor` times the mean of the `window` buckets before it.
+
+    At least half of the trailing buckets must have volume, so a single earlier trade
+    does not count as a baseline. All trailing windows are evaluated at once on a
+    sliding-window view; the window sums are accumulated left to right, so baselines
+    match summing each window on its own.
+
+    Returns:
+        {"bucket": start, "volume", "baseline", "factor"} for the strongest spike, or None.
+    """
+    if len(series) <= window:
+        return None
+    min_active = max(1, math.ceil(window / 2))
+    volumes = np.array([volume for _, volume in series], dtype=float)
+    # Row j holds the trailing window of bucket j + window
+    trailing = sliding_window_view(volumes[:-1], window)
+    sums = trailing[:, 0].copy()
+    for offset in range(1, window):
+        sums += trailing[:, offset]
+    baseline = sums / window
+    current = volumes[window:]
+
+    eligible = ((trailing > 0).sum(axis=1) >= min_active) & (baseline > 0) & (current > baseline * factor)
+    if not eligible.any():
+        return None
+    factors = np.full(len(current), -np.inf)
+    factors[eligible] = current[eligible] / baseline[eligible]
+    # argmax returns the first maximum, like keeping the earliest of equal spikes
+    best = int(np.argmax(factors))
+    return {"bucket": series[best + window][0], "volume": series[best + window][1],
+            "baseline": float(baseline[best]), "factor": float(factors[best])}
+
+def detect_spikes(volumes: MultiResolutionVolume, factor: float = 3.0,
+                  factors: Dict[str, float] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Runs detect_spike at every resolution.
+
+    Args:
+        volumes: Multi-resolution volume buckets.
+        factor: Spike factor for every resolution.
+        factors: Optional per-resolution factors (e.g. from baseline_store), overriding `factor`.
+
+    Returns:
+        {resolution: spike or None}
+    """
+    factors = factors or {}
+    return {
+        name: detect_spike(volumes.series(name), resolution["spike_window"], factors.get(name, factor))
+        for name, resolution in volumes.resolutions.items()
+    }
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    import random
+    import time
+
+    random.seed(5)
+    start_time = bucket_start(1745000000, 3600)
+    transfers = []
+    for second in range(0, 6 * 3600, 20):
+        amount = random.uniform(50, 150)
+        # A 15-minute pump in the middle of hour 3
+        if 3 * 3600 + 1200 <= second < 3 * 3600 + 2100:
+            amount *= 6
+        transfers.append({"block_time": start_time + second, "amount": amount})
+
+    started = time.perf_counter()
+    volumes = MultiResolutionVolume().add_transfers(transfers)
+    spikes = detect_spikes(volumes)
+    elapsed = time.perf_counter() - started
+    print(f"Bucketed {len(transfers)} transfers and checked 3 resolutions in {elapsed * 1000:.1f} ms")
+    for name, spike in spikes.items():
+        if spike:
+            print(f"  {name}: {spike['factor']:.1f}x at {spike['bucket'] - start_time}s")
+        else:
+            print(f"  {name}: no spike")
@@ -0,0 +1,342 @@
+"""Near-duplicate tweet collapsing for copy-paste shill campaigns.
+
+Shill campaigns post the same message many times with small edits (an extra emoji,
+a different @mention or link, a reordered hashtag). Each tweet gets a 64-bit SimHash
+of the character shingles of its normalized text. Tweets whose fingerprints differ in at most
+DEDUP_SIMHASH_MAX_DISTANCE bits are merged into one representative.
+
+Candidates are found with multi-probe LSH: the fingerprint is split into four 16-bit
+bands. Two fingerprints within distance d differ in at most d // 4 bits in some band,
+so each tweet looks up every band value with up to d // 4 bits flipped (17 probes per
+band at the default distance of 7). 16-bit bands keep buckets small, so the number of
+candidates compared per tweet stays roughly constant as the batch grows. Fingerprints,
+band lookups and distance checks run over the whole batch at once with NumPy.
+
+Token addresses are kept out of the fuzzy part: tweets are only merged when they
+mention exactly the same addresses, so one template reused for different tokens stays
+separate.
+"""
+
+import logging
+import re
+import string
+from functools import lru_cache
+from itertools import combinations
+from typing import List, Dict, Any, Optional, FrozenSet, Tuple
+
+import numpy as np
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 4
+BAND_BITS = 16
+BAND_COUNT = FINGERPRINT_BITS // BAND_BITS
+# Tweets fingerprinted per NumPy batch (bounds the shingle bit matrix to a few tens of MB)
+SIMHASH_CHUNK = 4096
+
+_URL_RE = re.compile(r"https?://\S+")
+_MENTION_RE = re.compile(r"@\w+")
+_ADDRESS_RE = re.compile(r"\b[1-9A-HJ-NP-Za-km-z]{32,44}\b")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_PUNCTUATION = set(string.punctuation)
+
+def normalize_text(text: str) -> List[str]:
+    """Returns the normalized word/emoji tokens of a tweet.
+
+    Links and @mentions are dropped, text is lowercased and ASCII punctuation removed;
+    emojis are kept as tokens since they are part of the shill template.
+    """
+    text = _MENTION_RE.sub(" ", _URL_RE.sub(" ", text or ""))
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _PUNCTUATION]
+
+def extract_addresses(text: str) -> FrozenSet[str]:
+    """Returns the Solana-style addresses mentioned in a tweet (case preserved)."""
+    return frozenset(_ADDRESS_RE.findall(text or ""))
+
+# Multipliers mixing the SHINGLE_SIZE code points of a shingle into one 64-bit value
+_MIX_MULTIPLIERS = (0x9e3779b97f4a7c15, 0xc2b2ae3d27d4eb4f, 0x165667b19e3779f9)
+# Set bits of every byte value (np.bitwise_count needs NumPy 2)
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _shingle_hashes(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """64-bit hashes of the character shingles of several texts, and each text's shingle count.
+
+    A text shorter than SHINGLE_SIZE is one zero-padded shingle.
+    """
+    # Every text is followed by padding, so no shingle reaches into the next text
+    padding = "\0" * SHINGLE_SIZE
+    codes = np.frombuffer("".join(text + padding for text in texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    starts = np.cumsum(lengths + SHINGLE_SIZE) - (lengths + SHINGLE_SIZE)
+    counts = np.maximum(lengths - SHINGLE_SIZE + 1, 1)
+    first_shingles = np.cumsum(counts) - counts
+    positions = np.repeat(starts - first_shingles, counts) + np.arange(int(counts.sum()))
+
+    hashes = codes[positions]
+    with np.errstate(over="ignore"):
+        for offset, multiplier in enumerate(_MIX_MULTIPLIERS, start=1):
+            hashes = (hashes * np.uint64(multiplier)) ^ codes[positions + offset]
+        # splitmix64 finalizer, so every bit depends on every character of the shingle
+        hashes ^= hashes >> np.uint64(30)
+        hashes *= np.uint64(0xbf58476d1ce4e5b9)
+        hashes ^= hashes >> np.uint64(27)
+        hashes *= np.uint64(0x94d049bb133111eb)
+        hashes ^= hashes >> np.uint64(31)
+    return hashes, counts
+
+def simhash_batch(token_lists: List[List[str]]) -> List[int]:
+    """Computes the 64-bit SimHash of many token lists at once.
+
+    Features are character 4-grams of the joined tokens rather than words: tweets are
+    short, and with word features a single appended emoji or hashtag moves the
+    fingerprint almost as far as unrelated text does. A fingerprint bit is set when
+    most of the text's shingle hashes have it set.
+    """
+    fingerprints: List[int] = []
+    for start in range(0, len(token_lists), SIMHASH_CHUNK):
+        texts = [" ".join(tokens) for tokens in token_lists[start:start + SIMHASH_CHUNK]]
+        hashes, counts = _shingle_hashes(texts)
+        bits = np.unpackbits(hashes.astype(">u8").view(np.uint8).reshape(-1, 8), axis=1)
+        set_counts = np.add.reduceat(bits, np.cumsum(counts) - counts, axis=0, dtype=np.uint16)
+        majority = set_counts.astype(np.int64) * 2 > counts[:, None]
+        fingerprints.extend(np.packbits(majority, axis=1).view(">u8").ravel().tolist())
+    return fingerprints
+
+def simhash(tokens: List[str]) -> int:
+    """Computes the 64-bit SimHash of one token list (see simhash_batch)."""
+    return simhash_batch([tokens])[0]
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """Number of set bits of each uint64."""
+    return _BYTE_POPCOUNT[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+@lru_cache(maxsize=8)
+def _probe_masks(flips: int) -> Tuple[int, ...]:
+    """XOR masks of every band value within `flips` bits (0 first)."""
+    masks = [0]
+    for count in range(1, flips + 1):
+        for positions in combinations(range(BAND_BITS), count):
+            masks.append(sum(1 << p for p in positions))
+    return tuple(masks)
+
+def _near_pairs(groups: np.ndarray, fingerprints: np.ndarray, max_distance: int) -> List[Tuple[int, int]]:
+    """(i, j) index pairs, i < j, in the same group whose fingerprints are within max_distance bits.
+
+    For each band, entries are sorted by (group, band value) and every entry looks up its
+    band value with up to max_distance // BAND_COUNT bits flipped, so each close pair is
+    found in at least one band.
+    """
+    count = len(fingerprints)
+    band_mask = np.uint64((1 << BAND_BITS) - 1)
+    pairs = set()
+    for band in range(BAND_COUNT):
+        values = ((fingerprints >> np.uint64(band * BAND_BITS)) & band_mask).astype(np.int64)
+        keys = (groups << BAND_BITS) | values
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        # End of the run of equal keys each sorted position belongs to
+        run_ends = np.searchsorted(sorted_keys, sorted_keys, side="right")
+        for mask in _probe_masks(max_distance // BAND_COUNT):
+            probes = (groups << BAND_BITS) | (values ^ mask)
+            low = np.minimum(np.searchsorted(sorted_keys, probes), count - 1)
+            matches = np.where(sorted_keys[low] == probes, run_ends[low] - low, 0)
+            total = int(matches.sum())
+            if not total:
+                continue
+            left = np.repeat(np.arange(count), matches)
+            right = order[np.repeat(low - (np.cumsum(matches) - matches), matches) + np.arange(total)]
+            keep = left < right
+            left, right = left[keep], right[keep]
+            close = _popcount(fingerprints[left] ^ fingerprints[right]) <= max_distance
+            pairs.update(zip(left[close].tolist(), right[close].tolist()))
+    return sorted(pairs)
+
+def _tweet_key(tweet: Dict[str, Any]) -> Optional[str]:
+    """Returns the identifier used in duplicate_ids (tweet id, or url as a fallback)."""
+    key = tweet.get('id') or tweet.get('url')
+    return str(key) if key else None
+
+def collapse_near_duplicates(tweets: List[Dict[str, Any]], max_distance: int = None) -> List[Dict[str, Any]]:
+    """Collapses near-duplicate tweets into one representative per message.
+
+    The earliest tweet (in input order) of each group is the representative. A copy of
+    it is returned (the input tweets are left untouched), with:
+      - 'duplicate_count': number of tweets in the group (1 for unique tweets)
+      - 'duplicate_authors': sorted usernames that posted the message
+      - 'duplicate_ids': ids of all tweets in the group, the representative first
+    If any copy was flagged as coming from a known promoter, the representative
+    carries that 'known_promoter' entry as well.
+
+    Args:
+        tweets: Tweets as returned by the Twitter API.
+        max_distance: Maximum SimHash Hamming distance for two tweets to be merged
+                      (defaults to DEDUP_SIMHASH_MAX_DISTANCE).
+
+    Returns:
+        The representatives, in input order.
+    """
+    if max_distance is None:
+        max_distance = settings.DEDUP_SIMHASH_MAX_DISTANCE
+
+    parent = list(range(len(tweets)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(a: int, b: int) -> None:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            # Keep the earliest tweet as the root so it becomes the representative
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            parent[root_b] = root_a
+
+    texts = [tweet.get('text', '') for tweet in tweets]
+    fingerprints = simhash_batch([normalize_text(text) for text in texts])
+    # Exact copies (same addresses and fingerprint) join the first one directly; only
+    # distinct (addresses, fingerprint) entries go through the band lookup
+    exact: Dict[Tuple[FrozenSet[str], int], int] = {}
+    address_groups: Dict[FrozenSet[str], int] = {}
+    entries: List[int] = []
+    entry_groups: List[int] = []
+    for i, text in enumerate(texts):
+        addresses = extract_addresses(text)
+        first = exact.get((addresses, fingerprints[i]))
+        if first is not None:
+            union(first, i)
+            continue
+        exact[(addresses, fingerprints[i])] = i
+        entries.append(i)
+        entry_groups.append(address_groups.setdefault(addresses, len(address_groups)))
+
+    if len(entries) > 1:
+        entry_fingerprints = np.array([fingerprints[i] for i in entries], dtype=np.uint64)
+        for a, b in _near_pairs(np.array(entry_groups, dtype=np.int64), entry_fingerprints, max_distance):
+            union(entries[a], entries[b])
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(tweets)):
+        groups.setdefault(find(i), []).append(i)
+
+    representatives = []
+    for root in sorted(groups):
+        members = [tweets[i] for i in groups[root]]
+        representative = dict(tweets[root])
+        representative['duplicate_count'] = len(members)
+        representative['duplicate_authors'] = sorted({
+            t.get('author', {}).get('userName') for t in members if t.get('author', {}).get('userName')
+        })
+        representative['duplicate_ids'] = [key for key in (_tweet_key(t) for t in members) if key]
+        if not representative.get('known_promoter'):
+            known = next((t['known_promoter'] for t in members if t.get('known_promoter')), None)
+            if known:
+                representative['known_promoter'] = known
+        representatives.append(representative)
+
+    if len(representatives) < len(tweets):
+        largest = max(r['duplicate_count'] for r in representatives)
+        logger.info(f"Collapsed {len(tweets)} tweets into {len(representatives)} distinct messages (largest campaign: {largest} copies)")
+    return representatives
+
+def duplicate_index(tweets: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Maps duplicate_ids keys to tweets, so many representatives can be expanded without rescanning."""
+    index = {}
+    for tweet in tweets:
+        key = _tweet_key(tweet)
+        if key and key not in index:
+            index[key] = tweet
+    return index
+
+def expand_duplicates(representatives: List[Dict[str, Any]], tweets: List[Dict[str, Any]],
+                      index: Dict[str, Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Returns every original tweet belonging to the given representatives.
+
+    Without an index the tweets are scanned and returned in input order. With an index
+    from duplicate_index, only the representatives' copies are looked up (grouped by
+    representative), which keeps expanding many tokens' tweets linear overall.
+    Representatives are matched to their originals by id or url; one that has neither
+    is returned itself.
+    """
+    if index is None:
+        keys = {key for r in representatives for key in r.get('duplicate_ids', [])}
+        representative_ids = {id(r) for r in representatives}
+        expanded = [t for t in tweets if id(t) in representative_ids or _tweet_key(t) in keys]
+        expanded_ids = {id(t) for t in expanded}
+        expanded.extend(r for r in representatives if _tweet_key(r) is None and id(r) not in expanded_ids)
+        return expanded
+    expanded = []
+    seen = set()
+    for r in representatives:
+        copies = [index[key] for key in r.get('duplicate_ids', []) if key in index]
+        if _tweet_key(r) not in index:
+            copies = [r] + copies
+        for tweet in copies:
+            if id(tweet) not in seen:
+                seen.add(id(tweet))
+                expanded.append(tweet)
+    return expanded
+
+def campaign_signal(tweets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summarises copy-paste campaign size for a set of (collapsed) tweets.
+
+    Returns:
+        {"distinct_messages", "total_tweets", "largest_campaign": {"copies", "authors", "text"}}
+    """
+    largest = max(tweets, key=lambda t: t.get('duplicate_count', 1), default=None)
+    return {
+        "distinct_messages": len(tweets),
+        "total_tweets": sum(t.get('duplicate_count', 1) for t in tweets),
+        "largest_campaign": {
+            "copies": largest.get('duplicate_count', 1),
+            "authors": len(largest.get('duplicate_authors', [])) or 1,
+            "text": largest.get('text', '')[:200]
+        } if largest else None
+    }
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    import random
+    import time
+
+    random.seed(7)
+    address = "7xKXtg2CW87d97TXJSDpbD5jBkheTqA83TZRuJosgAsU"
+    templates = [
+        f"🚀 This gem is going 100x! Don't miss out, CA: {address}",
+        "Just launched on Solana, low cap hidden gem, get in now before it moons",
+        "gm frens, what are we buying today?",
+    ]
+    tweets = []
+    for n in range(1000):
+        text = random.choice(templates)
+        if random.random() < 0.5:
+            text += " " + random.choice(["🚀", "🔥", "#solana", "@shill_bot_" + str(n), "https://t.co/x" + str(n)])
+        tweets.append({"id": str(n), "text": text, "author": {"userName": f"user{n % 120}"}})
+
+    start = time.perf_counter()
+    distinct = collapse_near_duplicates(tweets)
+    elapsed = time.perf_counter() - start
+    print(f"Collapsed {len(tweets)} tweets into {len(distinct)} distinct messages in {elapsed * 1000:.1f} ms")
+    for tweet in distinct:
+        print(f"  {tweet['duplicate_count']:4d} copies by {len(tweet['duplicate_authors']):3d} accounts: {tweet['text'][:70]}")
+
+    # Scaling on distinct tweets (any merge here is a false merge) plus campaign copies
+    vocabulary = ["".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 9))) for _ in range(5000)]
+    for size in (2000, 8000, 16000, 100000):
+        tweets = [{"id": str(n), "text": " ".join(random.choice(vocabulary) for _ in range(random.randint(8, 25)))}
+                  for n in range(size)]
+        campaign = [{"id": f"c{n}", "text": random.choice(templates) + random.choice(["", " 🚀", " 🔥", " #solana"])}
+                    for n in range(size // 10)]
+        start = time.perf_counter()
+        distinct = collapse_near_duplicates(tweets + campaign)
+        elapsed = time.perf_counter() - start
+        false_merges = sum(1 for tweet in distinct for key in tweet['duplicate_ids'][1:] if not key.startswith("c"))
+        print(f"{size:>7} distinct + {len(campaign):>6} campaign tweets -> {len(distinct):>7} messages in {elapsed:6.2f} s "
+              f"({false_merges} distinct tweets merged)")
@@ -0,0 +1,246 @@
+"""Persistent index of which Twitter accounts promoted which tokens.
+
+Promotions are stored in a small SQLite database keyed by (username, token), next to
+the final pump-and-dump verdict of each token. This lets us answer questions such as
+"which accounts shilled three or more tokens that later dumped?" without re-reading
+the per-token promoter files, and lets ingestion flag tweets from known repeat
+promoters with an in-memory lookup.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS promotion_tweets (
+    tweet_id TEXT NOT NULL,
+    token TEXT NOT NULL,
+    username TEXT NOT NULL,
+    PRIMARY KEY (tweet_id, token)
+);
+CREATE TABLE IF NOT EXISTS promotions (
+    username TEXT NOT NULL,
+    token TEXT NOT NULL,
+    tweet_count INTEGER NOT NULL DEFAULT 0,
+    first_promoted REAL,
+    last_promoted REAL,
+    pump_score REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (username, token)
+);
+CREATE INDEX IF NOT EXISTS idx_promotions_token ON promotions (token);
+CREATE TABLE IF NOT EXISTS token_verdicts (
+    token TEXT PRIMARY KEY,
+    is_pump_dump INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_connection: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+# username -> {"tokens": int, "dumped_tokens": int}; rebuilt lazily after writes
+_known_promoters: Optional[Dict[str, Dict[str, int]]] = None
+
+def _get_connection() -> sqlite3.Connection:
+    """Opens (once) the index database and makes sure the schema exists."""
+    global _connection
+    if _connection is None:
+        db_dir = os.path.dirname(settings.PROMOTER_INDEX_PATH)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        _connection = sqlite3.connect(settings.PROMOTER_INDEX_PATH, check_same_thread=False)
+        _connection.executescript(_SCHEMA)
+    return _connection
+
+def record_promotions(token: str, records: List[Dict[str, Any]]) -> int:
+    """Adds promotion tweets for a token to the index.
+
+    Tweets already recorded for this token are ignored, so the same tweets can be
+    passed again on later cycles without inflating the counts.
+
+    Args:
+        token: The token address being promoted.
+        records: Dicts with 'tweet_id', 'username', 'timestamp' (Unix seconds or None)
+                 and 'pump_score' (pump indicator points for the tweet).
+
+    Returns:
+        The number of new tweets added to the index.
+    """
+    global _known_promoters
+    if not records:
+        return 0
+
+    added = 0
+    with _lock:
+        conn = _get_connection()
+        with conn:
+            for record in records:
+                tweet_id = record.get('tweet_id')
+                username = record.get('username')
+                if not tweet_id or not username:
+                    continue
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO promotion_tweets (tweet_id, token, username) VALUES (?, ?, ?)",
+                    (str(tweet_id), token, username)
+                )
+                if cursor.rowcount == 0:
+                    continue  # Already counted
+                added += 1
+                timestamp = record.get('timestamp')
+                conn.execute(
+                    """
+                    INSERT INTO promotions (username, token, tweet_count, first_promoted, last_promoted, pump_score)
+                    VALUES (?, ?, 1, ?, ?, ?)
+                    ON CONFLICT (username, token) DO UPDATE SET
+                        tweet_count = tweet_count + 1,
+                        first_promoted = MIN(COALESCE(first_promoted, excluded.first_promoted), COALESCE(excluded.first_promoted, first_promoted)),
+                        last_promoted = MAX(COALESCE(last_promoted, excluded.last_promoted), COALESCE(excluded.last_promoted, last_promoted)),
+                        pump_score = pump_score + excluded.pump_score
+                    """,
+                    (username, token, timestamp, timestamp, float(record.get('pump_score', 0)))
+                )
+        if added:
+            _known_promoters = None
+
+    if added:
+        logger.info(f"Promoter index: recorded {added} new promotion tweets for token {token}")
+    return added
+
+def set_token_verdict(token: str, is_pump_dump: bool, confidence: float) -> None:
+    """Stores the latest pump-and-dump verdict for a token."""
+    global _known_promoters
+    with _lock:
+        conn = _get_connection()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO token_verdicts (token, is_pump_dump, confidence, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (token) DO UPDATE SET
+                    is_pump_dump = excluded.is_pump_dump,
+                    confidence = excluded.confidence,
+                    updated_at = excluded.updated_at
+                """,
+                (token, 1 if is_pump_dump else 0, float(confidence or 0), time.time())
+            )
+        _known_promoters = None
+
+def get_promoter_history(username: str) -> List[Dict[str, Any]]:
+    """Returns every token an account promoted, with the token's verdict if known."""
+    with _lock:
+        rows = _get_connection().execute(
+            """
+            SELECT p.token, p.tweet_count, p.first_promoted, p.last_promoted, p.pump_score,
+                   v.is_pump_dump, v.confidence
+            FROM promotions p LEFT JOIN token_verdicts v ON v.token = p.token
+            WHERE p.username = ?
+            ORDER BY p.last_promoted DESC
+            """,
+            (username,)
+        ).fetchall()
+    return [
+        {
+            "token": row[0],
+            "tweet_count": row[1],
+            "first_promoted": row[2],
+            "last_promoted": row[3],
+            "pump_score": row[4],
+            "is_pump_dump": None if row[5] is None else bool(row[5]),
+            "verdict_confidence": row[6]
+        }
+        for row in rows
+    ]
+
+def get_repeat_promoters(min_tokens: int = None, dumped_only: bool = True) -> List[Dict[str, Any]]:
+    """Finds accounts that promoted several tokens (by default, tokens judged to be pump and dumps).
+
+    Args:
+        min_tokens: Minimum number of distinct tokens (defaults to REPEAT_PROMOTER_MIN_TOKENS).
+        dumped_only: Only count tokens whose verdict is a pump and dump.
+
+    Returns:
+        A list of {"username", "tokens", "tweet_count", "pump_score"} sorted by token count.
+    """
+    if min_tokens is None:
+        min_tokens = settings.REPEAT_PROMOTER_MIN_TOKENS
+    verdict_filter = "WHERE v.is_pump_dump = 1" if dumped_only else ""
+    with _lock:
+        rows = _get_connection().execute(
+            f"""
+            SELECT p.username, COUNT(*) AS tokens, SUM(p.tweet_count), SUM(p.pump_score)
+            FROM promotions p LEFT JOIN token_verdicts v ON v.token = p.token
+            {verdict_filter}
+            GROUP BY p.username
+            HAVING tokens >= ?
+            ORDER BY tokens DESC, SUM(p.tweet_count) DESC
+            """,
+            (min_tokens,)
+        ).fetchall()
+    return [
+        {"username": row[0], "tokens": row[1], "tweet_count": row[2], "pump_score": row[3]}
+        for row in rows
+    ]
+
+def _load_known_promoters() -> Dict[str, Dict[str, int]]:
+    """Builds the in-memory username lookup used when tweets are ingested."""
+    global _known_promoters
+    with _lock:
+        if _known_promoters is None:
+            rows = _get_connection().execute(
+                """
+                SELECT p.username, COUNT(*), SUM(CASE WHEN v.is_pump_dump = 1 THEN 1 ELSE 0 END)
+                FROM promotions p LEFT JOIN token_verdicts v ON v.token = p.token
+                GROUP BY p.username
+                """
+            ).fetchall()
+            _known_promoters = {
+                row[0]: {"tokens": row[1], "dumped_tokens": row[2]} for row in rows
+            }
+        return _known_promoters
+
+def lookup_promoter(username: str) -> Optional[Dict[str, int]]:
+    """Returns {"tokens", "dumped_tokens"} for an account seen in the index, or None."""
+    return _load_known_promoters().get(username)
+
+def flag_known_promoters(tweets: List[Dict[str, Any]], min_dumped_tokens: int = None) -> List[Dict[str, Any]]:
+    """Marks tweets whose author has promoted tokens that later dumped.
+
+    Each flagged tweet gets a 'known_promoter' entry with the author's token counts.
+
+    Args:
+        tweets: Tweets as returned by the Twitter API.
+        min_dumped_tokens: Minimum dumped tokens for an author to be flagged
+                           (defaults to REPEAT_PROMOTER_MIN_TOKENS).
+
+    Returns:
+        The list of flagged tweets.
+    """
+    if min_dumped_tokens is None:
+        min_dumped_tokens = settings.REPEAT_PROMOTER_MIN_TOKENS
+    known = _load_known_promoters()
+    flagged = []
+    for tweet in tweets:
+        username = tweet.get('author', {}).get('userName')
+        stats = known.get(username) if username else None
+        if stats and stats["dumped_tokens"] >= min_dumped_tokens:
+            tweet['known_promoter'] = dict(stats)
+            flagged.append(tweet)
+    if flagged:
+        logger.warning(f"{len(flagged)} tweets come from known repeat promoters")
+    return flagged
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    repeaters = get_repeat_promoters()
+    print(f"Accounts that promoted {settings.REPEAT_PROMOTER_MIN_TOKENS}+ dumped tokens: {len(repeaters)}")
+    for promoter in repeaters[:20]:
+        print(f"@{promoter['username']}: {promoter['tokens']} tokens, {promoter['tweet_count']} tweets")
@@ -0,0 +1,319 @@
+"""Incremental co-promotion graph for detecting coordinated shill rings.
+
+Accounts are nodes. Two accounts share an edge for every token they both posted
+within PROMOTION_GRAPH_WINDOW_MINUTES of each other; the edge weight is the number
+of such shared tokens. Edges that reach RING_MIN_SHARED_TOKENS are "strong" and are
+merged into connected components with a union-find structure as tweets arrive, so
+ingestion stays close to O(posts in the window) per tweet. Rings are the dense part
+of a component (its k-core with k = RING_CORE_DEGREE), computed lazily and cached
+until the component changes.
+
+Weak edges (a single shared token) and per-token posts are only kept for
+PROMOTION_GRAPH_WEAK_EDGE_TTL_HOURS after their last co-promotion; strong edges are
+kept. The graph is saved once per monitoring cycle (save), not after every token.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from config import settings
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Per-token posts kept for window matching; older posts are dropped first
+MAX_POSTS_PER_TOKEN = 500
+
+_lock = threading.RLock()
+_loaded = False
+_dirty = False
+
+# token -> sorted list of (timestamp, username, tweet_id)
+_token_posts: Dict[str, List[Tuple[float, str, str]]] = {}
+# token -> tweet ids already ingested
+_token_tweet_ids: Dict[str, Set[str]] = {}
+# (username_a, username_b) with a < b -> tokens the pair co-promoted
+_edge_tokens: Dict[Tuple[str, str], Set[str]] = {}
+# Same keys -> timestamp of the pair's latest co-promotion
+_edge_seen: Dict[Tuple[str, str], float] = {}
+# Strong edges only: username -> {neighbour: weight}
+_strong_adjacency: Dict[str, Dict[str, int]] = {}
+# Union-find over strong edges
+_parent: Dict[str, str] = {}
+_members: Dict[str, Set[str]] = {}
+# component root -> cached ring members (k-core); dropped when the component changes
+_ring_cache: Dict[str, Set[str]] = {}
+
+def _find(node: str) -> str:
+    """Returns the component root of a node, compressing the path on the way."""
+    root = node
+    while _parent.get(root, root) != root:
+        root = _parent[root]
+    while node != root:
+        next_node = _parent[node]
+        _parent[node] = root
+        node = next_node
+    return root
+
+def _union(a: str, b: str) -> None:
+    """Merges the components of two accounts (smaller into larger)."""
+    for node in (a, b):
+        if node not in _parent:
+            _parent[node] = node
+            _members[node] = {node}
+    root_a, root_b = _find(a), _find(b)
+    _ring_cache.pop(root_a, None)
+    _ring_cache.pop(root_b, None)
+    if root_a == root_b:
+        return
+    if len(_members[root_a]) < len(_members[root_b]):
+        root_a, root_b = root_b, root_a
+    _parent[root_b] = root_a
+    _members[root_a].update(_members.pop(root_b))
+
+def _add_edge(a: str, b: str, token: str, timestamp: float) -> None:
+    """Records that two accounts co-promoted a token and updates strong edges."""
+    edge = (a, b) if a < b else (b, a)
+    _edge_seen[edge] = max(_edge_seen.get(edge, 0), timestamp)
+    tokens = _edge_tokens.setdefault(edge, set())
+    if token in tokens:
+        return
+    tokens.add(token)
+    weight = len(tokens)
+    if weight >= settings.RING_MIN_SHARED_TOKENS:
+        _strong_adjacency.setdefault(a, {})[b] = weight
+        _strong_adjacency.setdefault(b, {})[a] = weight
+        _union(a, b)
+
+def _load() -> None:
+    """Loads the persisted graph once per process."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if not os.path.exists(settings.PROMOTION_GRAPH_PATH):
+        return
+    try:
+        with open(settings.PROMOTION_GRAPH_PATH, 'r') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Error loading promotion graph: {e}")
+        return
+    for token, posts in data.get("token_posts", {}).items():
+        _token_posts[token] = [tuple(post) for post in posts]
+        _token_tweet_ids[token] = {post[2] for post in posts}
+    loaded_at = time.time()
+    for edge in data.get("edges", []):
+        # Graphs saved before edges had a timestamp count as seen now
+        a, b, tokens = edge[:3]
+        seen = edge[3] if len(edge) > 3 else loaded_at
+        for token in tokens:
+            _add_edge(a, b, token, seen)
+    logger.info(f"Loaded promotion graph with {len(_edge_tokens)} edges and {len(_members)} ring candidates")
+
+def prune(now: float = None) -> int:
+    """Drops weak edges and token posts older than PROMOTION_GRAPH_WEAK_EDGE_TTL_HOURS.
+
+    Returns:
+        The number of weak edges dropped.
+    """
+    global _dirty
+    if now is None:
+        now = time.time()
+    cutoff = now - settings.PROMOTION_GRAPH_WEAK_EDGE_TTL_HOURS * 3600
+    with _lock:
+        _load()
+        expired = [edge for edge, tokens in _edge_tokens.items()
+                   if len(tokens) < settings.RING_MIN_SHARED_TOKENS and _edge_seen.get(edge, 0) < cutoff]
+        for edge in expired:
+            del _edge_tokens[edge]
+            _edge_seen.pop(edge, None)
+        # Posts only link to posts within the window, so tokens quiet this long are done
+        stale_tokens = [token for token, posts in _token_posts.items() if not posts or posts[-1][0] < cutoff]
+        for token in stale_tokens:
+            del _token_posts[token]
+            _token_tweet_ids.pop(token, None)
+        if expired or stale_tokens:
+            _dirty = True
+    if expired:
+        logger.info(f"Pruned {len(expired)} weak co-promotion edges and {len(stale_tokens)} quiet tokens from the promotion graph")
+    return len(expired)
+
+def save() -> None:
+    """Prunes old weak edges and persists the graph if it changed since it was loaded."""
+    global _dirty
+    prune()
+    with _lock:
+        if not _dirty:
+            return
+        data = {
+            "token_posts": {token: [list(post) for post in posts] for token, posts in _token_posts.items()},
+            "edges": [[a, b, sorted(tokens), _edge_seen.get((a, b), 0)] for (a, b), tokens in _edge_tokens.items()]
+        }
+        _dirty = False
+    try:
+        graph_dir = os.path.dirname(settings.PROMOTION_GRAPH_PATH)
+        if graph_dir:
+            os.makedirs(graph_dir, exist_ok=True)
+        with open(settings.PROMOTION_GRAPH_PATH, 'w') as f:
+            json.dump(data, f)
+    except OSError as e:
+        logger.error(f"Error saving promotion graph: {e}")
+
+def add_promotions(token: str, records: List[Dict[str, Any]], persist: bool = True) -> int:
+    """Adds promotion tweets for a token to the graph.
+
+    Args:
+        token: The token address being promoted.
+        records: Dicts with 'tweet_id', 'username' and 'timestamp' (see
+                 twitter.build_promotion_records). Records without a timestamp are skipped.
+        persist: Save the graph afterwards. Callers adding many tokens should pass False
+                 and call save() once when they are done.
+
+    Returns:
+        The number of new posts added.
+    """
+    global _dirty
+    window = settings.PROMOTION_GRAPH_WINDOW_MINUTES * 60
+    added = 0
+    with _lock:
+        _load()
+        posts = _token_posts.setdefault(token, [])
+        seen_ids = _token_tweet_ids.setdefault(token, set())
+        for record in sorted(records, key=lambda r: r.get('timestamp') or 0):
+            tweet_id = str(record.get('tweet_id') or '')
+            username = record.get('username')
+            timestamp = record.get('timestamp')
+            if not tweet_id or not username or timestamp is None or tweet_id in seen_ids:
+                continue
+            seen_ids.add(tweet_id)
+            added += 1
+
+            # Link the author to everyone who posted this token within the window
+            start = bisect.bisect_left(posts, (timestamp - window,))
+            end = bisect.bisect_right(posts, (timestamp + window, '\uffff'))
+            for other_timestamp, other, _ in posts[start:end]:
+                if other != username:
+                    _add_edge(username, other, token, max(timestamp, other_timestamp))
+
+            bisect.insort(posts, (timestamp, username, tweet_id))
+            if len(posts) > MAX_POSTS_PER_TOKEN:
+                dropped = posts.pop(0)
+                seen_ids.discard(dropped[2])
+        if added:
+            _dirty = True
+
+    if added and persist:
+        save()
+    return added
+
+def _ring_members(root: str) -> Set[str]:
+    """Returns the k-core of a component, i.e. the accounts that form its dense ring."""
+    cached = _ring_cache.get(root)
+    if cached is not None:
+        return cached
+
+    members = _members.get(root, {root})
+    degrees = {node: sum(1 for n in _strong_adjacency.get(node, {}) if n in members) for node in members}
+    core = set(members)
+    queue = [node for node, degree in degrees.items() if degree < settings.RING_CORE_DEGREE]
+    while queue:
+        node = queue.pop()
+        if node not in core:
+            continue
+        core.discard(node)
+        for neighbour in _strong_adjacency.get(node, {}):
+            if neighbour in core:
+                degrees[neighbour] -= 1
+                if degrees[neighbour] < settings.RING_CORE_DEGREE:
+                    queue.append(neighbour)
+    if len(core) < settings.RING_MIN_SIZE:
+        core = set()
+    _ring_cache[root] = core
+    return core
+
+def get_ring(username: str) -> Optional[Dict[str, Any]]:
+    """Returns the ring an account belongs to, or None if it is not part of one."""
+    with _lock:
+        _load()
+        if username not in _parent:
+            return None
+        root = _find(username)
+        ring = _ring_members(root)
+        if username not in ring:
+            return None
+        return {"ring_id": root, "size": len(ring), "members": sorted(ring)}
+
+def get_rings(min_size: int = None) -> List[Dict[str, Any]]:
+    """Lists all detected rings, largest first."""
+    if min_size is None:
+        min_size = settings.RING_MIN_SIZE
+    rings = []
+    with _lock:
+        _load()
+        for root in list(_members):
+            if len(_members[root]) < min_size:
+                continue
+            ring = _ring_members(root)
+            if len(ring) >= min_size:
+                rings.append({"ring_id": root, "size": len(ring), "members": sorted(ring)})
+    rings.sort(key=lambda r: r["size"], reverse=True)
+    return rings
+
+def get_ring_signal(token: str, usernames: List[str]) -> Dict[str, Any]:
+    """Summarises coordinated-promotion evidence for the accounts promoting a token.
+
+    Args:
+        token: The token address.
+        usernames: Accounts that promoted the token.
+
+    Returns:
+        A dictionary with the rings involved, the ring members promoting this token,
+        and the largest number of distinct accounts that posted it within one window.
+    """
+    window = settings.PROMOTION_GRAPH_WINDOW_MINUTES * 60
+    rings: Dict[str, Dict[str, Any]] = {}
+    for username in set(usernames):
+        ring = get_ring(username)
+        if ring:
+            entry = rings.setdefault(ring["ring_id"], {"ring_id": ring["ring_id"], "size": ring["size"], "members_promoting": []})
+            entry["members_promoting"].append(username)
+
+    # Largest burst: most distinct accounts posting this token within one window
+    max_burst = 0
+    with _lock:
+        posts = _token_posts.get(token, [])
+        in_window: Dict[str, int] = {}
+        start = 0
+        for timestamp, username, _ in posts:
+            in_window[username] = in_window.get(username, 0) + 1
+            while timestamp - posts[start][0] > window:
+                expired = posts[start][1]
+                in_window[expired] -= 1
+                if not in_window[expired]:
+                    del in_window[expired]
+                start += 1
+            max_burst = max(max_burst, len(in_window))
+
+    ring_list = sorted(rings.values(), key=lambda r: len(r["members_promoting"]), reverse=True)
+    for ring in ring_list:
+        ring["members_promoting"].sort()
+    return {
+        "ring_members": sorted({u for r in ring_list for u in r["members_promoting"]}),
+        "rings": ring_list,
+        "max_burst_accounts": max_burst,
+        "window_minutes": settings.PROMOTION_GRAPH_WINDOW_MINUTES
+    }
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    detected = get_rings()
+    print(f"Detected {len(detected)} coordinated promotion rings")
+    for ring in detected[:10]:
+        print(f"Ring {ring['ring_id']} ({ring['size']} accounts): {', '.join('@' + m for m in ring['members'][:10])}")
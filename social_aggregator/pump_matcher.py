@@ -0,0 +1,280 @@
+"""Compiled multi-pattern matcher for pump-and-dump indicator phrases.
+
+Every profile in config.pump_keywords.INDICATOR_PROFILES is compiled once, tweets
+are lowercased once, and the matched phrases are scored against the profile, so
+callers no longer lowercase and re-scan the text for every keyword.
+
+Small profiles (fewer than AHO_CORASICK_MIN_PHRASES phrases, which includes all the
+built-in ones) are matched with one substring check per phrase, the same work the
+old hand-written keyword checks did. For those, a check per phrase is faster than
+an automaton scan. Larger phrase sets use one Aho-Corasick scan per text when
+pyahocorasick is installed, which stays flat as phrases are added. A category's
+count is the number of its distinct phrases found in the text (presence, like the
+old checks, rather than occurrences), so both backends give the same results.
+"""
+
+import logging
+import time
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from config import settings
+from config.pump_keywords import INDICATOR_PROFILES
+
+# Aho-Corasick is optional; without it large profiles use substring checks too
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Configure logging
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Profiles with at least this many phrases are scanned with Aho-Corasick (when installed)
+AHO_CORASICK_MIN_PHRASES = 24
+
+class PumpIndicatorMatcher:
+    """Scores text against weighted indicator profiles."""
+
+    def __init__(self, profiles: Dict[str, Dict[str, Dict[str, Any]]], use_aho_corasick: Optional[bool] = None):
+        """Compiles every profile.
+
+        Args:
+            profiles: Profiles as in INDICATOR_PROFILES.
+            use_aho_corasick: Force the backend for every profile; by default profiles with
+                              AHO_CORASICK_MIN_PHRASES or more phrases use Aho-Corasick if
+                              pyahocorasick is installed.
+        """
+        self.profiles = profiles
+        # profile -> ((phrase, category, category bit), ...) for substring checks
+        self._phrases: Dict[str, Tuple[Tuple[str, str, int], ...]] = {}
+        # profile -> category weights, and score per category bitmask filled on first use
+        self._weights: Dict[str, List[Any]] = {}
+        self._scores: Dict[str, Dict[int, Any]] = {}
+        self._backends: Dict[str, str] = {}
+        for name, profile in profiles.items():
+            categories = list(profile)
+            self._phrases[name] = tuple(
+                (phrase.lower(), category, 1 << i)
+                for i, category in enumerate(categories)
+                for phrase in dict.fromkeys(profile[category]["phrases"])
+            )
+            self._weights[name] = [profile[category]["weight"] for category in categories]
+            self._scores[name] = {}
+            use_aho = use_aho_corasick
+            if use_aho is None:
+                use_aho = ahocorasick is not None and len(self._phrases[name]) >= AHO_CORASICK_MIN_PHRASES
+            self._backends[name] = "aho-corasick" if use_aho else "substring"
+        if use_aho_corasick and ahocorasick is None:
+            raise ImportError("pyahocorasick is not installed")
+
+        # One automaton over the phrases of every Aho-Corasick profile, mapping each
+        # phrase to its (profile, category, category bit) entries
+        self._iter = None
+        aho_entries: Dict[str, List[Tuple[str, str, int]]] = {}
+        for name, backend in self._backends.items():
+            if backend == "aho-corasick":
+                for phrase, category, bit in self._phrases[name]:
+                    aho_entries.setdefault(phrase, []).append((name, category, bit))
+        if aho_entries:
+            automaton = ahocorasick.Automaton()
+            for phrase, entries in aho_entries.items():
+                automaton.add_word(phrase, (phrase, tuple(entries)))
+            automaton.make_automaton()
+            self._iter = automaton.iter
+
+    def backend(self, profile: str) -> str:
+        """Returns "substring" or "aho-corasick", the backend used for a profile."""
+        return self._backends[profile]
+
+    def _score_mask(self, profile: str, mask: int) -> Any:
+        """Weighted score of the categories in a bitmask."""
+        scores = self._scores[profile]
+        score = scores.get(mask)
+        if score is None:
+            # Sum weights in profile order so scores match the previous hand-written checks exactly
+            score = 0
+            for i, weight in enumerate(self._weights[profile]):
+                if mask & (1 << i):
+                    score += weight
+            scores[mask] = score
+        return score
+
+    def _match_automaton(self, text: str, profiles: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Scores an already lowercased text against Aho-Corasick profiles in one scan."""
+        counts: Dict[str, Dict[str, int]] = {profile: {} for profile in profiles}
+        masks = dict.fromkeys(profiles, 0)
+        # Each matched phrase counts once, however often it occurs
+        found = {phrase: entries for _, (phrase, entries) in self._iter(text)}
+        for entries in found.values():
+            for profile, category, bit in entries:
+                if profile in masks:
+                    profile_counts = counts[profile]
+                    profile_counts[category] = profile_counts.get(category, 0) + 1
+                    masks[profile] |= bit
+        return {profile: {"score": self._score_mask(profile, masks[profile]), "counts": counts[profile]} for profile in profiles}
+
+    def score(self, text: str, profile: str = "quick_scan") -> Dict[str, Any]:
+        """Scores one text.
+
+        Args:
+            text: The tweet text.
+            profile: Name of the profile in INDICATOR_PROFILES.
+
+        Returns:
+            {"score": weighted score, "counts": {category: number of distinct phrases matched}}.
+        """
+        return self.score_batch([text], profile)[0]
+
+    def score_batch(self, texts: Iterable[str], profile: str = "quick_scan") -> List[Dict[str, Any]]:
+        """Scores many texts in one call.
+
+        Args:
+            texts: Tweet texts.
+            profile: Name of the profile in INDICATOR_PROFILES.
+
+        Returns:
+            One score dictionary per text, in input order.
+        """
+        if self._backends[profile] == "aho-corasick":
+            match = self._match_automaton
+            return [match(text.lower() if text else "", [profile])[profile] for text in texts]
+        # The substring loop is inlined here: this is the per-tweet hot path
+        phrases = self._phrases[profile]
+        scores = self._scores[profile]
+        results = []
+        for text in texts:
+            text = text.lower() if text else ""
+            counts: Dict[str, int] = {}
+            mask = 0
+            for phrase, category, bit in phrases:
+                if phrase in text:
+                    counts[category] = counts.get(category, 0) + 1
+                    mask |= bit
+            score = scores.get(mask)
+            if score is None:
+                score = self._score_mask(profile, mask)
+            results.append({"score": score, "counts": counts})
+        return results
+
+    def score_batch_profiles(self, texts: Iterable[str], profiles: Iterable[str]) -> List[Dict[str, Dict[str, Any]]]:
+        """Scores many texts against several profiles.
+
+        Aho-Corasick profiles share a single scan per text.
+
+        Returns:
+            One {profile: score dictionary} mapping per text, in input order.
+        """
+        texts = list(texts)
+        profiles = list(profiles)
+        aho_profiles = [profile for profile in profiles if self._backends[profile] == "aho-corasick"]
+        scored = {profile: self.score_batch(texts, profile) for profile in profiles if profile not in aho_profiles}
+        if aho_profiles:
+            scans = [self._match_automaton(text.lower() if text else "", aho_profiles) for text in texts]
+            for profile in aho_profiles:
+                scored[profile] = [scan[profile] for scan in scans]
+        return [{profile: scored[profile][i] for profile in profiles} for i in range(len(texts))]
+
+_matcher: Optional[PumpIndicatorMatcher] = None
+
+def get_matcher() -> PumpIndicatorMatcher:
+    """Returns the shared matcher, compiling it on first use."""
+    global _matcher
+    if _matcher is None:
+        _matcher = PumpIndicatorMatcher(INDICATOR_PROFILES)
+    return _matcher
+
+def score_text(text: str, profile: str = "quick_scan") -> Dict[str, Any]:
+    """Scores one text with the shared matcher (see PumpIndicatorMatcher.score)."""
+    return get_matcher().score(text, profile)
+
+def score_tweets(tweets: List[Dict[str, Any]], profile: str = "quick_scan") -> List[Dict[str, Any]]:
+    """Scores the 'text' of each tweet in one batch (see PumpIndicatorMatcher.score_batch)."""
+    return get_matcher().score_batch((tweet.get('text', '') for tweet in tweets), profile)
+
+def _legacy_quick_scan(text: str) -> float:
+    """The per-keyword quick scan previously inlined in main.run_monitor_cycle (benchmark only)."""
+    text = text.lower()
+    score = 0
+    if any(x in text.lower() for x in ["contract", "token address", "address:", "ca:"]):
+        score += 0.4
+    if any(x in text for x in ["100x", "1000x", "moonshot", "to the moon", "🚀"]):
+        score += 0.3
+    if any(x in text.lower() for x in ["don't miss", "hurry", "last chance", "early"]):
+        score += 0.3
+    return score
+
+def _legacy_promoter_points(text: str) -> int:
+    """The per-keyword promoter scoring previously inlined in twitter.find_promoters_for_token (benchmark only)."""
+    points = 0
+    if "100x" in text or "1000x" in text:
+        points += 3
+    if "🚀" in text:
+        points += 2
+    if "moon" in text.lower():
+        points += 2
+    if "gem" in text.lower():
+        points += 1
+    if "early" in text.lower():
+        points += 1
+    if "don't miss" in text.lower() or "hurry" in text.lower():
+        points += 3
+    return points
+
+# Benchmark against the previous keyword loops
+if __name__ == '__main__':
+    import random
+
+    def best_of(runs, func):
+        """Fastest of several runs, in ms (the first run also warms up caches)."""
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        return result, min(timings) * 1000
+
+    random.seed(42)
+    fragments = [
+        "Check out this new token", "100x incoming", "to the moon 🚀🚀", "CA: 7xKXtg2CW87d97TXJSDpbD5jBkheTqA83TZRuJosgAsU",
+        "don't miss out", "early gem", "moonshot alert", "gm frens", "just bought more", "hurry, last chance",
+        "contract address below", "solana szn", "lfg", "not financial advice", "1000x potential"
+    ]
+    tweets = [" ".join(random.choice(fragments) for _ in range(random.randint(3, 8))) for _ in range(10000)]
+
+    if ahocorasick is not None:
+        for name in INDICATOR_PROFILES:
+            assert (PumpIndicatorMatcher(INDICATOR_PROFILES, use_aho_corasick=False).score_batch(tweets, name)
+                    == PumpIndicatorMatcher(INDICATOR_PROFILES, use_aho_corasick=True).score_batch(tweets, name)), f"{name} results differ between backends"
+
+    (legacy_quick, legacy_promoter), legacy_time = best_of(5, lambda: (
+        [_legacy_quick_scan(t) for t in tweets], [_legacy_promoter_points(t) for t in tweets]))
+    print(f"Scored {len(tweets)} tweets (quick_scan + promoter profiles)")
+    print(f"  Legacy keyword loops:               {legacy_time:8.1f} ms")
+
+    for use_aho in ([False, True] if ahocorasick is not None else [False]):
+        matcher = PumpIndicatorMatcher(INDICATOR_PROFILES, use_aho_corasick=use_aho)
+        backend = matcher.backend("quick_scan")
+        (batch_quick, batch_promoter), batch_time = best_of(5, lambda: (
+            [r["score"] for r in matcher.score_batch(tweets, "quick_scan")],
+            [r["score"] for r in matcher.score_batch(tweets, "promoter")]))
+        combined, combined_time = best_of(5, lambda: matcher.score_batch_profiles(tweets, ["quick_scan", "promoter"]))
+
+        assert legacy_quick == batch_quick == [r["quick_scan"]["score"] for r in combined], "quick_scan scores differ from the legacy checks"
+        assert legacy_promoter == batch_promoter == [r["promoter"]["score"] for r in combined], "promoter scores differ from the legacy checks"
+        print(f"  {backend:>12}, one profile per call:   {batch_time:8.1f} ms")
+        print(f"  {backend:>12}, both profiles together: {combined_time:8.1f} ms")
+
+    # Scaling with the phrase list: every keyword in config/pump_keywords.py as its own category
+    from config.pump_keywords import get_all_keywords
+    all_phrases = [kw.lower() for kw in get_all_keywords()]
+    keyword_profile = {"all": {kw: {"weight": 1, "phrases": [kw]} for kw in all_phrases}}
+
+    legacy_all, legacy_time = best_of(3, lambda: [sum(1 for kw in all_phrases if kw in t.lower()) for t in tweets])
+    print(f"Scored {len(tweets)} tweets against all {len(all_phrases)} keywords")
+    print(f"  Legacy keyword loops:               {legacy_time:8.1f} ms")
+    for use_aho in ([True, False] if ahocorasick is not None else [False]):
+        matcher = PumpIndicatorMatcher(keyword_profile, use_aho_corasick=use_aho)
+        matched_all, matcher_time = best_of(3, lambda: [r["score"] for r in matcher.score_batch(tweets, "all")])
+        assert legacy_all == matched_all, "keyword scores differ from the legacy checks"
+        print(f"  {matcher.backend('all'):>12}, one profile per call:   {matcher_time:8.1f} ms")
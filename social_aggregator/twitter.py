@@ -1,10 +1,12 @@
 """Handles fetching data from twitterapi.io."""
 
+import calendar
 import requests
 import random
 import logging
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional
 import os
@@ -12,12 +14,18 @@ import os
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from config import settings
+from social_aggregator import promoter_index
+from social_aggregator import promotion_graph
+from social_aggregator import pump_matcher
 
 # Configure logging
 logging.basicConfig(level=settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 TWITTER_API_BASE_URL = "https://api.twitterapi.io/twitter/tweet/advanced_search"
+# Month numbers for the fast path of parse_tweet_time
+_MONTHS = {name: number for number, name in enumerate(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1)}
 
 @retry(
     retry=retry_if_exception_type((requests.exceptions.RequestException, requests.exceptions.Timeout)),
@@ -107,11 +115,12 @@ def get_recent_tweets(keywords: List[str], since_minutes: int = 60) -> List[Dict
                     logger.info(f"    {truncated_text}")
                     
                     # If there are token addresses or other interesting mentions, log those separately
-                    if "token address" in text.lower() or "contract" in text.lower():
+                    markers = pump_matcher.score_text(text, "sample_log")["counts"]
+                    if markers.get("token_address"):
                         logger.info(f"    [POTENTIAL TOKEN ADDRESS FOUND in tweet from @{author}]")
                     
                     # Look for rocket emojis, "100x", etc. as indicators of potential pump schemes
-                    if "🚀" in text or "100x" in text or "1000x" in text or "to the moon" in text.lower():
+                    if markers.get("pump"):
                         logger.info(f"    [PUMP INDICATORS FOUND in tweet from @{author}]")
 
             # Handle rate limiting
@@ -130,19 +139,185 @@ def get_recent_tweets(keywords: List[str], since_minutes: int = 60) -> List[Dict
     logger.info(f"Total unique tweets fetched: {len(all_tweets)}")
     return all_tweets
 
-def find_promoters_for_token(token_address: str, since_days: int = 7) -> List[Dict[str, Any]]:
+def _search_keyword(keyword: str, since_str: str) -> List[Dict[str, Any]]:
+    """Runs a single keyword search, returning an empty list on failure.
+
+    Each call builds its own headers so parallel searches rotate user agents independently.
+    """
+    headers = {
+        "X-API-Key": settings.TWITTER_API_KEY,
+        "User-Agent": random.choice(settings.TWITTER_USER_AGENTS)
+    }
+    try:
+        tweets = _fetch_tweets_with_retry(keyword, since_str, headers)
+        logger.info(f"Fetched {len(tweets)} tweets for keyword: {keyword}")
+        return tweets
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while processing tweets for '{keyword}': {e}")
+        return []
+
+def get_recent_tweets_concurrent(keywords: List[str], since_minutes: int = 60, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Fetches tweets for several keywords in parallel using twitterapi.io.
+
+    Unlike get_recent_tweets this does not sleep between keywords; the number of
+    requests in flight is bounded by TWITTER_MAX_CONCURRENT_REQUESTS instead.
+
+    Args:
+        keywords: A list of keywords to search for.
+        since_minutes: How many minutes back to search.
+        max_workers: Optional override for the number of parallel requests.
+
+    Returns:
+        A list of unique tweets, in keyword order, or an empty list if nothing was found.
+    """
+    if not settings.TWITTER_API_KEY or settings.TWITTER_API_KEY == "YOUR_TWITTER_API_IO_KEY":
+        logger.warning("Twitter API key not configured. Skipping Twitter fetch.")
+        return []
+
+    keywords = keywords[:10]  # Same cap as get_recent_tweets
+    if not keywords:
+        return []
+
+    since_time = datetime.now(timezone.utc) - timedelta(minutes=since_minutes)
+    since_str = since_time.strftime("%Y-%m-%d_%H:%M:%S_UTC")
+
+    workers = max(1, min(max_workers or settings.TWITTER_MAX_CONCURRENT_REQUESTS, len(keywords)))
+    logger.info(f"Searching {len(keywords)} keywords with {workers} parallel requests")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda kw: _search_keyword(kw, since_str), keywords))
+
+    # Merge in keyword order, skipping duplicates (same tweet ID)
+    all_tweets = []
+    seen_ids = set()
+    for tweets in results:
+        for tweet in tweets:
+            tweet_id = tweet.get('id')
+            if tweet_id in seen_ids:
+                continue
+            seen_ids.add(tweet_id)
+            all_tweets.append(tweet)
+
+    logger.info(f"Total unique tweets fetched: {len(all_tweets)}")
+    return all_tweets
+
+def get_author_profile(author_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the profile of a tweet author from the 'author' object attached to the tweet.
+
+    Search results already carry the author's current details, so no separate lookup
+    (or cache) is needed.
+
+    Args:
+        author_data: The 'author' object attached to a tweet.
+
+    Returns:
+        A dictionary with display_name, followers, creation_date and is_verified.
+    """
+    return {
+        'display_name': author_data.get('name', 'Unknown'),
+        'followers': author_data.get('followers', 0),
+        'creation_date': author_data.get('createdAt', 'Unknown'),
+        'is_verified': author_data.get('isVerified', False)
+    }
+
+def parse_tweet_time(value: Any) -> Optional[float]:
+    """Converts a tweet 'createdAt' value to a Unix timestamp.
+
+    Handles the Twitter format ("Sun Apr 27 10:44:45 +0000 2025"), ISO 8601 strings
+    and numeric timestamps. Returns None if the value cannot be parsed.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    # Fast path for the usual UTC Twitter format; strptime is ~10x slower
+    parts = value.split() if isinstance(value, str) else []
+    if len(parts) == 6 and parts[4] == "+0000" and parts[1] in _MONTHS:
+        try:
+            hour, minute, second = parts[3].split(":")
+            return float(calendar.timegm((int(parts[5]), _MONTHS[parts[1]], int(parts[2]),
+                                          int(hour), int(minute), int(second))))
+        except ValueError:
+            pass
+    try:
+        return datetime.strptime(value, "%a %b %d %H:%M:%S %z %Y").timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    except ValueError:
+        return None
+
+def build_promotion_records(tweets: List[Dict[str, Any]], pump_scores: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Converts tweets to the records stored in the promoter index.
+
+    Args:
+        tweets: Tweets as returned by the Twitter API.
+        pump_scores: Pump indicator points per tweet, if already computed.
+    """
+    if pump_scores is None:
+        pump_scores = [result["score"] for result in pump_matcher.score_tweets(tweets, "promoter")]
+    records = []
+    for tweet, pump_score in zip(tweets, pump_scores):
+        username = tweet.get('author', {}).get('userName')
+        tweet_id = tweet.get('id') or tweet.get('url')
+        if not username or not tweet_id:
+            continue
+        records.append({
+            'tweet_id': tweet_id,
+            'username': username,
+            'timestamp': parse_tweet_time(tweet.get('createdAt', tweet.get('created_at'))),
+            'pump_score': pump_score
+        })
+    return records
+
+def _tweet_keys(tweet: Dict[str, Any]) -> List[str]:
+    """Returns the identifiers (id and/or url) that identify a tweet across runs."""
+    return [key for key in (tweet.get('id'), tweet.get('url')) if key]
+
+def find_promoters_for_token(token_address: str, since_days: int = 7, force_refresh: bool = False) -> List[Dict[str, Any]]:
     """Searches Twitter for all accounts that promoted a specific token address.
-    
+
+    A promoter list saved less than PROMOTER_CACHE_TTL_SECONDS ago for the same
+    since_days is returned as-is. Otherwise the search variants are fetched in parallel
+    and only tweets that are not already in the saved list are added to it. A list
+    saved for another since_days covers another window and is not reused.
+
     Args:
         token_address: The token address to search for
         since_days: How many days back to search
-        
+        force_refresh: Search Twitter even if the saved promoter list is still fresh
+
     Returns:
         A list of dictionaries containing promoter info, sorted by influence
     """
+    clean_address = token_address.replace("/", "_").replace(":", "_")
+    promoters_path = f"./data/twitter/token_{clean_address}_promoters.json"
+
+    # Load the promoter list previously saved for this search window, if any
+    existing_promoters = []
+    if os.path.exists(promoters_path):
+        try:
+            with open(promoters_path, 'r') as f:
+                saved = json.load(f)
+            # Older files hold a bare list with no window, so they count as a miss too
+            if isinstance(saved, dict) and saved.get('since_days') == since_days:
+                existing_promoters = saved.get('promoters', [])
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading saved promoter data: {e}")
+            existing_promoters = []
+
+    if existing_promoters and not force_refresh:
+        age = time.time() - os.path.getmtime(promoters_path)
+        if age < settings.PROMOTER_CACHE_TTL_SECONDS:
+            logger.info(f"Using saved promoter data for token {token_address} ({age / 60:.0f} minutes old)")
+            return existing_promoters
+
     if not settings.TWITTER_API_KEY or settings.TWITTER_API_KEY == "YOUR_TWITTER_API_IO_KEY":
         logger.warning("Twitter API key not configured. Skipping Twitter promoter search.")
-        return []
+        return existing_promoters
     
     logger.info(f"Searching for Twitter accounts promoting token: {token_address}")
     
@@ -156,33 +331,46 @@ def find_promoters_for_token(token_address: str, since_days: int = 7) -> List[Di
     
     # Fetch tweets containing references to this token address
     since_minutes = since_days * 24 * 60  # Convert days to minutes
-    promotion_tweets = get_recent_tweets(search_terms, since_minutes=since_minutes)
+    promotion_tweets = get_recent_tweets_concurrent(search_terms, since_minutes=since_minutes)
     
     if not promotion_tweets:
         logger.warning(f"No tweets found promoting token: {token_address}")
-        return []
+        return existing_promoters
     
-    logger.info(f"Found {len(promotion_tweets)} tweets mentioning token: {token_address}")
+    # Only process tweets we have not already attributed to a promoter
+    promoters = {p['username']: p for p in existing_promoters}
+    seen_keys = {key for p in existing_promoters for t in p.get('tweets', []) for key in _tweet_keys(t)}
+    new_tweets = [t for t in promotion_tweets if not any(key in seen_keys for key in _tweet_keys(t))]
     
-    # Analyze promoters (Twitter accounts)
-    promoters = {}
+    logger.info(f"Found {len(promotion_tweets)} tweets mentioning token: {token_address} ({len(new_tweets)} new)")
     
-    for tweet in promotion_tweets:
+    if not new_tweets and existing_promoters:
+        # Nothing new; mark the saved list as fresh again
+        os.utime(promoters_path)
+        return existing_promoters
+    
+    # Score the promotional language of all new tweets in one batch
+    pump_scores = [result["score"] for result in pump_matcher.score_tweets(new_tweets, "promoter")]
+    
+    for tweet, pump_score in zip(new_tweets, pump_scores):
         author_data = tweet.get('author', {})
         username = author_data.get('userName', 'Unknown')
+        profile = get_author_profile(author_data)
         
         if username not in promoters:
-            # Extract account details
             promoters[username] = {
                 'username': username,
-                'display_name': author_data.get('name', 'Unknown'),
-                'followers': author_data.get('followers', 0),
-                'creation_date': author_data.get('createdAt', 'Unknown'),
-                'is_verified': author_data.get('isVerified', False),
                 'tweets': [],
                 'pump_indicators': 0,
                 'influence_score': 0.0
             }
+        # Refresh account details from the tweet's author data
+        promoters[username].update({
+            'display_name': profile['display_name'],
+            'followers': profile['followers'],
+            'creation_date': profile['creation_date'],
+            'is_verified': profile['is_verified']
+        })
         
         # Add tweet to this promoter's list
         tweet_text = tweet.get('text', '')
@@ -190,24 +378,18 @@ def find_promoters_for_token(token_address: str, since_days: int = 7) -> List[Di
         tweet_url = tweet.get('url', '')
         
         promoters[username]['tweets'].append({
+            'id': tweet.get('id'),
             'text': tweet_text,
             'date': tweet_date,
             'url': tweet_url
         })
         
         # Calculate a "pump indicator" score based on content
-        if "100x" in tweet_text or "1000x" in tweet_text:
-            promoters[username]['pump_indicators'] += 3
-        if "🚀" in tweet_text:
-            promoters[username]['pump_indicators'] += 2
-        if "moon" in tweet_text.lower():
-            promoters[username]['pump_indicators'] += 2
-        if "gem" in tweet_text.lower():
-            promoters[username]['pump_indicators'] += 1
-        if "early" in tweet_text.lower():
-            promoters[username]['pump_indicators'] += 1
-        if "don't miss" in tweet_text.lower() or "hurry" in tweet_text.lower():
-            promoters[username]['pump_indicators'] += 3
+        promoters[username]['pump_indicators'] += pump_score
+    
+    promotion_records = build_promotion_records(new_tweets, pump_scores)
+    promoter_index.record_promotions(token_address, promotion_records)
+    promotion_graph.add_promotions(token_address, promotion_records, persist=False)
     
     # Calculate influence score for each promoter
     for username, data in promoters.items():
@@ -223,11 +405,10 @@ def find_promoters_for_token(token_address: str, since_days: int = 7) -> List[Di
     
     # Save results to JSON for reference
     try:
-        clean_address = token_address.replace("/", "_").replace(":", "_")
         os.makedirs("./data/twitter", exist_ok=True)
         
-        with open(f"./data/twitter/token_{clean_address}_promoters.json", 'w') as f:
-            json.dump(promoter_list, f, indent=2)
+        with open(promoters_path, 'w') as f:
+            json.dump({'since_days': since_days, 'promoters': promoter_list}, f, indent=2)
         logger.info(f"Saved promoter data to data/twitter/token_{clean_address}_promoters.json")
     except Exception as e:
         logger.error(f"Error saving promoter data: {e}")
@@ -0,0 +1,61 @@
+"""Tests for validated Solana address extraction."""
+
+from correlation_engine import address_extractor
+
+TOKEN = "7xKXtg2CW87d97TXJSDpbD5jBkheTqA83TZRuJosgAsU"
+WSOL = "So11111111111111111111111111111111111111112"
+SYSTEM_PROGRAM = "11111111111111111111111111111111"
+
+
+def test_decoded_length_counts_leading_zero_bytes():
+    assert address_extractor.decoded_length(SYSTEM_PROGRAM) == 32
+    assert address_extractor.decoded_length(TOKEN) == 32
+    assert address_extractor.decoded_length("0OIl") == -1
+
+
+def test_only_32_byte_keys_are_valid():
+    assert address_extractor.is_valid_address(TOKEN)
+    assert address_extractor.is_valid_address(WSOL)
+    assert address_extractor.is_valid_address(SYSTEM_PROGRAM)
+    # Truncated and over-long keys look like base58 but do not decode to 32 bytes
+    assert not address_extractor.is_valid_address(TOKEN[:-3])
+    assert not address_extractor.is_valid_address(address_extractor._encode_base58(b"\xff" * 33))
+    assert not address_extractor.is_valid_address("SolanaSuperCycleMemecoinSzn2025LFGxxx")
+
+
+def test_extract_addresses_keeps_order_and_drops_repeats():
+    text = f"CA: {WSOL} then {TOKEN} again {WSOL} and #SolanaSuperCycleMemecoinSzn2025LFGxxx"
+    assert address_extractor.extract_addresses(text) == [WSOL, TOKEN]
+    assert address_extractor.extract_addresses(None) == []
+    assert address_extractor.extract_addresses("") == []
+
+
+def test_batch_matches_single_extraction():
+    texts = [f"CA: {TOKEN}", "nothing here", None, f"{TOKEN[:-3]} {WSOL}"]
+    assert address_extractor.extract_addresses_batch(texts) == [address_extractor.extract_addresses(t) for t in texts]
+
+
+def test_extract_from_tweets_is_unique_across_tweets():
+    tweets = [{"text": f"buy {TOKEN}"}, {"text": f"{WSOL} {TOKEN}"}, {}]
+    assert address_extractor.extract_from_tweets(tweets) == [TOKEN, WSOL]
+
+
+def test_filter_valid_cleans_llm_output():
+    assert address_extractor.filter_valid([f" {TOKEN} ", TOKEN, "not an address", None, 42, WSOL]) == [TOKEN, WSOL]
+
+
+def test_needs_llm_only_for_unresolved_address_hints():
+    # Resolved by the regex: valid addresses only, or nothing address-like
+    assert not address_extractor.needs_llm(f"CA: {TOKEN}")
+    assert not address_extractor.needs_llm("gm frens, to the moon")
+    assert not address_extractor.needs_llm(None)
+    # An announced address that did not validate, a glued or truncated one
+    assert address_extractor.needs_llm("CA: coming soon")
+    assert address_extractor.needs_llm(f"CA:{TOKEN}pump")
+    assert address_extractor.needs_llm(f"CA: {TOKEN[:20]} {TOKEN[20:]}")
+    assert address_extractor.needs_llm(f"{TOKEN[:-3]} moon")
+
+
+def test_needs_llm_uses_given_addresses():
+    assert address_extractor.needs_llm(f"{TOKEN} 🚀", addresses=[])
+    assert not address_extractor.needs_llm(f"{TOKEN} 🚀", addresses=[TOKEN])
@@ -0,0 +1,92 @@
+"""Tests for reusing analyses whose inputs are unchanged."""
+
+import json
+import os
+
+import pytest
+
+from config import settings
+from correlation_engine import analysis_memo
+from correlation_engine import pump_dump_analyzer
+from correlation_engine import verdict_backends
+
+TOKEN = "TestToken1111111111111111111111111111111pump"
+
+
+@pytest.fixture(autouse=True)
+def empty_memo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analysis_memo, "_recent", {})
+
+
+def _token_data(**changes):
+    data = {
+        "token_address": TOKEN,
+        "total_transactions": 20,
+        "buy_transactions": 2,
+        "sell_transactions": 15,
+        "other_transactions": 3,
+        "unique_wallets": 2,
+        "wallets": {"A": {"sent": 10.0, "received": 2.0, "net": -8.0}, "B": {"sent": 0.0, "received": 8.0, "net": 8.0}},
+        "hourly_volumes": {},
+        "raw_transactions": [{"trans_id": "t1", "block_time": 100}, {"trans_id": "t2", "block_time": 200}],
+        "holders_page_1": [{"owner": "A", "amount": 5}],
+        "metadata": {"holder": 10, "supply": "1000"},
+    }
+    data.update(changes)
+    return data
+
+
+def _tweets(*ids):
+    return [{"id": tweet_id, "duplicate_ids": [tweet_id]} for tweet_id in ids]
+
+
+def test_fingerprint_tracks_what_the_analysis_depends_on(monkeypatch):
+    base = analysis_memo.input_fingerprint(_token_data(), _tweets("1", "2"))
+    assert base == analysis_memo.input_fingerprint(_token_data(), _tweets("2", "1"))
+    changed = [
+        analysis_memo.input_fingerprint(_token_data(raw_transactions=[{"trans_id": "t3", "block_time": 300}]), _tweets("1", "2")),
+        analysis_memo.input_fingerprint(_token_data(holders_page_1=[{"owner": "A", "amount": 6}]), _tweets("1", "2")),
+        analysis_memo.input_fingerprint(_token_data(known_bad_holders=["A"]), _tweets("1", "2")),
+        analysis_memo.input_fingerprint(_token_data(), [{"id": "1", "duplicate_ids": ["1", "3"]}, {"id": "2"}]),
+    ]
+    monkeypatch.setattr(settings, "ANALYSIS_BACKEND", "local" if settings.ANALYSIS_BACKEND != "local" else "llm")
+    changed.append(analysis_memo.input_fingerprint(_token_data(), _tweets("1", "2")))
+    assert base not in changed and len(set(changed)) == len(changed)
+
+
+def test_lookup_returns_a_marked_copy_until_it_is_too_old(monkeypatch):
+    result = {"token_address": TOKEN, "is_pump_dump": True, "confidence": 0.8}
+    analysis_memo.remember(result, "fp")
+    reused = analysis_memo.lookup(TOKEN, "fp")
+    assert reused["reused_analysis"] is True and reused["is_pump_dump"] is True
+    reused["confidence"] = 0.0
+    assert analysis_memo.lookup(TOKEN, "fp")["confidence"] == 0.8
+    assert analysis_memo.lookup(TOKEN, "other") is None
+    monkeypatch.setattr(settings, "ANALYSIS_REUSE_MAX_AGE_SECONDS", 60)
+    analysis_memo._recent[TOKEN]["analyzed_at"] -= 61
+    assert analysis_memo.lookup(TOKEN, "fp") is None
+
+
+def test_failed_ai_verdicts_are_not_reused():
+    failed = {"token_address": TOKEN, "ai_analysis": {"summary": analysis_memo.AI_FAILURE_SUMMARY}}
+    analysis_memo.remember(failed, "fp")
+    assert "input_fingerprint" not in failed
+    assert analysis_memo.lookup(TOKEN, "fp") is None
+
+
+def test_saved_analysis_is_reused_after_a_restart(monkeypatch):
+    verdicts = []
+    monkeypatch.setattr(verdict_backends, "get_verdict", lambda data, tweets, result: verdicts.append(1) or {})
+    first = pump_dump_analyzer.analyze_token_transactions(_token_data(), _tweets("1"))
+    assert os.path.exists(analysis_memo.analysis_path(TOKEN))
+    with open(analysis_memo.analysis_path(TOKEN)) as f:
+        assert json.load(f)["input_fingerprint"] == first["input_fingerprint"]
+
+    monkeypatch.setattr(analysis_memo, "_recent", {})
+    again = pump_dump_analyzer.analyze_token_transactions(_token_data(), _tweets("1"))
+    assert again["reused_analysis"] is True
+    assert verdicts == [1]
+    fresh = pump_dump_analyzer.analyze_token_transactions(_token_data(), _tweets("1", "2"))
+    assert "reused_analysis" not in fresh
+    assert verdicts == [1, 1]
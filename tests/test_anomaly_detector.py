@@ -0,0 +1,111 @@
+"""Tests for the streaming per-token anomaly detector."""
+
+import json
+import random
+
+import pytest
+
+from config import settings
+from onchain_monitor import anomaly_detector
+
+HOUR = 3600
+START = 1_700_000_000 - 1_700_000_000 % HOUR
+
+
+@pytest.fixture(autouse=True)
+def empty_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ANOMALY_STATE_PATH", str(tmp_path / "anomaly_state.json"))
+    monkeypatch.setattr(anomaly_detector, "_states", {})
+    monkeypatch.setattr(anomaly_detector, "_loaded", True)
+    monkeypatch.setattr(anomaly_detector, "_dirty", False)
+
+
+def test_p2_quantiles_track_the_true_quantiles():
+    random.seed(5)
+    p50, p99 = anomaly_detector._new_quantile(0.5), anomaly_detector._new_quantile(0.99)
+    values = [random.uniform(0, 1000) for _ in range(20000)]
+    for value in values:
+        anomaly_detector._update_quantile(p50, value)
+        anomaly_detector._update_quantile(p99, value)
+    assert anomaly_detector._quantile_value(p50) == pytest.approx(500, rel=0.05)
+    assert anomaly_detector._quantile_value(p99) == pytest.approx(990, rel=0.01)
+
+
+def test_quantile_before_five_observations():
+    state = anomaly_detector._new_quantile(0.99)
+    assert anomaly_detector._quantile_value(state) is None
+    for value in (3.0, 1.0, 2.0):
+        anomaly_detector._update_quantile(state, value)
+    assert anomaly_detector._quantile_value(state) == 3.0
+
+
+def test_ewma_and_median():
+    assert anomaly_detector._ewma(None, 10.0) == 10.0
+    assert anomaly_detector._ewma(10.0, 20.0) == pytest.approx(10.0 + settings.ANOMALY_EWMA_ALPHA * 10.0)
+    assert anomaly_detector._median([3, 1, 2]) == 2
+    assert anomaly_detector._median([4, 1, 3, 2]) == 2.5
+
+
+def test_large_transfer_needs_history_and_an_outsized_amount(monkeypatch):
+    monkeypatch.setattr(settings, "ANOMALY_MIN_TRANSFERS", 30)
+    # Too early: no baseline yet
+    assert anomaly_detector.update("Fresh", 1.0, START, "first") == []
+    assert anomaly_detector.update("Fresh", 1e6, START + 1, "early") == []
+    for i in range(40):
+        assert anomaly_detector.update("T", 10.0 + i % 5, START + 60 + i, f"tx{i}") == []
+    # Above p99 but not ANOMALY_LARGE_TRANSFER_MEDIAN_MULTIPLE times the median
+    assert anomaly_detector.update("T", 100.0, START + 200, "mid") == []
+    anomalies = anomaly_detector.update("T", 5000.0, START + 201, "big", sender="A", receiver="B")
+    assert [a["type"] for a in anomalies] == ["large_transfer"]
+    assert anomalies[0]["sender"] == "A" and anomalies[0]["median_multiple"] > 20
+
+
+def test_seen_and_out_of_order_transfers_are_skipped():
+    anomaly_detector.update("T", 5.0, START + 10, "a")
+    anomaly_detector.update("T", 5.0, START + 10, "a")
+    anomaly_detector.update("T", 5.0, START + 5, "older")
+    anomaly_detector.update("T", 5.0, START + 10, "b")
+    assert anomaly_detector.get_baseline("T")["transfers"] == 2
+
+
+def test_volume_spike_fires_once_per_hour(monkeypatch):
+    monkeypatch.setattr(settings, "ANOMALY_MIN_HISTORY_HOURS", 6)
+    for hour in range(8):
+        anomaly_detector.update("T", 100.0 + hour, START + hour * HOUR, f"h{hour}")
+    spike_hour = START + 8 * HOUR
+    spikes = []
+    for i in range(5):
+        spikes += anomaly_detector.update("T", 500.0, spike_hour + i, f"s{i}")
+    assert [a["type"] for a in spikes] == ["volume_spike"]
+    assert spikes[0]["hour"] == spike_hour // HOUR
+    assert spikes[0]["robust_z"] >= settings.ANOMALY_VOLUME_SPIKE_Z
+
+
+def test_idle_hours_count_as_zero_within_the_window(monkeypatch):
+    monkeypatch.setattr(settings, "ANOMALY_BASELINE_HOURS", 4)
+    anomaly_detector.update("T", 10.0, START, "a")
+    anomaly_detector.update("T", 10.0, START + 3 * HOUR, "b")
+    assert anomaly_detector._states["T"]["hours"] == [10.0, 0.0, 0.0]
+    anomaly_detector.update("T", 10.0, START + 100 * HOUR, "c")
+    assert anomaly_detector._states["T"]["hours"] == [0.0, 0.0, 0.0, 0.0]
+    assert anomaly_detector.get_baseline("T")["volume_median"] == 0.0
+
+
+def test_partition_matches_shared_processing_and_round_trips():
+    transfers = [{"token_address": "T", "amount": 10 + i % 7, "block_time": START + i * 97, "trans_id": f"tx{i}"}
+                 for i in range(300)]
+    transfers.append({"token_address": "T", "amount": 1e5, "block_time": START + 300 * 97, "trans_id": "big"})
+    random.seed(2)
+    shuffled = random.sample(transfers, len(transfers))
+
+    anomalies, state = anomaly_detector.process_partition("T", shuffled, anomaly_detector.export_states(["T"])["T"])
+    assert anomaly_detector.get_baseline("T") is None
+    assert anomaly_detector.process_transfers(shuffled) == anomalies
+    assert any(a["type"] == "large_transfer" and a["amount"] == 1e5 for a in anomalies)
+    assert anomaly_detector._states["T"] == state
+
+    anomaly_detector.import_states({"U": state})
+    anomaly_detector.save()
+    assert anomaly_detector.get_baseline("U")["transfers"] == 301
+    with open(settings.ANOMALY_STATE_PATH) as f:
+        assert "U" in json.load(f)
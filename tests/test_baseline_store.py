@@ -0,0 +1,80 @@
+"""Tests for the adaptive spike/whale baselines."""
+
+import json
+
+import pytest
+
+from config import settings
+from onchain_monitor import baseline_store
+
+TOKEN = "TestToken1111111111111111111111111111111pump"
+
+
+@pytest.fixture(autouse=True)
+def empty_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BASELINE_STORE_PATH", str(tmp_path / "baselines.json"))
+    monkeypatch.setattr(baseline_store, "_store", {"tokens": {}, "cohorts": {}})
+    monkeypatch.setattr(baseline_store, "_loaded", True)
+    monkeypatch.setattr(baseline_store, "_dirty", False)
+
+
+def _share_stat(key="tokens", name=TOKEN):
+    return baseline_store._store[key][name]["stats"]["top_wallet_share"]
+
+
+def test_same_snapshot_is_observed_once():
+    assert baseline_store.observe(TOKEN, top_wallet_share=0.2, snapshot=1000) is True
+    assert baseline_store.observe(TOKEN, top_wallet_share=0.2, snapshot=1000) is False
+    assert _share_stat()[0] == 1
+    assert _share_stat("cohorts", "other")[0] == 1
+    assert baseline_store.observe(TOKEN, top_wallet_share=0.3, snapshot=1060) is True
+    assert _share_stat()[0] == 2
+
+
+def test_observations_without_a_snapshot_always_count():
+    baseline_store.observe(TOKEN, top_wallet_share=0.2)
+    baseline_store.observe(TOKEN, top_wallet_share=0.2)
+    assert _share_stat()[0] == 2
+
+
+def test_window_caps_the_weight_of_history(monkeypatch):
+    monkeypatch.setattr(settings, "BASELINE_WINDOW", 10)
+    stat = [0, 0.0, 0.0]
+    for _ in range(100):
+        baseline_store._add(stat, 0.1)
+    assert stat[0] == 10
+    for _ in range(30):
+        baseline_store._add(stat, 0.5)
+    # Thirty new values outweigh a hundred old ones: (1 - 1/10) ** 30 of the old mean is left
+    assert stat[0] == 10
+    assert stat[1] == pytest.approx(0.5 - 0.4 * 0.9 ** 30)
+
+
+def test_window_matches_plain_welford_below_the_cap(monkeypatch):
+    monkeypatch.setattr(settings, "BASELINE_WINDOW", 100)
+    stat = [0, 0.0, 0.0]
+    values = [0.1, 0.4, 0.2, 0.3]
+    for value in values:
+        baseline_store._add(stat, value)
+    assert stat[1] == pytest.approx(0.25)
+    assert baseline_store._std(stat) == pytest.approx(0.1290994, rel=1e-6)
+
+
+def test_thresholds_fall_back_to_defaults_then_use_history(monkeypatch):
+    monkeypatch.setattr(settings, "BASELINE_MIN_OBSERVATIONS", 3)
+    assert baseline_store.whale_thresholds(TOKEN)["source"] == "default"
+    for i, share in enumerate([0.2, 0.2, 0.2]):
+        baseline_store.observe(TOKEN, top_wallet_share=share, snapshot=i)
+    thresholds = baseline_store.whale_thresholds(TOKEN)
+    assert thresholds["source"] == "token"
+    assert thresholds["whale_share"] == pytest.approx(0.2)
+    assert thresholds["large_holder_percent"] == pytest.approx(10.0)
+
+
+def test_save_writes_only_when_changed(tmp_path):
+    baseline_store.save()
+    assert not (tmp_path / "baselines.json").exists()
+    baseline_store.observe(TOKEN, top_wallet_share=0.2, snapshot=1)
+    baseline_store.save()
+    saved = json.loads((tmp_path / "baselines.json").read_text())
+    assert saved["tokens"][TOKEN]["snapshot"] == 1
@@ -0,0 +1,124 @@
+"""Tests for near-duplicate tweet collapsing."""
+
+import copy
+import random
+
+import numpy as np
+
+from social_aggregator import dedup
+
+TOKEN = "7xKXtg2CW87d97TXJSDpbD5jBkheTqA83TZRuJosgAsU"
+OTHER = "So11111111111111111111111111111111111111112"
+TEMPLATE = "This gem is going 100x! Don't miss out, get in before it moons. CA: {}"
+
+
+def _tweet(tweet_id, text, author=None):
+    return {"id": tweet_id, "text": text, "author": {"userName": author or f"user{tweet_id}"}}
+
+
+def _campaign():
+    return [
+        _tweet("1", TEMPLATE.format(TOKEN)),
+        _tweet("2", TEMPLATE.format(TOKEN) + " 🚀"),
+        _tweet("3", "gm frens, what are we buying today?"),
+        dict(_tweet("4", TEMPLATE.format(TOKEN) + " @someone"), known_promoter={"username": "user4"}),
+    ]
+
+
+def test_input_tweets_are_not_modified():
+    tweets = _campaign()
+    before = copy.deepcopy(tweets)
+    representatives = dedup.collapse_near_duplicates(tweets)
+    assert tweets == before
+    assert all(r is not t for r in representatives for t in tweets)
+
+
+def test_second_run_gives_the_same_result():
+    tweets = _campaign()
+    first = dedup.collapse_near_duplicates(tweets)
+    second = dedup.collapse_near_duplicates(tweets)
+    assert first == second
+    assert [r["duplicate_count"] for r in second] == [3, 1]
+
+
+def test_expand_returns_the_untouched_originals():
+    tweets = _campaign()
+    representatives = dedup.collapse_near_duplicates(tweets)
+    expanded = dedup.expand_duplicates(representatives[:1], tweets)
+    assert [t["id"] for t in expanded] == ["1", "2", "4"]
+    assert all(any(t is original for original in tweets) for t in expanded)
+    indexed = dedup.expand_duplicates(representatives[:1], tweets, index=dedup.duplicate_index(tweets))
+    assert [t["id"] for t in indexed] == ["1", "2", "4"]
+    assert all(any(t is original for original in tweets) for t in indexed)
+
+
+def test_expand_keeps_representatives_without_a_key():
+    tweets = [{"text": "no id at all"}]
+    representatives = dedup.collapse_near_duplicates(tweets)
+    assert dedup.expand_duplicates(representatives, tweets) == representatives
+    assert dedup.expand_duplicates(representatives, tweets, index=dedup.duplicate_index(tweets)) == representatives
+
+
+def test_normalize_text_drops_links_mentions_and_punctuation():
+    tokens = dedup.normalize_text("GM @frens!! Check https://t.co/abc NOW 🚀")
+    assert tokens == ["gm", "check", "now", "🚀"]
+    assert dedup.normalize_text(None) == []
+
+
+def test_extract_addresses_keeps_case():
+    assert dedup.extract_addresses(f"CA: {TOKEN} and {OTHER}") == frozenset({TOKEN, OTHER})
+    assert dedup.extract_addresses("no address") == frozenset()
+
+
+def test_simhash_is_close_for_edits_and_far_for_other_text():
+    base = dedup.simhash(dedup.normalize_text(TEMPLATE.format(TOKEN)))
+    edited = dedup.simhash(dedup.normalize_text(TEMPLATE.format(TOKEN) + " 🔥"))
+    other = dedup.simhash(dedup.normalize_text("gm frens, what are we buying today?"))
+    assert bin(base ^ edited).count("1") <= 7
+    assert bin(base ^ other).count("1") > 7
+    # One-off and batched fingerprints agree, including empty and very short texts
+    texts = [[], ["a"], ["ab", "cd"], dedup.normalize_text(TEMPLATE.format(TOKEN))]
+    assert dedup.simhash_batch(texts) == [dedup.simhash(tokens) for tokens in texts]
+
+
+def test_near_pairs_match_brute_force():
+    random.seed(3)
+    fingerprints = []
+    for _ in range(60):
+        value = random.getrandbits(64)
+        fingerprints.append(value)
+        for _ in range(2):
+            flipped = value
+            for bit in random.sample(range(64), random.randint(0, 9)):
+                flipped ^= 1 << bit
+            fingerprints.append(flipped)
+    groups = [i % 2 for i in range(len(fingerprints))]
+    expected = sorted(
+        (i, j) for i in range(len(fingerprints)) for j in range(i + 1, len(fingerprints))
+        if groups[i] == groups[j] and bin(fingerprints[i] ^ fingerprints[j]).count("1") <= 7
+    )
+    found = dedup._near_pairs(np.array(groups, dtype=np.int64), np.array(fingerprints, dtype=np.uint64), 7)
+    assert found == expected
+
+
+def test_collapse_groups_campaign_copies():
+    representatives = dedup.collapse_near_duplicates(_campaign())
+    campaign, unique = representatives
+    assert campaign["id"] == "1"
+    assert campaign["duplicate_ids"] == ["1", "2", "4"]
+    assert campaign["duplicate_authors"] == ["user1", "user2", "user4"]
+    assert campaign["known_promoter"] == {"username": "user4"}
+    assert unique["duplicate_count"] == 1 and unique["duplicate_ids"] == ["3"]
+
+
+def test_same_template_for_other_tokens_stays_separate():
+    tweets = [_tweet("1", TEMPLATE.format(TOKEN)), _tweet("2", TEMPLATE.format(OTHER))]
+    assert len(dedup.collapse_near_duplicates(tweets)) == 2
+
+
+def test_empty_batch_and_campaign_signal():
+    assert dedup.collapse_near_duplicates([]) == []
+    assert dedup.campaign_signal([]) == {"distinct_messages": 0, "total_tweets": 0, "largest_campaign": None}
+    signal = dedup.campaign_signal(dedup.collapse_near_duplicates(_campaign()))
+    assert signal["distinct_messages"] == 2 and signal["total_tweets"] == 4
+    assert signal["largest_campaign"]["copies"] == 3 and signal["largest_campaign"]["authors"] == 3
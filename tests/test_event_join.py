@@ -0,0 +1,68 @@
+"""Tests for the tweet/token/event joins."""
+
+from correlation_engine import event_join
+
+TOKEN = "7xKXtg2CW87d97TXJSDpbD5jBkheTqA83TZRuJosgAsU"
+OTHER = "So11111111111111111111111111111111111111112"
+
+
+def _tweet(tweet_id, created_at, text=f"CA: {TOKEN}", author="shill"):
+    tweet = {"id": tweet_id, "text": text, "author": {"userName": author}}
+    if created_at is not None:
+        tweet["createdAt"] = created_at
+    return tweet
+
+
+def test_index_skips_missing_and_unparseable_times():
+    index = event_join.TweetTimeIndex({"T": [
+        _tweet("1", "Sun Apr 27 10:44:45 +0000 2025"),
+        {"text": "no time"},
+        _tweet("2", ""),
+        _tweet("3", "not a date"),
+    ]})
+    assert len(index) == 1
+
+
+def test_index_reads_created_at_fallback():
+    index = event_join.TweetTimeIndex({"T": [{"id": "1", "created_at": "2025-04-27T10:40:00Z"}]})
+    times, tweets = index.between("T", 0, 2e9)
+    assert times == [1745750400.0]
+    assert tweets[0]["id"] == "1"
+
+
+def test_between_is_inclusive_and_sorted():
+    index = event_join.TweetTimeIndex({"T": [_tweet("late", 300), _tweet("early", 100), _tweet("mid", 200)]})
+    times, tweets = index.between("T", 100, 200)
+    assert times == [100.0, 200.0]
+    assert [t["id"] for t in tweets] == ["early", "mid"]
+    assert index.between("unknown", 0, 1000) == ([], [])
+
+
+def test_build_token_tweet_map_filters_and_falls_back_to_substring():
+    tweets = [_tweet("1", 100), _tweet("2", 200, text="nothing here"),
+              _tweet("3", 300, text=f"lowercased {OTHER.lower()}")]
+    mapping = event_join.build_token_tweet_map(tweets, addresses=[TOKEN, OTHER])
+    assert [t["id"] for t in mapping[TOKEN]] == ["1"]
+    # The extractor keeps case, so the lowercased mention is only found by the fallback scan
+    assert [t["id"] for t in mapping[OTHER]] == ["3"]
+
+
+def test_event_time_sources():
+    assert event_join.event_time({"timestamp": 1000}) == 1000
+    assert event_join.event_time({"hour": 10}) == 11 * 3600
+    assert event_join.event_time({}) is None
+
+
+def test_attach_preceding_tweets_counts_window_only():
+    tweets = [_tweet("1", 1000, author="a"), _tweet("2", 1500, author="b"), _tweet("3", 5000, author="c")]
+    index = event_join.TweetTimeIndex({TOKEN: tweets})
+    patterns = [{"token": TOKEN, "timestamp": 1800}, {"token": TOKEN}, {"timestamp": 1800}]
+    joined = event_join.attach_preceding_tweets(patterns, index, window_minutes=15)
+    assert joined == 1
+    summary = patterns[0]["preceding_tweets"]
+    assert summary["count"] == 2
+    assert summary["authors"] == 2
+    assert summary["first_minutes_before"] == 13.3
+    assert summary["last_minutes_before"] == 5.0
+    assert summary["tweet_ids"] == ["1", "2"]
+    assert "preceding_tweets" not in patterns[1] and "preceding_tweets" not in patterns[2]
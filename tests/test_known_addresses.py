@@ -0,0 +1,94 @@
+"""Tests for the known-address hash table and buy/sell classification."""
+
+import random
+
+import numpy as np
+import pytest
+
+from config import settings
+from correlation_engine import address_extractor
+from onchain_monitor import known_addresses
+
+RAYDIUM_AUTHORITY = "5Q544fKrFoe6tsEbD7S8EmxGTJYAKtTVhAW5Q5pge4j1"
+BINANCE = "5tzFkiKscXHK5ZXCGbXZxdw7gTjjD1mBwuoFbhUvuAi9"
+
+
+@pytest.fixture(autouse=True)
+def seed_table(tmp_path, monkeypatch):
+    """Starts every test from the seed addresses, stored under tmp_path."""
+    monkeypatch.setattr(settings, "KNOWN_ADDRESSES_PATH", str(tmp_path / "known_addresses.npy"))
+    monkeypatch.setattr(known_addresses, "_table", None)
+    monkeypatch.setattr(known_addresses, "_dirty", False)
+
+
+def _random_addresses(count, seed):
+    rng = random.Random(seed)
+    return [address_extractor._encode_base58(bytes(rng.getrandbits(8) for _ in range(32))) for _ in range(count)]
+
+
+def test_seeds_are_known_and_wallets_are_not():
+    wallet = _random_addresses(1, 1)[0]
+    assert known_addresses.category_of(RAYDIUM_AUTHORITY) == "pool"
+    assert known_addresses.category_of(BINANCE) == "cex"
+    assert known_addresses.category_of(wallet) is None
+    assert known_addresses.category_of("") is None
+
+
+def test_table_matches_a_python_dict():
+    addresses = _random_addresses(3000, 2)
+    codes = np.array([random.Random(3).choice([1, 2, 3]) for _ in addresses], dtype=np.uint8)
+    table = known_addresses.build_table(known_addresses.fingerprints(addresses), codes)
+    assert len(table) >= 2 * len(addresses)
+    others = _random_addresses(3000, 4)
+    found = known_addresses.lookup_table(table, known_addresses.fingerprints(addresses + others))
+    assert found[:3000].tolist() == codes.tolist()
+    assert not found[3000:].any()
+
+
+def test_later_duplicates_override_earlier_ones():
+    keys = known_addresses.fingerprints(["a", "b", "a"])
+    table = known_addresses.build_table(keys, [1, 2, 3])
+    assert known_addresses.lookup_table(table, keys[:2]).tolist() == [3, 2]
+    assert known_addresses.lookup_table(table, np.zeros(0, dtype=np.uint64)).tolist() == []
+
+
+def test_classify_transfers():
+    wallet_a, wallet_b = _random_addresses(2, 5)
+    senders = [RAYDIUM_AUTHORITY, wallet_a, wallet_a, RAYDIUM_AUTHORITY]
+    receivers = [wallet_a, BINANCE, wallet_b, BINANCE]
+    directions = known_addresses.classify_transfers(senders, receivers)
+    assert directions.tolist() == [known_addresses.BUY, known_addresses.SELL, known_addresses.OTHER, known_addresses.OTHER]
+    assert known_addresses.classify_transfers([], []).tolist() == []
+
+
+def test_observe_learns_pools_and_programs_from_swaps():
+    trader, vault, bystander, program = _random_addresses(4, 6)
+    activities = [
+        {"activity_type": "ACTIVITY_TOKEN_SWAP", "trans_id": "tx1", "from_address": trader, "platform": [program]},
+        {"activity_type": "ACTIVITY_TOKEN_ADD_LIQ", "trans_id": "tx2", "from_address": bystander},
+    ]
+    transfers = [
+        {"trans_id": "tx1", "from_address": vault, "to_address": trader},
+        {"trans_id": "tx2", "from_address": bystander, "to_address": trader},
+    ]
+    assert known_addresses.observe(activities, transfers) == 2
+    assert known_addresses.category_of(vault) == "pool"
+    assert known_addresses.category_of(program) == "program"
+    assert known_addresses.category_of(trader) is None
+    assert known_addresses.category_of(bystander) is None
+    assert known_addresses.observe(activities, transfers) == 0
+
+
+def test_saved_table_is_reopened_memory_mapped():
+    pool = _random_addresses(1, 7)[0]
+    assert known_addresses.add([pool, pool, ""]) == 1
+    known_addresses.save()
+    known_addresses._table = None
+    assert known_addresses.category_of(pool) == "pool"
+    assert isinstance(known_addresses._table, np.memmap)
+    # Adding to a memory-mapped table writes a new file instead of changing the open one
+    other = _random_addresses(1, 8)[0]
+    assert known_addresses.add([other], "cex") == 1
+    known_addresses.save()
+    known_addresses._table = None
+    assert known_addresses.category_of(other) == "cex" and known_addresses.category_of(pool) == "pool"
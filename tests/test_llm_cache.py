@@ -0,0 +1,74 @@
+"""Tests for the SQLite cache of LLM responses."""
+
+import os
+
+import pytest
+
+from config import settings
+from correlation_engine import llm_cache
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    """An empty cache in tmp_path, with a controllable clock."""
+    now = [1000.0]
+    monkeypatch.setattr(settings, "LLM_CACHE_PATH", str(tmp_path / "cache" / "llm.sqlite"))
+    monkeypatch.setattr(settings, "LLM_CACHE_TTL_SECONDS", 100)
+    monkeypatch.setattr(settings, "LLM_CACHE_MAX_ENTRIES", 3)
+    monkeypatch.setattr(llm_cache, "_connection", None)
+    monkeypatch.setattr(llm_cache, "_stats", {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evicted": 0})
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    yield now
+    if llm_cache._connection is not None:
+        llm_cache._connection.close()
+
+
+def test_key_covers_every_request_field():
+    base = llm_cache.make_key("m", "sys", "user", {"type": "json_object"}, {"temperature": 0.2})
+    assert base == llm_cache.make_key("m", "sys", "user", {"type": "json_object"}, {"temperature": 0.2})
+    assert base != llm_cache.make_key("m2", "sys", "user", {"type": "json_object"}, {"temperature": 0.2})
+    assert base != llm_cache.make_key("m", "sys", "user!", {"type": "json_object"}, {"temperature": 0.2})
+    assert base != llm_cache.make_key("m", "sys", "user", None, {"temperature": 0.2})
+    assert base != llm_cache.make_key("m", "sys", "user", {"type": "json_object"}, {"temperature": 0.3})
+    # Parameter order does not matter
+    assert llm_cache.make_key("m", "s", "u", params={"a": 1, "b": 2}) == llm_cache.make_key("m", "s", "u", params={"b": 2, "a": 1})
+
+
+def test_hit_miss_and_expiry(clock):
+    assert llm_cache.get("k") is None
+    llm_cache.put("k", "m", '{"ok": true}')
+    assert llm_cache.get("k") == '{"ok": true}'
+    clock[0] += 101
+    assert llm_cache.get("k") is None
+    current = llm_cache.stats()
+    assert (current["hits"], current["misses"], current["expired"], current["entries"]) == (1, 2, 1, 0)
+    assert current["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    for key in ("a", "b", "c"):
+        llm_cache.put(key, "m", key)
+        clock[0] += 1
+    assert llm_cache.get("a") == "a"  # "b" is now the least recently used
+    clock[0] += 1
+    llm_cache.put("d", "m", "d")
+    assert llm_cache.get("b") is None
+    assert [llm_cache.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+    assert llm_cache.stats()["evicted"] == 1
+
+
+def test_purge_expired(clock):
+    llm_cache.put("old", "m", "x")
+    clock[0] += 60
+    llm_cache.put("new", "m", "y")
+    clock[0] += 50
+    assert llm_cache.purge_expired() == 1
+    assert llm_cache.get("new") == "y"
+
+
+def test_disabled_cache_stores_nothing(clock, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_TTL_SECONDS", 0)
+    llm_cache.put("k", "m", "x")
+    assert llm_cache.get("k") is None
+    assert llm_cache.stats()["entries"] == 0
+    assert not os.path.exists(settings.LLM_CACHE_PATH)
@@ -0,0 +1,33 @@
+"""Tests for prompt token estimates and token-budget batching."""
+
+import pytest
+
+from correlation_engine import prompt_budget
+
+
+@pytest.fixture(autouse=True)
+def length_estimates(monkeypatch):
+    """Uses the length-based estimate, so counts do not depend on tiktoken being installed."""
+    monkeypatch.setattr(prompt_budget, "tiktoken", None)
+
+
+def test_estimate_rounds_utf8_length_up():
+    assert prompt_budget.estimate_tokens("") == 0
+    assert prompt_budget.estimate_tokens(None) == 0
+    assert prompt_budget.estimate_tokens("abcd") == 1
+    assert prompt_budget.estimate_tokens("abcde") == 2
+    # An emoji is four UTF-8 bytes
+    assert prompt_budget.estimate_tokens("🚀") == 1
+
+
+def test_pack_respects_budget_and_overheads():
+    texts = ["a" * 40] * 5  # 10 tokens each
+    assert prompt_budget.pack_by_token_budget(texts, budget=30) == [[0, 1, 2], [3, 4]]
+    assert prompt_budget.pack_by_token_budget(texts, budget=30, overhead_tokens=5, per_item_overhead=2) == [[0, 1], [2, 3], [4]]
+    assert prompt_budget.pack_by_token_budget(texts, budget=1000, max_items=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_oversized_text_gets_its_own_batch():
+    texts = ["a" * 8, "a" * 400, "a" * 8]
+    assert prompt_budget.pack_by_token_budget(texts, budget=20) == [[0], [1], [2]]
+    assert prompt_budget.pack_by_token_budget([], budget=20) == []
@@ -0,0 +1,106 @@
+"""Regression tests for the pump-and-dump heuristics."""
+
+import pytest
+
+from config import settings
+from correlation_engine import llm_client
+from correlation_engine import pump_dump_analyzer
+from correlation_engine import verdict_backends
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(tmp_path, monkeypatch):
+    """Keeps the baseline store, promotion graph and saved analyses out of ./data."""
+    monkeypatch.chdir(tmp_path)
+
+
+def _token_data(buys, sells, total=20):
+    return {
+        "token_address": "TestToken1111111111111111111111111111111pump",
+        "total_transactions": total,
+        "buy_transactions": buys,
+        "sell_transactions": sells,
+        "other_transactions": total - buys - sells,
+        "unique_wallets": 4,
+        "wallets": {
+            "WalletA": {"sent": 10.0, "received": 2.0, "net": -8.0},
+            "WalletB": {"sent": 0.0, "received": 8.0, "net": 8.0},
+        },
+        "hourly_volumes": {},
+    }
+
+
+def test_no_buys_or_sells_does_not_crash():
+    # Every transfer is wallet to wallet (the token's pool is not known yet)
+    result, needs_verdict = pump_dump_analyzer._heuristic_analysis(_token_data(0, 0), [])
+    assert needs_verdict
+    assert result["transaction_summary"]["direction_known"] is False
+    assert result["transaction_summary"]["other"] == 20
+    assert not any("sell ratio" in reason for reason in result["reasons"])
+
+
+def test_high_sell_ratio_still_counts():
+    result, _ = pump_dump_analyzer._heuristic_analysis(_token_data(2, 15), [])
+    assert result["transaction_summary"]["direction_known"] is True
+    assert any("High sell ratio" in reason for reason in result["reasons"])
+
+
+def test_batch_with_unknown_direction(monkeypatch):
+    monkeypatch.setattr(verdict_backends, "get_verdicts", lambda items, results, mode=None: [{} for _ in items])
+    results = pump_dump_analyzer.analyze_token_transactions_batch([(_token_data(0, 0), [])])
+    assert len(results) == 1
+    assert results[0]["transaction_summary"]["buys"] == 0
+
+
+def _fake_llm(calls, batch_verdicts, single=None):
+    """A run_concurrent stand-in: batch prompts get batch_verdicts(addresses), others `single`."""
+    def run_concurrent(requests, max_workers=None):
+        responses = []
+        for request in requests:
+            addresses = [line.split("### Token ")[1].strip() for line in request["user"].splitlines() if "### Token " in line]
+            calls.append(addresses or "single")
+            if addresses:
+                responses.append(batch_verdicts(addresses))
+            else:
+                responses.append(single if single is not None else {"is_pump_dump": True, "confidence": 0.9})
+        return responses
+    return run_concurrent
+
+
+def _items(count):
+    items = []
+    for i in range(count):
+        token_data = dict(_token_data(2, 15), token_address=f"Token{i}")
+        items.append((token_data, []))
+    return items
+
+
+def test_ai_batch_packs_tokens_and_retries_missing_ones(monkeypatch):
+    monkeypatch.setattr(settings, "AI_BATCH_MAX_TOKENS", 2)
+    calls = []
+
+    def batch_verdicts(addresses):
+        verdicts = [{"token_address": address, "is_pump_dump": False, "confidence": 0.2} for address in addresses]
+        # Token1 comes back malformed and Token2 is missing; both are asked again on their own
+        verdicts = [v for v in verdicts if v["token_address"] != "Token2"]
+        for verdict in verdicts:
+            if verdict["token_address"] == "Token1":
+                verdict["confidence"] = "high"
+        return {"verdicts": verdicts}
+
+    monkeypatch.setattr(llm_client, "run_concurrent", _fake_llm(calls, batch_verdicts))
+    results = pump_dump_analyzer.analyze_with_ai_batch(_items(3))
+    assert calls == [["Token0", "Token1"], ["Token2"], "single", "single"]
+    assert [r["is_pump_dump"] for r in results] == [False, True, True]
+    assert results[0]["confidence"] == 0.2
+
+
+def test_ai_batch_failures_fall_back_per_token(monkeypatch):
+    calls = []
+    monkeypatch.setattr(llm_client, "run_concurrent",
+                        _fake_llm(calls, lambda addresses: RuntimeError("rate limited"), single=RuntimeError("down")))
+    results = pump_dump_analyzer.analyze_with_ai_batch(_items(2))
+    assert calls == [["Token0", "Token1"], "single", "single"]
+    assert all(r["is_pump_dump"] is False and r["confidence"] == 0.0 for r in results)
+    assert all("down" in r["detailed_narrative"] for r in results)
+    assert pump_dump_analyzer.analyze_with_ai_batch([]) == []
@@ -0,0 +1,103 @@
+"""Tests for the tiered triage of extracted tokens."""
+
+import time
+
+import pytest
+
+from config import settings
+from correlation_engine import triage
+from onchain_monitor import bad_wallet_filter
+from onchain_monitor import known_addresses
+from onchain_monitor import solscan
+from onchain_monitor import verification_cache
+from social_aggregator import promotion_graph
+
+RAYDIUM_AUTHORITY = "5Q544fKrFoe6tsEbD7S8EmxGTJYAKtTVhAW5Q5pge4j1"
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Seed-only known addresses, no promotion rings and fresh triage counters."""
+    monkeypatch.setattr(settings, "KNOWN_ADDRESSES_PATH", str(tmp_path / "known_addresses.npy"))
+    monkeypatch.setattr(settings, "TRIAGE_STATS_PATH", str(tmp_path / "triage_stats.json"))
+    monkeypatch.setattr(known_addresses, "_table", None)
+    monkeypatch.setattr(triage, "_stats", {})
+    monkeypatch.setattr(triage, "_loaded", False)
+    monkeypatch.setattr(promotion_graph, "get_ring_signal", lambda token, usernames: {"ring_members": []})
+
+
+def _tweet(author, quick_score=0.0, **extra):
+    return dict({"author": {"userName": author}, "quick_score": quick_score}, **extra)
+
+
+def _token_info(supply=1000, holder=100, created_time=None):
+    return {"data": {"supply": supply, "holder": holder, "created_time": created_time}}
+
+
+def test_social_score_adds_up_tweet_signals(monkeypatch):
+    assert triage.social_score("T", []) == {"score": 0.0, "signals": []}
+    quiet = triage.social_score("T", [_tweet("a", 0.2)])
+    assert quiet["score"] == pytest.approx(0.1) and quiet["signals"] == []
+
+    campaign = [_tweet("a", 0.8, duplicate_count=5, duplicate_authors=["a", "b", "c"]),
+                _tweet("d", 0.1, known_promoter={"username": "d"})]
+    monkeypatch.setattr(promotion_graph, "get_ring_signal", lambda token, usernames: {"ring_members": usernames})
+    scored = triage.social_score("T", campaign)
+    # 0.5 * 0.8 + promoter 0.2 + campaign 0.2 + accounts 0.1 + ring 0.2, capped at 1
+    assert scored["score"] == 1.0
+    assert scored["signals"] == ["pump language (0.80)", "known promoter", "copy-paste campaign (5 copies)",
+                                 "4 accounts", "4 promotion ring members"]
+
+
+def test_holder_concentration_ignores_pools_and_bad_values():
+    holders = [{"owner": RAYDIUM_AUTHORITY, "amount": 500}, {"owner": "w1", "amount": 300}, {"owner": "w2", "amount": "x"}]
+    assert triage.holder_concentration(_token_info(), holders) == pytest.approx(0.3)
+    assert triage.holder_concentration(_token_info(supply=0), holders) == 0.0
+    assert triage.holder_concentration(_token_info(supply="n/a"), holders) == 0.0
+    assert triage.holder_concentration({}, holders) == 0.0
+    assert triage.holder_concentration(_token_info(), []) == 0.0
+
+
+def test_onchain_score_signals():
+    social = {"score": 0.4, "signals": []}
+    fresh = "Fresh111111111111111111111111111111111pump"
+    holders = [{"owner": "w1", "amount": 600}]
+    scored = triage.onchain_score(fresh, _token_info(holder=50, created_time=time.time() - 3600), holders, ["bad"], social)
+    assert scored["score"] == 1.0
+    assert scored["signals"] == ["1 flagged holders", "top holders hold 60%", "fresh pump.fun launch", "50 holders"]
+    calm = triage.onchain_score("Old1", _token_info(holder=5000), [], [], social)
+    assert calm == {"score": pytest.approx(0.2), "signals": [], "holder_concentration": 0.0}
+
+
+def test_triage_tokens_moves_tokens_through_the_tiers(monkeypatch):
+    marked, fetched = [], []
+    monkeypatch.setattr(verification_cache, "skip_reason", lambda a: "known pool address" if a == "Skip" else None)
+    monkeypatch.setattr(verification_cache, "verify_mint_with_info",
+                        lambda a: (False, {}) if a == "Wallet" else (True, {} if a == "Cached" else _token_info(holder=50)))
+    monkeypatch.setattr(verification_cache, "mark_uninteresting", lambda a, reason: marked.append(a))
+    monkeypatch.setattr(bad_wallet_filter, "screen_tokens",
+                        lambda addresses: [(a, [{"owner": "w", "amount": 900}] if a == "Hot" else [], []) for a in addresses])
+    monkeypatch.setattr(solscan, "get_token_info", lambda a: fetched.append(a) or _token_info(holder=50))
+
+    loud = [_tweet("a", 0.9)]
+    tweet_map = {"Skip": loud, "Quiet": [_tweet("a", 0.1)], "Wallet": loud, "Hot": loud, "Cached": loud, "Dull": [_tweet("a", 0.4)]}
+    promoted, counts = triage.triage_tokens(list(tweet_map), tweet_map)
+
+    assert [token["address"] for token in promoted] == ["Hot", "Cached"]
+    assert promoted[0]["triage"]["signals"] == ["pump language (0.90)", "top holders hold 90%", "50 holders"]
+    assert promoted[0]["token_info"]["data"]["holder"] == 50
+    # Only the token whose mint status came from the cache needs /token/meta again
+    assert fetched == ["Cached"]
+    assert marked == ["Dull"]
+    assert counts == {"tier0": 5, "tier1": 3, "tier2": 2, "llm": 0}
+
+
+def test_record_cycle_accumulates_and_persists():
+    triage.record_cycle({"tier0": 10, "tier1": 4, "tier2": 2, "llm": 1})
+    stats = triage.record_cycle({"tier0": 10, "tier1": 2, "tier2": 0})
+    assert stats["cycles"] == 2
+    assert stats["totals"] == {"tier0": 20, "tier1": 6, "tier2": 2, "llm": 1}
+    assert stats["shares"]["tier1"] == 0.3
+    triage._stats.clear()
+    triage._loaded = False
+    assert triage.get_stats()["totals"]["tier0"] == 20
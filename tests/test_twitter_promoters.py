@@ -0,0 +1,56 @@
+"""Tests for the saved promoter lists of find_promoters_for_token."""
+
+import json
+
+import pytest
+
+from config import settings
+from social_aggregator import promoter_index
+from social_aggregator import promotion_graph
+from social_aggregator import twitter
+
+TOKEN = "7xKXtg2CW87d97TXJSDpbD5jBkheTqA83TZRuJosgAsU"
+
+
+@pytest.fixture
+def searches(tmp_path, monkeypatch):
+    """Runs in an empty data dir and records the since_minutes of every Twitter search."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "TWITTER_API_KEY", "test-key")
+    monkeypatch.setattr(promoter_index, "record_promotions", lambda token, records: None)
+    monkeypatch.setattr(promotion_graph, "add_promotions", lambda token, records, persist=True: None)
+    calls = []
+
+    def fake_search(terms, since_minutes=60):
+        calls.append(since_minutes)
+        return [{"id": str(len(calls)), "text": f"CA: {TOKEN} 100x gem", "createdAt": "Sun Apr 27 10:44:45 +0000 2025",
+                 "author": {"userName": f"shill{len(calls)}", "followers": 500}}]
+
+    monkeypatch.setattr(twitter, "get_recent_tweets_concurrent", fake_search)
+    return calls
+
+
+def test_fresh_list_is_reused_for_the_same_window(searches):
+    first = twitter.find_promoters_for_token(TOKEN, since_days=7)
+    again = twitter.find_promoters_for_token(TOKEN, since_days=7)
+    assert searches == [7 * 24 * 60]
+    assert again == first
+
+
+def test_other_window_is_a_miss(searches, tmp_path):
+    twitter.find_promoters_for_token(TOKEN, since_days=7)
+    promoters = twitter.find_promoters_for_token(TOKEN, since_days=1)
+    assert searches == [7 * 24 * 60, 24 * 60]
+    # The 7-day list is not merged into the 1-day one
+    assert [p["username"] for p in promoters] == ["shill2"]
+    saved = json.loads((tmp_path / "data" / "twitter" / f"token_{TOKEN}_promoters.json").read_text())
+    assert saved["since_days"] == 1
+
+
+def test_legacy_list_file_is_a_miss(searches, tmp_path):
+    legacy = tmp_path / "data" / "twitter" / f"token_{TOKEN}_promoters.json"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_text(json.dumps([{"username": "old", "tweets": [], "pump_indicators": 0, "followers": 0}]))
+    promoters = twitter.find_promoters_for_token(TOKEN, since_days=7)
+    assert len(searches) == 1
+    assert [p["username"] for p in promoters] == ["shill1"]
@@ -0,0 +1,95 @@
+"""Tests for the local verdict model and how its verdicts are merged."""
+
+import json
+
+import pytest
+
+from correlation_engine import pump_dump_analyzer
+from correlation_engine import verdict_backends
+from onchain_monitor import verification_cache
+
+
+def _analysis(is_pump_dump, index):
+    """A stored analysis; pumps sell hard into a spike with several dumpers."""
+    if is_pump_dump:
+        summary = {"total": 60 + index, "buys": 10, "sells": 45 + index, "unique_wallets": 12}
+        dumpers = [{"dump_ratio": 0.9}] * (3 + index % 3)
+        volume = {"has_spike": True, "spike_factor": 8.0 + index}
+    else:
+        summary = {"total": 60 + index, "buys": 40 + index, "sells": 15, "unique_wallets": 40}
+        dumpers = []
+        volume = {"has_spike": False, "spike_factor": 1.0 + index / 10}
+    return {
+        "is_pump_dump": is_pump_dump,
+        "confidence": 0.8 if is_pump_dump else 0.1,
+        "transaction_summary": summary,
+        "potential_dumpers": dumpers,
+        "top_holders": [],
+        "volume_analysis": volume,
+    }
+
+
+def _write_analyses(directory, pumps, clean):
+    for i in range(pumps):
+        (directory / f"pump_{i}.json").write_text(json.dumps(_analysis(True, i)))
+    for i in range(clean):
+        (directory / f"clean_{i}.json").write_text(json.dumps(_analysis(False, i)))
+
+
+@pytest.fixture
+def local_backend(tmp_path):
+    analysis_dir = tmp_path / "analysis"
+    analysis_dir.mkdir()
+    _write_analyses(analysis_dir, pumps=8, clean=8)
+    model_path = str(tmp_path / "model.json")
+    model = verdict_backends.train_local_model(str(analysis_dir), model_path, iterations=300)
+    assert model["samples"] == 16 and model["positives"] == 8
+    assert model["training_accuracy"] == 1.0
+    return verdict_backends.LocalBackend(model_path)
+
+
+def test_training_refuses_a_single_class(tmp_path):
+    _write_analyses(tmp_path, pumps=12, clean=0)
+    with pytest.raises(ValueError, match="same verdict"):
+        verdict_backends.train_local_model(str(tmp_path), str(tmp_path / "model.json"))
+
+
+def test_training_refuses_too_few_samples(tmp_path):
+    _write_analyses(tmp_path, pumps=3, clean=3)
+    with pytest.raises(ValueError, match="at least 10"):
+        verdict_backends.train_local_model(str(tmp_path), str(tmp_path / "model.json"))
+
+
+def test_training_skips_local_verdicts(tmp_path):
+    _write_analyses(tmp_path, pumps=6, clean=6)
+    relabelled = dict(_analysis(False, 0), verdict_backend="local")
+    (tmp_path / "local.json").write_text(json.dumps(relabelled))
+    features, labels = verdict_backends.load_training_data(str(tmp_path))
+    assert len(labels) == 12
+
+
+def test_confidence_is_in_the_verdict_given(local_backend):
+    pump = local_backend.analyze({}, [], _analysis(True, 1))
+    clean = local_backend.analyze({}, [], _analysis(False, 1))
+    assert pump["is_pump_dump"] is True and clean["is_pump_dump"] is False
+    assert pump["local_score"] > 0.5 > clean["local_score"]
+    assert pump["confidence"] == pump["local_score"]
+    assert clean["confidence"] == pytest.approx(1 - clean["local_score"])
+    assert clean["confidence"] > 0.5
+
+
+def test_confident_clean_verdict_clears_a_suspicious_heuristic(local_backend):
+    heuristic = dict(_analysis(False, 1), is_pump_dump=True, confidence=0.6, reasons=["High sell ratio"])
+    pump_dump_analyzer._apply_verdict(heuristic, local_backend.analyze({}, [], heuristic))
+    assert heuristic["is_pump_dump"] is False
+    assert heuristic["confidence"] > 0.6
+    assert heuristic["verdict_backend"] == "local"
+
+
+def test_cleared_token_counts_as_uninteresting(local_backend, monkeypatch):
+    marked = []
+    monkeypatch.setattr(verification_cache, "mark_uninteresting", lambda address, reason: marked.append(address))
+    result = dict(_analysis(False, 1), is_pump_dump=False, confidence=0.1, reasons=[])
+    pump_dump_analyzer._apply_verdict(result, local_backend.analyze({}, [], result))
+    assert verification_cache.record_analysis("Token", result) is True
+    assert marked == ["Token"]
@@ -0,0 +1,85 @@
+"""Tests for multi-resolution volume buckets and spike detection."""
+
+import math
+import random
+
+from onchain_monitor import volume_buckets
+
+START = 1_745_000_000 - 1_745_000_000 % 3600
+
+
+def _loop_spike(series, window, factor):
+    """detect_spike written as the plain loop it replaced."""
+    best = None
+    for i in range(window, len(series)):
+        trailing = [v for _, v in series[i - window:i]]
+        if sum(1 for v in trailing if v > 0) < max(1, math.ceil(window / 2)):
+            continue
+        baseline = sum(trailing) / window
+        if baseline > 0 and series[i][1] > baseline * factor:
+            if best is None or series[i][1] / baseline > best["factor"]:
+                best = {"bucket": series[i][0], "volume": series[i][1], "baseline": baseline,
+                        "factor": series[i][1] / baseline}
+    return best
+
+
+def test_detect_spike_matches_the_loop():
+    random.seed(4)
+    for _ in range(200):
+        window = random.randint(1, 8)
+        series = [(START + i * 60, random.choice([0.0, random.uniform(1, 100), random.uniform(500, 5000)]))
+                  for i in range(random.randint(0, 40))]
+        assert volume_buckets.detect_spike(series, window, 3.0) == _loop_spike(series, window, 3.0)
+
+
+def test_detect_spike_needs_an_active_baseline():
+    # One earlier trade in a window of four is not a baseline
+    series = [(i, v) for i, v in enumerate([0.0, 0.0, 0.0, 10.0, 1000.0])]
+    assert volume_buckets.detect_spike(series, 4) is None
+    series = [(i, v) for i, v in enumerate([10.0, 10.0, 0.0, 10.0, 1000.0])]
+    spike = volume_buckets.detect_spike(series, 4)
+    assert spike["bucket"] == 4 and spike["factor"] == 1000.0 / 7.5
+    assert volume_buckets.detect_spike(series[:4], 4) is None
+
+
+def test_buckets_align_and_fill_gaps():
+    volumes = volume_buckets.MultiResolutionVolume()
+    volumes.add(START + 30, 5.0)
+    volumes.add(START + 59, 1.0)
+    volumes.add(START + 185, 2.0)
+    volumes.add(0, 100.0)  # no timestamp: ignored
+    assert volumes.series("1m") == [(START, 6.0), (START + 60, 0.0), (START + 120, 0.0), (START + 180, 2.0)]
+    assert volumes.series("1m", fill_gaps=False) == [(START, 6.0), (START + 180, 2.0)]
+    assert volumes.series("1h") == [(START, 8.0)]
+    assert volume_buckets.downsample(volumes.series("1m"), 300) == volumes.series("5m")
+
+
+def test_old_buckets_are_trimmed_to_retention():
+    volumes = volume_buckets.MultiResolutionVolume()
+    for minute in range(3000):
+        volumes.add(START + minute * 60, 1.0)
+    series = volumes.series("1m")
+    assert len(series) == volume_buckets.RESOLUTIONS["1m"]["retention"]
+    assert series[-1][0] == START + 2999 * 60
+
+
+def test_round_trip_and_bad_transfers():
+    volumes = volume_buckets.MultiResolutionVolume().add_transfers([
+        {"block_time": START + 10, "amount": "3.5"},
+        {"blockTime": START + 70, "amount": 1},
+        {"block_time": START + 80, "amount": "not a number"},
+    ])
+    assert volumes.series("1m") == [(START, 3.5), (START + 60, 1.0)]
+    restored = volume_buckets.MultiResolutionVolume.from_dict(volumes.to_dict())
+    assert all(restored.series(name) == volumes.series(name) for name in volume_buckets.RESOLUTIONS)
+    assert restored.latest == START + 60
+
+
+def test_detect_spikes_uses_per_resolution_factors():
+    volumes = volume_buckets.MultiResolutionVolume()
+    for minute in range(30):
+        volumes.add(START + minute * 60, 100.0)
+    volumes.add(START + 30 * 60, 500.0)
+    volumes.add(START + 31 * 60, 100.0)
+    assert volume_buckets.detect_spikes(volumes)["1m"]["factor"] == 5.0
+    assert volume_buckets.detect_spikes(volumes, factors={"1m": 6.0})["1m"] is None
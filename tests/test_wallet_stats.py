@@ -0,0 +1,57 @@
+"""Tests for the array-backed dumper and whale heuristics."""
+
+import random
+
+import numpy as np
+
+from correlation_engine import wallet_stats
+
+
+def _wallet(sent, received):
+    return {"sent": sent, "received": received, "net": received - sent}
+
+
+def test_top_k_breaks_ties_by_index():
+    keys = np.array([3.0, 5.0, 3.0, 5.0, 1.0, 3.0])
+    assert wallet_stats.top_k_indices(keys, 3).tolist() == [1, 3, 0]
+    assert wallet_stats.top_k_indices(keys, 10).tolist() == [1, 3, 0, 2, 5, 4]
+    assert wallet_stats.top_k_indices(keys, 0).tolist() == []
+    assert wallet_stats.top_k_indices(np.zeros(0), 3).tolist() == []
+
+
+def test_matches_the_dict_loops():
+    random.seed(9)
+    wallets = {}
+    for i in range(500):
+        received = float(random.choice([0, random.randint(1, 100), 1000]))
+        sent = float(random.choice([0, random.randint(1, 100), received * 2]))
+        wallets[f"w{i}"] = _wallet(sent, received)
+    wallets["whale"] = _wallet(0.0, 50000.0)
+    stats = wallet_stats.WalletStats(wallets)
+
+    dumpers = [{"address": a, "received": s["received"], "sent": s["sent"], "net": s["net"],
+                "dump_ratio": s["sent"] / s["received"]}
+               for a, s in wallets.items() if s["received"] > 0 and s["sent"] > s["received"] * 1.5]
+    dumpers.sort(key=lambda d: d["dump_ratio"], reverse=True)
+    assert stats.dumpers() == (len(dumpers), dumpers[:5])
+
+    total = sum(s["received"] for s in wallets.values())
+    whales = [{"address": a, "received": s["received"], "percent_of_supply": s["received"] / total * 100}
+              for a, s in wallets.items() if s["received"] > total * 0.1]
+    whales.sort(key=lambda w: w["received"], reverse=True)
+    large = sum(1 for w in whales if w["percent_of_supply"] > 5)
+    assert stats.whales() == (len(whales), whales[:5], large)
+    assert stats.top_share() == 50000.0 / total
+
+
+def test_empty_and_zero_volume_wallets():
+    empty = wallet_stats.WalletStats({})
+    assert len(empty) == 0
+    assert empty.top_share() == 0.0
+    assert empty.dumpers() == (0, [])
+    assert empty.whales() == (0, [], 0)
+    idle = wallet_stats.WalletStats({"a": _wallet(5.0, 0.0), "b": _wallet(0.0, 0.0)})
+    # Sending without receiving has no dump ratio, and nothing was received at all
+    assert idle.dumpers() == (0, [])
+    assert idle.top_share() == 0.0
+    assert idle.whales() == (0, [], 0)